@@ -0,0 +1,151 @@
+"""
+Import time of the package and its entry points
+
+Runs each import in fresh interpreters without MARKET_DATA_API_KEY set, and
+reports the median time it adds over starting an empty interpreter, along
+with the heavy dependencies it loaded. Exits with status 1 when an import
+fails, loads a dependency it shouldn't, or exceeds its time budget, so it can
+guard startup time in CI.
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --runs 20 --json import_times.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "aiohttp", "requests", "orjson")
+
+# name: (statement, heavy modules it must not load, budget in ms or None)
+IMPORTS = {
+    "package": ("import marketdata", HEAVY_MODULES, 25.0),
+    "params": (
+        "from marketdata import BasicParams, OptionsChainParams",
+        HEAVY_MODULES,
+        100.0,
+    ),
+    "credentials": (
+        "from marketdata.credentials import get_api_key",
+        HEAVY_MODULES,
+        100.0,
+    ),
+    "sync_client": (
+        "from marketdata import MarketDataClient",
+        ("pandas", "numpy", "pyarrow", "aiohttp"),
+        None,
+    ),
+    "async_client": ("from marketdata import MarketDataAsyncClient", (), None),
+    "manager": ("from marketdata import MarketDataManager", (), None),
+}
+
+_PROBE = """
+import sys, time
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def _environment() -> dict:
+    env = {k: v for k, v in os.environ.items() if k != "MARKET_DATA_API_KEY"}
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [os.path.join(ROOT, "src"), env.get("PYTHONPATH")])
+    )
+    return env
+
+
+def _wall_time(args: list, env: dict) -> float:
+    start = time.perf_counter()
+    subprocess.run(args, env=env, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def measure(statement: str, runs: int, env: dict) -> dict:
+    """Time an import in fresh interpreters: in-process time of the statement,
+    and the wall time it adds to the interpreter's startup."""
+    probe = _PROBE.format(statement=statement, heavy=HEAVY_MODULES)
+    in_process, wall, baseline = [], [], []
+    loaded = ""
+    for _ in range(runs):
+        baseline.append(_wall_time([sys.executable, "-c", "pass"], env))
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", probe],
+            env=env,
+            check=True,
+            capture_output=True,
+            text=True,
+        )
+        wall.append(time.perf_counter() - start)
+        elapsed, _, loaded = result.stdout.strip().partition(" ")
+        in_process.append(float(elapsed))
+    return {
+        "import_ms": round(statistics.median(in_process) * 1000, 1),
+        "added_wall_ms": round(
+            (statistics.median(wall) - statistics.median(baseline)) * 1000, 1
+        ),
+        "loaded": [m for m in loaded.split(",") if m],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--imports", nargs="+", choices=list(IMPORTS), default=list(IMPORTS)
+    )
+    parser.add_argument(
+        "--runs", type=int, default=10, help="Interpreters started per import"
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    env = _environment()
+    results = []
+    failures = []
+    for name in args.imports:
+        statement, forbidden, budget = IMPORTS[name]
+        try:
+            result = {
+                "import": name,
+                "statement": statement,
+                **measure(statement, args.runs, env),
+            }
+        except subprocess.CalledProcessError as e:
+            failures.append(f"{name}: `{statement}` failed\n{e.stderr}")
+            continue
+        unexpected = [m for m in result["loaded"] if m in forbidden]
+        if unexpected:
+            failures.append(f"{name}: `{statement}` loaded {', '.join(unexpected)}")
+        if budget is not None and result["import_ms"] > budget:
+            failures.append(
+                f"{name}: `{statement}` took {result['import_ms']} ms, over its "
+                f"{budget} ms budget"
+            )
+        results.append(result)
+
+    width = max(len(r["statement"]) for r in results) if results else 0
+    print(f"{'import'.ljust(width)}  {'import_ms':>9}  {'added_wall_ms':>13}  loaded")
+    for r in results:
+        print(
+            f"{r['statement'].ljust(width)}  {r['import_ms']:>9}  "
+            f"{r['added_wall_ms']:>13}  {', '.join(r['loaded']) or '-'}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Local stand-in for the marketdata.app v1 API, for benchmarks
+
+Serves generated candles, option chains and quotes in the API's response
+shapes (JSON or CSV), with configurable latency, error rate and 429 rate.
+The configuration can be changed while the server runs by POSTing JSON to
+/_mock/config, and request counters are available at /_mock/stats.
+
+Run it on its own with:
+
+    python benchmarks/mock_server.py --port 8321 --latency 0.02 --error-rate 0.01
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import random
+import re
+import zlib
+from dataclasses import asdict, dataclass, fields
+
+import numpy as np
+from aiohttp import web
+
+MARKET_OPEN_MINUTE = 9 * 60 + 30
+MARKET_CLOSE_MINUTE = 16 * 60
+# The generated timestamps use a fixed offset rather than tracking DST
+UTC_OFFSET = "-05:00"
+UTC_OFFSET_SECONDS = 5 * 3600
+
+
+@dataclass
+class MockConfig:
+    latency: float = 0.02
+    jitter: float = 0.005
+    error_rate: float = 0.0
+    throttle_rate: float = 0.0
+    retry_after: int = 0
+    chain_expirations: int = 8
+    chain_strikes: int = 40
+    snapshot_symbols: int = 8000
+
+    def update(self, values: dict):
+        names = {f.name for f in fields(self)}
+        for name, value in values.items():
+            if name not in names:
+                raise ValueError(f"Unknown config field: {name}")
+            setattr(self, name, type(getattr(self, name))(value))
+
+
+def _rng(*keys) -> np.random.Generator:
+    """A generator seeded from the request, so repeated requests get the same data."""
+    return np.random.default_rng(zlib.crc32("|".join(map(str, keys)).encode()))
+
+
+def _parse_date(value: str | None, default: datetime.date) -> datetime.date:
+    return datetime.date.fromisoformat(value[:10]) if value else default
+
+
+def _format_times(epochs: np.ndarray, dateformat: str) -> list:
+    if dateformat == "unix":
+        return epochs.astype(np.int64).tolist()
+    local = (epochs - UTC_OFFSET_SECONDS).astype("datetime64[s]")
+    return [f"{t}{UTC_OFFSET}" for t in np.datetime_as_string(local)]
+
+
+def _render(request: web.Request, columns: dict) -> web.Response:
+    """Render parallel column arrays as the API would for the request's format."""
+    if not columns or not len(next(iter(columns.values()))):
+        return web.json_response({"s": "no_data"}, status=404)
+    if request.query.get("format") == "csv":
+        out = io.StringIO()
+        names = list(columns)
+        if request.query.get("headers", "true").lower() != "false":
+            out.write(",".join(names) + "\n")
+        for row in zip(*(columns[n] for n in names)):
+            out.write(
+                ",".join(
+                    ""
+                    if v is None
+                    else (str(v).lower() if isinstance(v, bool) else str(v))
+                    for v in row
+                )
+            )
+            out.write("\n")
+        return web.Response(text=out.getvalue(), content_type="text/csv")
+    return web.Response(
+        body=json.dumps({"s": "ok", **columns}).encode(),
+        content_type="application/json",
+    )
+
+
+def _candle_epochs(
+    resolution: str, from_date: datetime.date, to_date: datetime.date
+) -> np.ndarray:
+    days = np.arange(np.datetime64(from_date), np.datetime64(to_date) + 1)
+    days = days[np.is_busday(days)]
+    day_epochs = days.astype("datetime64[s]").astype(np.int64) + UTC_OFFSET_SECONDS
+    res = resolution.upper()
+    if res.isdigit() or res.endswith("H"):
+        step = int(res.rstrip("H") or 1) * (60 if res.endswith("H") else 1)
+        minutes = np.arange(MARKET_OPEN_MINUTE, MARKET_CLOSE_MINUTE, step) * 60
+        return (day_epochs[:, None] + minutes[None, :]).ravel()
+    return day_epochs
+
+
+def _candles(symbol: str, epochs: np.ndarray, dateformat: str) -> dict:
+    rng = _rng(symbol, len(epochs), epochs[:1].tolist())
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(epochs))))
+    open_ = close * (1 + rng.normal(0, 0.002, len(epochs)))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, len(epochs))))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, len(epochs))))
+    return {
+        "t": _format_times(epochs, dateformat),
+        "o": np.round(open_, 2).tolist(),
+        "h": np.round(high, 2).tolist(),
+        "l": np.round(low, 2).tolist(),
+        "c": np.round(close, 2).tolist(),
+        "v": rng.integers(1_000, 5_000_000, len(epochs)).tolist(),
+    }
+
+
+async def stock_candles(request: web.Request) -> web.Response:
+    query = request.query
+    to_date = _parse_date(query.get("to"), datetime.date.today())
+    from_date = _parse_date(query.get("from"), to_date - datetime.timedelta(days=365))
+    epochs = _candle_epochs(request.match_info["resolution"], from_date, to_date)
+    return _render(
+        request,
+        _candles(request.match_info["symbol"], epochs, query.get("dateformat", "unix")),
+    )
+
+
+async def bulk_candles(request: web.Request) -> web.Response:
+    query = request.query
+    if query.get("snapshot") == "true":
+        symbols = [f"SYM{i:05d}" for i in range(request.app["config"].snapshot_symbols)]
+    else:
+        symbols = [s for s in query.get("symbols", "").split(",") if s]
+    day = _parse_date(query.get("date"), datetime.date.today())
+    epoch = _candle_epochs("D", day, day)
+    if not len(epoch):
+        return web.json_response({"s": "no_data"}, status=404)
+    rows = [
+        _candles(symbol, epoch, query.get("dateformat", "unix")) for symbol in symbols
+    ]
+    columns = {"symbol": symbols}
+    for name in ("t", "o", "h", "l", "c", "v"):
+        columns[name] = [row[name][0] for row in rows]
+    return _render(request, columns)
+
+
+def _quotes(symbols: list, dateformat: str) -> dict:
+    rng = _rng(*symbols[:3], len(symbols))
+    last = np.round(rng.uniform(5, 500, len(symbols)), 2)
+    spread = np.round(last * 0.0005 + 0.01, 2)
+    now = np.full(len(symbols), int(datetime.datetime.now().timestamp()))
+    return {
+        "symbol": symbols,
+        "ask": (last + spread / 2).round(2).tolist(),
+        "askSize": rng.integers(1, 500, len(symbols)).tolist(),
+        "bid": (last - spread / 2).round(2).tolist(),
+        "bidSize": rng.integers(1, 500, len(symbols)).tolist(),
+        "mid": last.tolist(),
+        "last": last.tolist(),
+        "change": np.round(rng.normal(0, 1, len(symbols)), 2).tolist(),
+        "changepct": np.round(rng.normal(0, 0.01, len(symbols)), 4).tolist(),
+        "volume": rng.integers(1_000, 50_000_000, len(symbols)).tolist(),
+        "updated": _format_times(now, dateformat),
+    }
+
+
+async def stock_quotes(request: web.Request) -> web.Response:
+    return _render(
+        request,
+        _quotes(
+            [request.match_info["symbol"]], request.query.get("dateformat", "unix")
+        ),
+    )
+
+
+async def bulk_quotes(request: web.Request) -> web.Response:
+    symbols = [s for s in request.query.get("symbols", "").split(",") if s]
+    return _render(request, _quotes(symbols, request.query.get("dateformat", "unix")))
+
+
+def _chain(underlying: str, expirations: int, strikes: int, dateformat: str) -> dict:
+    rng = _rng(underlying, expirations, strikes)
+    price = float(np.round(rng.uniform(20, 500), 2))
+    today = datetime.date.today()
+    first_friday = today + datetime.timedelta(days=(4 - today.weekday()) % 7 or 7)
+    expiration_days = [
+        first_friday + datetime.timedelta(weeks=i) for i in range(expirations)
+    ]
+    step = max(0.5, round(price * 0.01 * 2) / 2)
+    strike_values = np.round(price + (np.arange(strikes) - strikes // 2) * step, 2)
+
+    exp = np.repeat(np.array(expiration_days, dtype="datetime64[D]"), strikes * 2)
+    strike = np.tile(np.repeat(strike_values, 2), expirations)
+    side = np.tile(np.array(["call", "put"]), expirations * strikes)
+    n = len(strike)
+    dte = (exp - np.datetime64(today)).astype(int)
+    intrinsic = np.where(
+        side == "call", np.maximum(price - strike, 0), np.maximum(strike - price, 0)
+    )
+    extrinsic = np.round(
+        price
+        * 0.02
+        * np.sqrt(np.maximum(dte, 1) / 30)
+        * np.exp(-np.abs(strike - price) / price * 5),
+        2,
+    )
+    mid = np.round(intrinsic + extrinsic, 2)
+    half_spread = np.round(np.maximum(0.01, mid * rng.uniform(0.005, 0.05, n)), 2)
+    exp_epochs = (
+        exp.astype("datetime64[s]").astype(np.int64) + UTC_OFFSET_SECONDS + 16 * 3600
+    )
+    yymmdd = np.char.replace(np.datetime_as_string(exp)[:], "-", "")
+    symbols = [
+        f"{underlying}{d[2:]}{'C' if s == 'call' else 'P'}{int(round(k * 1000)):08d}"
+        for d, s, k in zip(yymmdd, side, strike)
+    ]
+    now = np.full(n, int(datetime.datetime.now().timestamp()))
+    return {
+        "optionSymbol": symbols,
+        "underlying": [underlying] * n,
+        "expiration": _format_times(exp_epochs, dateformat),
+        "side": side.tolist(),
+        "strike": strike.tolist(),
+        "firstTraded": _format_times(exp_epochs - 90 * 86400, dateformat),
+        "dte": dte.tolist(),
+        "updated": _format_times(now, dateformat),
+        "bid": np.maximum(mid - half_spread, 0).round(2).tolist(),
+        "bidSize": rng.integers(1, 200, n).tolist(),
+        "mid": mid.tolist(),
+        "ask": (mid + half_spread).round(2).tolist(),
+        "askSize": rng.integers(1, 200, n).tolist(),
+        "last": mid.tolist(),
+        "openInterest": rng.integers(0, 20_000, n).tolist(),
+        "volume": rng.integers(0, 5_000, n).tolist(),
+        "inTheMoney": (intrinsic > 0).tolist(),
+        "intrinsicValue": np.round(intrinsic, 2).tolist(),
+        "extrinsicValue": extrinsic.tolist(),
+        "underlyingPrice": [price] * n,
+        "iv": np.round(rng.uniform(0.15, 0.9, n), 4).tolist(),
+        "delta": np.round(
+            np.where(side == "call", 1, -1) * rng.uniform(0, 1, n), 4
+        ).tolist(),
+        "gamma": np.round(rng.uniform(0, 0.1, n), 4).tolist(),
+        "theta": np.round(-rng.uniform(0, 0.5, n), 4).tolist(),
+        "vega": np.round(rng.uniform(0, 0.5, n), 4).tolist(),
+    }
+
+
+async def options_chain(request: web.Request) -> web.Response:
+    config = request.app["config"]
+    query = request.query
+    columns = _chain(
+        request.match_info["underlying"],
+        config.chain_expirations,
+        config.chain_strikes,
+        query.get("dateformat", "unix"),
+    )
+    keep = np.ones(len(columns["strike"]), dtype=bool)
+    if query.get("side") in ("call", "put"):
+        keep &= np.array(columns["side"]) == query["side"]
+    indices = np.flatnonzero(keep)
+    offset = int(query.get("offset", 0))
+    limit = int(query["limit"]) if query.get("limit") else None
+    indices = indices[offset : offset + limit if limit else None]
+    return _render(
+        request,
+        {name: [values[i] for i in indices] for name, values in columns.items()},
+    )
+
+
+async def options_quotes(request: web.Request) -> web.Response:
+    option_symbol = request.match_info["option_symbol"]
+    underlying = re.match(r"[A-Z.]+", option_symbol)
+    columns = _chain(
+        underlying.group(0) if underlying else option_symbol,
+        1,
+        1,
+        request.query.get("dateformat", "unix"),
+    )
+    columns["optionSymbol"] = [option_symbol] * len(columns["optionSymbol"])
+    return _render(request, {name: values[:1] for name, values in columns.items()})
+
+
+@web.middleware
+async def faults(request: web.Request, handler):
+    """Simulate network latency, server errors and rate limiting."""
+    if request.path.startswith("/_mock/"):
+        return await handler(request)
+    config: MockConfig = request.app["config"]
+    stats = request.app["stats"]
+    stats["requests"] += 1
+    delay = random.gauss(config.latency, config.jitter)
+    if delay > 0:
+        await asyncio.sleep(delay)
+    roll = random.random()
+    if roll < config.throttle_rate:
+        stats["throttled"] += 1
+        return web.json_response(
+            {"s": "error", "errmsg": "Too many requests"},
+            status=429,
+            headers={"Retry-After": str(config.retry_after)},
+        )
+    if roll < config.throttle_rate + config.error_rate:
+        stats["errors"] += 1
+        return web.json_response(
+            {"s": "error", "errmsg": "Internal server error"}, status=500
+        )
+    response = await handler(request)
+    stats["bytes"] += len(response.body or b"")
+    return response
+
+
+async def get_stats(request: web.Request) -> web.Response:
+    return web.json_response(request.app["stats"])
+
+
+async def update_config(request: web.Request) -> web.Response:
+    request.app["config"].update(await request.json())
+    if request.query.get("reset_stats") == "true":
+        request.app["stats"].update({key: 0 for key in request.app["stats"]})
+    return web.json_response(asdict(request.app["config"]))
+
+
+def create_app(config: MockConfig | None = None) -> web.Application:
+    app = web.Application(middlewares=[faults])
+    app["config"] = config or MockConfig()
+    app["stats"] = {"requests": 0, "errors": 0, "throttled": 0, "bytes": 0}
+    app.router.add_get("/v1/stocks/candles/{resolution}/{symbol}/", stock_candles)
+    app.router.add_get("/v1/stocks/bulkcandles/{resolution}/", bulk_candles)
+    app.router.add_get("/v1/stocks/quotes/{symbol}/", stock_quotes)
+    app.router.add_get("/v1/stocks/bulkquotes/", bulk_quotes)
+    app.router.add_get("/v1/options/chain/{underlying}/", options_chain)
+    app.router.add_get("/v1/options/quotes/{option_symbol}/", options_quotes)
+    app.router.add_get("/_mock/stats", get_stats)
+    app.router.add_post("/_mock/config", update_config)
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8321)
+    config = MockConfig()
+    for f in fields(MockConfig):
+        parser.add_argument(
+            f"--{f.name.replace('_', '-')}", type=type(f.default), default=f.default
+        )
+    args = parser.parse_args()
+    config.update({f.name: getattr(args, f.name) for f in fields(MockConfig)})
+    web.run_app(
+        create_app(config),
+        host=args.host,
+        port=args.port,
+        print=lambda _: None,
+        access_log=None,
+        handle_signals=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
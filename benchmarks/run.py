@@ -0,0 +1,379 @@
+"""
+Offline benchmarks of the clients and the manager against the mock server
+
+Starts benchmarks/mock_server.py in a subprocess and runs each scenario at
+every concurrency level, reporting requests/s, p50/p99 request latency,
+decode time per response, cache hit rates and peak RSS. No API credits are
+used.
+
+    python benchmarks/run.py python benchmarks/run.py --concurrency 1 16 64 --symbols
+    200 --error-rate 0.01 --throttle-rate 0.01 python benchmarks/run.py --scenarios
+    chains --json results.json
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+
+import numpy as np
+from loguru import logger
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+# The clients require a key, which the mock server ignores
+os.environ.setdefault("MARKET_DATA_API_KEY", "benchmark")
+
+from marketdata.client_async import MarketDataAsyncClient  # noqa: E402
+from marketdata.client_params import OptionsChainParams  # noqa: E402
+from marketdata.manager import MarketDataManager  # noqa: E402
+
+# Candle payload sizes: (resolution, days of history)
+CANDLE_PAYLOADS = {
+    "daily_1y": ("D", 365),
+    "daily_10y": ("D", 3650),
+    "5min_1m": ("5", 30),
+    "1min_3m": ("1", 90),
+}
+# Chain payload sizes: (expirations, strikes)
+CHAIN_PAYLOADS = {
+    "chain_small": (4, 20),
+    "chain_large": (16, 100),
+}
+
+
+class MockServer:
+    """The mock server running in a subprocess, so it doesn't compete with the
+    client for the GIL."""
+
+    def __init__(self, **config):
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        args = [
+            sys.executable,
+            os.path.join(ROOT, "benchmarks", "mock_server.py"),
+            "--port",
+            str(self.port),
+        ]
+        for name, value in config.items():
+            args += [f"--{name.replace('_', '-')}", str(value)]
+        self.process = subprocess.Popen(args)
+        self.base_url = f"http://127.0.0.1:{self.port}/v1/"
+        self._wait_until_up()
+
+    def _wait_until_up(self, timeout: float = 15.0):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError("Mock server exited on startup")
+            try:
+                self.stats()
+                return
+            except OSError:
+                time.sleep(0.1)
+        raise TimeoutError("Mock server didn't start")
+
+    def stats(self) -> dict:
+        with urllib.request.urlopen(
+            f"http://127.0.0.1:{self.port}/_mock/stats"
+        ) as response:
+            return json.load(response)
+
+    def configure(self, reset_stats: bool = True, **config):
+        request = urllib.request.Request(
+            f"http://127.0.0.1:{self.port}/_mock/config"
+            f"?reset_stats={str(reset_stats).lower()}",
+            data=json.dumps(config).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        urllib.request.urlopen(request).close()
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait(timeout=10)
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # Peak since the process started, in KiB on Linux and bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if sys.platform == "darwin" else rss * 1024
+
+
+@contextmanager
+def peak_rss(interval: float = 0.01):
+    """Sample the process's RSS while the block runs. Yields a dict whose "peak"
+    holds the highest sample once the block exits."""
+    result = {"peak": _rss_bytes()}
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            result["peak"] = max(result["peak"], _rss_bytes())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield result
+    finally:
+        done.set()
+        sampler.join()
+        result["peak"] = max(result["peak"], _rss_bytes())
+
+
+def instrument(client: MarketDataAsyncClient) -> dict:
+    """Time every request attempt and every response decode of an async client."""
+    timings = {"latency": [], "decode": []}
+    send, decode = client._send, client._decode_frame
+
+    async def timed_send(url, params=None):
+        start = time.perf_counter()
+        try:
+            return await send(url, params)
+        finally:
+            timings["latency"].append(time.perf_counter() - start)
+
+    async def timed_decode(body, content_type=""):
+        start = time.perf_counter()
+        try:
+            return await decode(body, content_type)
+        finally:
+            timings["decode"].append(time.perf_counter() - start)
+
+    client._send = timed_send
+    client._decode_frame = timed_decode
+    return timings
+
+
+def summarize(
+    scenario: str,
+    payload: str,
+    concurrency: int,
+    elapsed: float,
+    timings: dict,
+    server: dict,
+    rss: dict,
+    cache: dict | None = None,
+) -> dict:
+    latency = np.array(timings["latency"]) * 1000
+    decode = np.array(timings["decode"]) * 1000
+    result = {
+        "scenario": scenario,
+        "payload": payload,
+        "concurrency": concurrency,
+        "requests": len(latency),
+        "seconds": round(elapsed, 3),
+        "requests_per_s": round(len(latency) / elapsed, 1) if elapsed else None,
+        "p50_ms": round(float(np.percentile(latency, 50)), 2) if len(latency) else None,
+        "p99_ms": round(float(np.percentile(latency, 99)), 2) if len(latency) else None,
+        "decode_ms": round(float(decode.mean()), 3) if len(decode) else None,
+        "server_errors": server["errors"],
+        "server_throttled": server["throttled"],
+        "mb_received": round(server["bytes"] / 1024**2, 2),
+        "peak_rss_mb": round(rss["peak"] / 1024**2, 1),
+        "cache_hit_rate": None,
+    }
+    if cache:
+        lookups = (
+            cache.get("hits", 0) + cache.get("stale_hits", 0) + cache.get("misses", 0)
+        )
+        result["cache_hit_rate"] = (
+            round((cache.get("hits", 0) + cache.get("stale_hits", 0)) / lookups, 3)
+            if lookups
+            else None
+        )
+    return result
+
+
+def bench_candles(
+    server: MockServer, symbols: list, concurrency: int, payload: str
+) -> dict:
+    resolution, days = CANDLE_PAYLOADS[payload]
+    to_date = datetime.date.today()
+    from_date = to_date - datetime.timedelta(days=days)
+    client = MarketDataAsyncClient(
+        base_url=server.base_url, backoff_base=0.01, backoff_max=0.1
+    )
+    timings = instrument(client)
+    server.configure()
+    with peak_rss() as rss:
+        start = time.perf_counter()
+        client.get_stock_candles_parallel(
+            symbols, resolution, from_date, to_date, max_concurrent=concurrency
+        )
+        elapsed = time.perf_counter() - start
+    return summarize(
+        "candles", payload, concurrency, elapsed, timings, server.stats(), rss
+    )
+
+
+def bench_chains(
+    server: MockServer, symbols: list, concurrency: int, payload: str
+) -> dict:
+    expirations, strikes = CHAIN_PAYLOADS[payload]
+    client = MarketDataAsyncClient(
+        base_url=server.base_url, backoff_base=0.01, backoff_max=0.1
+    )
+    timings = instrument(client)
+    server.configure(chain_expirations=expirations, chain_strikes=strikes)
+    params = [
+        OptionsChainParams(underlying=symbol, expiration="all") for symbol in symbols
+    ]
+    with peak_rss() as rss:
+        start = time.perf_counter()
+        client.get_options_chains_parallel(params, max_concurrent=concurrency)
+        elapsed = time.perf_counter() - start
+    return summarize(
+        "chains", payload, concurrency, elapsed, timings, server.stats(), rss
+    )
+
+
+def bench_manager(
+    server: MockServer, symbols: list, concurrency: int, payload: str
+) -> dict:
+    """A cold get_stock_candles that fills the cache, then warm repeats of a
+    window of it, reported together so the hit rate reflects a typical session."""
+    cache_dir = tempfile.mkdtemp(prefix="marketdata-bench-")
+    try:
+        manager = MarketDataManager(cache_dir=cache_dir, base_url=server.base_url)
+        manager.client_async.backoff_base = 0.01
+        timings = instrument(manager.client_async)
+        server.configure()
+        to_date = datetime.date.today()
+        with peak_rss() as rss:
+            start = time.perf_counter()
+            for days in (365, 90, 30, 30):
+                manager.get_stock_candles(
+                    symbols, "1D", to_date - datetime.timedelta(days=days), to_date
+                )
+            elapsed = time.perf_counter() - start
+        return summarize(
+            "manager_candles",
+            payload,
+            concurrency,
+            elapsed,
+            timings,
+            server.stats(),
+            rss,
+            manager.get_cache_stats(),
+        )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+# name: (benchmark, payload sizes, concurrency levels or None for --concurrency)
+SCENARIOS = {
+    "candles": (bench_candles, list(CANDLE_PAYLOADS), None),
+    "chains": (bench_chains, list(CHAIN_PAYLOADS), None),
+    # The manager fetches with the client's default concurrency
+    "manager": (bench_manager, ["daily_history"], [50]),
+}
+
+
+def print_table(results: list):
+    columns = [
+        "scenario",
+        "payload",
+        "concurrency",
+        "requests",
+        "requests_per_s",
+        "p50_ms",
+        "p99_ms",
+        "decode_ms",
+        "cache_hit_rate",
+        "peak_rss_mb",
+        "mb_received",
+        "server_errors",
+        "server_throttled",
+    ]
+    rows = [[str(r[c]) if r[c] is not None else "-" for c in columns] for r in results]
+    widths = [
+        max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)
+    ]
+    print("  ".join(c.rjust(w) for c, w in zip(columns, widths)))
+    for row in rows:
+        print("  ".join(v.rjust(w) for v, w in zip(row, widths)))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS)
+    )
+    parser.add_argument("--payloads", nargs="+", help="Only run these payload sizes")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32, 128])
+    parser.add_argument(
+        "--symbols", type=int, default=100, help="Symbols (or underlyings) per batch"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="Mean server latency in seconds"
+    )
+    parser.add_argument(
+        "--jitter", type=float, default=0.005, help="Standard deviation of the latency"
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 500",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests answered with a 429",
+    )
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+
+    server = MockServer(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+    )
+    symbols = [f"SYM{i:05d}" for i in range(args.symbols)]
+    results = []
+    try:
+        for name in args.scenarios:
+            bench, payloads, concurrency_levels = SCENARIOS[name]
+            for payload in payloads:
+                if args.payloads and payload not in args.payloads:
+                    continue
+                for concurrency in concurrency_levels or args.concurrency:
+                    result = bench(server, symbols, concurrency, payload)
+                    results.append(result)
+                    print(
+                        f"{name} {payload} x{concurrency}: {result['requests_per_s']} "
+                        "req/s, "
+                        f"p99 {result['p99_ms']} ms",
+                        file=sys.stderr,
+                    )
+    finally:
+        server.stop()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,78 @@
-from .client_async import *
-from .client_params import *
-from .client import *
-from .credentials import *
-from .manager import *
+"""
+marketdata.app API client
+
+Submodules are imported the first time one of their names is used (PEP 562),
+so importing the package doesn't load pandas, aiohttp or the API key.
+"""
+import importlib
+from typing import Any, List
+
+# Public name: the submodule that defines it. Everything else is imported from
+# its submodule, e.g. `from marketdata.store import ParquetCandleStore`.
+_EXPORTS = {
+    # client_async
+    "MarketDataAsyncClient": "client_async",
+    # client_params
+    "BasicParams": "client_params",
+    "FromToParams": "client_params",
+    "OptionsChainParams": "client_params",
+    "OptionsQuoteParams": "client_params",
+    # client
+    "MarketDataClient": "client",
+    "BASE_URL": "client",
+    # credentials
+    "get_api_key": "credentials",
+    "MARKET_DATA_API_KEY": "credentials",
+    # rate_limit
+    "CreditBudgetExceeded": "rate_limit",
+    "RateLimiter": "rate_limit",
+    "get_rate_limiter": "rate_limit",
+    "configure_rate_limiter": "rate_limit",
+    # metrics
+    "MetricsRegistry": "metrics",
+    "PrometheusExporter": "metrics",
+    "get_metrics": "metrics",
+    "enable_metrics": "metrics",
+    # manager
+    "MarketDataManager": "manager",
+}
+
+_SUBMODULES = {
+    "cache",
+    "cache_manifest",
+    "chain_cache",
+    "chain_filter",
+    "client",
+    "client_async",
+    "client_params",
+    "credentials",
+    "decoding",
+    "manager",
+    "market_calendar",
+    "metrics",
+    "rate_limit",
+    "resample",
+    "singleflight",
+    "store",
+}
+
+# The API key is read from the environment when it is used, so it isn't
+# exported by `from marketdata import *`
+__all__ = [name for name in _EXPORTS if name != "MARKET_DATA_API_KEY"]
+
+
+def __getattr__(name: str) -> Any:
+    if name in _SUBMODULES:
+        return importlib.import_module(f".{name}", __name__)
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    if name != "MARKET_DATA_API_KEY":
+        # Later lookups skip __getattr__
+        globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_EXPORTS) | _SUBMODULES)
@@ -0,0 +1,147 @@
+"""
+In-memory caches
+"""
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import pandas as pd
+
+
+def _copy_on_write() -> bool:
+    """Whether pandas copies data shared between DataFrames before modifying it,
+    which is always the case from pandas 3 and optional in pandas 2."""
+    if int(pd.__version__.split(".")[0]) >= 3:
+        return True
+    return pd.get_option("mode.copy_on_write") is True
+
+
+def frame_size(value: Any) -> int:
+    """Measure the memory held by a cached DataFrame, or by the "data" DataFrame
+    of a cache entry dict. Other values are counted as zero bytes."""
+    if isinstance(value, dict):
+        value = value.get("data")
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return 0
+
+
+class LRUCache:
+    """A thread-safe least recently used cache bounded by entry count and/or by
+    the measured size of its values. When either bound is exceeded the least
+    recently used entries are evicted.
+    """
+
+    def __init__(
+        self,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sizeof: Callable[[Any], int] = frame_size,
+    ):
+        """
+        Args:
+            max_entries (int, optional): Maximum number of entries. None means no limit.
+                Defaults to None.
+            max_bytes (int, optional): Maximum total size of the entries as measured by
+                sizeof. None means no limit. Defaults to None.
+            sizeof (Callable[[Any], int], optional): Returns the size of a value in
+                bytes. Defaults to frame_size.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(
+        self,
+        key: Hashable,
+        default: Any = None,
+        covers: Optional[Callable[[Any], bool]] = None,
+    ) -> Any:
+        """Get a cached value, counting a hit or a miss.
+
+        Args:
+            key (Hashable): The key to look up.
+            default (Any, optional): Returned on a miss. Defaults to None.
+            covers (Callable[[Any], bool], optional): Whether the cached value
+                answers the lookup, e.g. covers the requested date range. When it
+                returns False the lookup counts as a miss and default is
+                returned. Defaults to None, which accepts any cached value.
+        """
+        with self._lock:
+            if key in self._data:
+                value = self._data[key]
+                if covers is None or covers(value):
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return default
+
+    def __getitem__(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._data[key]
+            self._data.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        size = self.sizeof(value) if self.max_bytes is not None else 0
+        with self._lock:
+            self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                # Too large to ever fit, so don't push everything else out
+                self.evictions += 1
+                return
+            self._data[key] = value
+            self._sizes[key] = size
+            self._bytes += size
+            self._evict()
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._data.get(key, default)
+            self._remove(key)
+            return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        if key in self._data:
+            del self._data[key]
+            self._bytes -= self._sizes.pop(key)
+
+    def _evict(self) -> None:
+        while self._data and (
+            (self.max_entries is not None and len(self._data) > self.max_entries)
+            or (self.max_bytes is not None and self._bytes > self.max_bytes)
+        ):
+            key, _ = self._data.popitem(last=False)
+            self._bytes -= self._sizes.pop(key)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        """Get the cache hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._data),
+                "bytes": self._bytes,
+            }
@@ -0,0 +1,251 @@
+"""
+Index of the on-disk candle cache
+"""
+import os
+import re
+import sqlite3
+import threading
+import json
+from datetime import date
+from time import time
+from typing import Dict, Iterable, List, Optional
+
+from loguru import logger
+
+# SQLite limits the number of bound parameters in a single statement
+_MAX_QUERY_PARAMS = 900
+
+_LEGACY_CANDLE_FILE = re.compile(
+    r"^(?P<symbol>[^_]+)_(?P<resolution>[^_]+)"
+    r"_(?P<from_date>\d{4}-\d{2}-\d{2})_(?P<to_date>\d{4}-\d{2}-\d{2})\.parquet$"
+)
+_LEGACY_FIRST_AVAILABLE_FILE = re.compile(r"^_first_available_(?P<symbol>.+)\.json$")
+
+
+class CandleCacheManifest:
+    """A SQLite index of the candle cache. There is one row per symbol and
+    resolution holding the cached coverage range, the first date the API has
+    data for, the number of cached rows and the path of the cached data, so
+    cache lookups never have to scan the cache directory.
+    """
+
+    COLUMNS = (
+        "symbol",
+        "resolution",
+        "from_date",
+        "to_date",
+        "first_available",
+        "row_count",
+        "path",
+        "updated_at",
+    )
+
+    def __init__(self, path: str, legacy_dir: Optional[str] = None):
+        """Opens (and creates if needed) the manifest database.
+
+        Args:
+            path (str): Path of the SQLite database file.
+            legacy_dir (str, optional): Cache directory to import when the manifest is
+                first created. Files written before the manifest existed
+                ("{symbol}_{resolution}_{from}_{to}.parquet" and
+                "_first_available_{symbol}.json") are indexed once. Defaults to None.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        is_new = not os.path.exists(path)
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # WAL lets readers in other processes proceed while a write is committed
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS candles (
+                symbol TEXT NOT NULL,
+                resolution TEXT NOT NULL,
+                from_date TEXT,
+                to_date TEXT,
+                first_available TEXT,
+                row_count INTEGER,
+                path TEXT,
+                updated_at REAL,
+                PRIMARY KEY (symbol, resolution)
+            )
+            """
+        )
+        if is_new and legacy_dir:
+            self._import_legacy(legacy_dir)
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _row_to_entry(self, row: tuple) -> dict:
+        entry = dict(zip(self.COLUMNS, row))
+        for key in ("from_date", "to_date", "first_available"):
+            if entry[key] is not None:
+                entry[key] = date.fromisoformat(entry[key])
+        return entry
+
+    def get(self, symbol: str, resolution: str) -> Optional[dict]:
+        """Get the manifest entry for a symbol and resolution.
+
+        Returns:
+            dict | None: The entry with date fields converted to dates, or None if the
+                symbol has never been cached.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM candles WHERE symbol = ? AND "
+                "resolution = ?",
+                (symbol, resolution),
+            ).fetchone()
+        return self._row_to_entry(row) if row else None
+
+    def get_many(self, symbols: Iterable[str], resolution: str) -> Dict[str, dict]:
+        """Get the manifest entries for several symbols of one resolution.
+
+        Returns:
+            Dict[str, dict]: The entries keyed by symbol. Symbols that have never been
+                cached are omitted.
+        """
+        symbols = list(dict.fromkeys(symbols))
+        entries = {}
+        with self._lock:
+            for i in range(0, len(symbols), _MAX_QUERY_PARAMS):
+                chunk = symbols[i : i + _MAX_QUERY_PARAMS]
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(self.COLUMNS)} FROM candles "
+                    "WHERE resolution = ? AND symbol IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    (resolution, *chunk),
+                ).fetchall()
+                for row in rows:
+                    entry = self._row_to_entry(row)
+                    entries[entry["symbol"]] = entry
+        return entries
+
+    def get_resolutions(self, symbol: str) -> List[dict]:
+        """Get the manifest entries for every cached resolution of a symbol."""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM candles WHERE symbol = ?",
+                (symbol,),
+            ).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
+    def record_write(
+        self,
+        symbol: str,
+        resolution: str,
+        from_date: date,
+        to_date: date,
+        row_count: int,
+        path: str,
+    ) -> None:
+        """Record the coverage of freshly written cache data. The update is a
+        single atomic statement, so readers see either the old or the new entry."""
+        self.record_writes([(symbol, resolution, from_date, to_date, row_count, path)])
+
+    def record_writes(self, writes: Iterable[tuple]) -> None:
+        """Record several (symbol, resolution, from_date, to_date, row_count, path)
+        writes in one transaction."""
+        now = time()
+        rows = [
+            (
+                symbol,
+                resolution,
+                from_date.isoformat(),
+                to_date.isoformat(),
+                row_count,
+                path,
+                now,
+            )
+            for symbol, resolution, from_date, to_date, row_count, path in writes
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    """
+                    INSERT INTO candles (
+                        symbol, resolution, from_date, to_date, row_count, path,
+                        updated_at
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (symbol, resolution) DO UPDATE SET
+                        from_date = excluded.from_date,
+                        to_date = excluded.to_date,
+                        row_count = excluded.row_count,
+                        path = excluded.path,
+                        updated_at = excluded.updated_at
+                    """,
+                    rows,
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_first_available(
+        self, symbol: str, resolution: str, first_available: date
+    ) -> None:
+        """Record the first date the API has data for."""
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO candles (symbol, resolution, first_available, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (symbol, resolution) DO UPDATE SET
+                    first_available = excluded.first_available,
+                    updated_at = excluded.updated_at
+                """,
+                (symbol, resolution, first_available.isoformat(), time()),
+            )
+
+    def remove(self, symbol: str, resolution: str) -> None:
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM candles WHERE symbol = ? AND resolution = ?",
+                (symbol, resolution),
+            )
+
+    def _import_legacy(self, legacy_dir: str) -> None:
+        """Index cache files written before the manifest existed."""
+        if not os.path.isdir(legacy_dir):
+            return
+
+        writes = []
+        first_available = []
+        for f in os.listdir(legacy_dir):
+            match = _LEGACY_CANDLE_FILE.match(f)
+            if match:
+                writes.append(
+                    (
+                        match["symbol"],
+                        match["resolution"],
+                        date.fromisoformat(match["from_date"]),
+                        date.fromisoformat(match["to_date"]),
+                        None,
+                        os.path.join(legacy_dir, f),
+                    )
+                )
+                continue
+            match = _LEGACY_FIRST_AVAILABLE_FILE.match(f)
+            if match:
+                with open(os.path.join(legacy_dir, f), "rb") as fp:
+                    for resolution, first_date in json.load(fp).items():
+                        first_available.append(
+                            (
+                                match["symbol"],
+                                resolution,
+                                date.fromisoformat(first_date),
+                            )
+                        )
+
+        if writes:
+            self.record_writes(writes)
+        for symbol, resolution, first_date in first_available:
+            self.set_first_available(symbol, resolution, first_date)
+        if writes or first_available:
+            logger.info(f"Indexed {len(writes)} cached candle files from {legacy_dir}")
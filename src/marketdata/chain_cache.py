@@ -0,0 +1,227 @@
+"""
+Time-to-live cache of options chain responses
+"""
+import copy
+import datetime
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from loguru import logger
+import pandas as pd
+
+from marketdata.cache import LRUCache, _copy_on_write
+from marketdata.client_params import OptionsChainParams
+from marketdata.metrics import MetricsRegistry, get_metrics
+
+# Seconds a chain is served from the cache, by feed. The live feed changes
+# tick to tick, while the cached feed is a snapshot the API refreshes rarely.
+DEFAULT_CHAIN_TTLS = {"live": 5.0, "cached": 3600.0}
+
+# States of a cache lookup
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+def _is_cacheable(data: Any) -> bool:
+    if isinstance(data, pd.DataFrame):
+        return True
+    return isinstance(data, dict) and data.get("s") == "ok"
+
+
+def _copy_chain(data: Any) -> Any:
+    """Copy a chain, so changes to it and to the cached chain don't reach each
+    other. With Copy-on-Write a DataFrame copy shares the data until either is
+    written to."""
+    if isinstance(data, pd.DataFrame):
+        return data.copy(deep=not _copy_on_write())
+    return copy.deepcopy(data)
+
+
+class OptionsChainCache:
+    """A cache of options chains keyed by OptionsChainParams.cache_key(), so
+    parameter sets that request the same chain share one entry.
+
+    Entries expire after the TTL of their feed. Chains looked up for a past date
+    never change and never expire. For stale_ttl seconds after an entry expires
+    it is still served, marked stale, so the caller can return it immediately and
+    refresh it in the background (stale-while-revalidate). DataFrame entries can
+    be persisted to disk so they survive restarts.
+    """
+
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        stale_ttl: float = 30.0,
+        persist_dir: Optional[str] = None,
+        max_entries: Optional[int] = 1024,
+        max_bytes: Optional[int] = 256 * 1024**2,
+        metrics: Optional[MetricsRegistry] = None,
+    ):
+        """
+        Args:
+            ttls (Dict[str, float], optional): Seconds an entry is fresh, by feed
+                ("live" or "cached"). Overrides DEFAULT_CHAIN_TTLS per feed. Defaults to
+                None.
+            stale_ttl (float, optional): Seconds after expiry an entry is still served
+                as stale while it is refreshed. Defaults to 30.0.
+            persist_dir (str, optional): Directory chain DataFrames are also written to,
+                as parquet files. None keeps the cache in memory only. Defaults to None.
+            max_entries (int, optional): Maximum number of chains kept in memory.
+                Defaults to 1024.
+            max_bytes (int, optional): Maximum memory used by the chains kept in memory.
+                Defaults to 256 MiB.
+            metrics (MetricsRegistry, optional): Registry the lookups and fills are
+                recorded in, as the "chain" tier. Defaults to the registry shared by the
+                process.
+        """
+        self.ttls = {**DEFAULT_CHAIN_TTLS, **(ttls or {})}
+        self.stale_ttl = stale_ttl
+        self.persist_dir = persist_dir
+        self.entries = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+        self._lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.metrics = metrics or get_metrics()
+        if persist_dir and not os.path.exists(persist_dir):
+            os.makedirs(persist_dir)
+
+    def ttl_for(self, params: OptionsChainParams) -> Optional[float]:
+        """Get the seconds a chain stays fresh. None means it never expires."""
+        lookup_date = (
+            params.basic_params.params.get("date") if params.basic_params else None
+        )
+        if (
+            lookup_date
+            and datetime.date.fromisoformat(lookup_date) < datetime.date.today()
+        ):
+            return None
+        return self.ttls.get(params.feed or "live", self.ttls["live"])
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.persist_dir or "", f"{key}.parquet")
+
+    def _load(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        try:
+            entry = {"data": pd.read_parquet(path), "stored_at": os.path.getmtime(path)}
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached chain {path}: {e}")
+            os.remove(path)
+            return None
+        self.entries[key] = entry
+        return entry
+
+    def peek(self, params: OptionsChainParams) -> Tuple[Any, str]:
+        """Look up a chain without counting the lookup in the stats. The chain
+        returned is the cached one, not a copy, so it must not be changed.
+
+        Returns:
+            Tuple[Any, str]: The cached chain and FRESH or STALE, or None and MISS.
+        """
+        key = params.cache_key()
+        entry = self.entries.get(key)
+        if entry is None and self.persist_dir:
+            entry = self._load(key)
+        if entry is None:
+            return None, MISS
+
+        ttl = self.ttl_for(params)
+        age = time.time() - entry["stored_at"]
+        if ttl is None or age <= ttl:
+            return entry["data"], FRESH
+        if age <= ttl + self.stale_ttl:
+            return entry["data"], STALE
+        return None, MISS
+
+    def record_lookup(self, state: str) -> None:
+        """Count a lookup that ended in state (FRESH, STALE or MISS)."""
+        with self._lock:
+            if state == FRESH:
+                self.hits += 1
+            elif state == STALE:
+                self.stale_hits += 1
+            else:
+                self.misses += 1
+        self.metrics.record_cache(
+            "chain", {FRESH: "hit", STALE: "stale", MISS: "miss"}[state]
+        )
+
+    def lookup(self, params: OptionsChainParams) -> Tuple[Any, str]:
+        """Look up a chain.
+
+        Returns:
+            Tuple[Any, str]: A copy of the cached chain and FRESH or STALE, or None and
+                MISS.
+        """
+        data, state = self.peek(params)
+        self.record_lookup(state)
+        if state == MISS:
+            return None, MISS
+        return _copy_chain(data), state
+
+    def put(self, params: OptionsChainParams, data: Any) -> None:
+        """Cache a copy of a chain response. Errors and empty responses are not
+        cached."""
+        if not _is_cacheable(data):
+            return
+        key = params.cache_key()
+        self.entries[key] = {"data": _copy_chain(data), "stored_at": time.time()}
+        self.metrics.record_cache("chain", "fill")
+        if self.persist_dir and isinstance(data, pd.DataFrame):
+            path = self._path(key)
+            tmp_path = f"{path}.tmp"
+            try:
+                data.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Could not persist chain for {params.underlying}: {e}")
+
+    def start_refresh(self, params: OptionsChainParams) -> bool:
+        """Claim the refresh of a stale chain. Returns False if it is already
+        being refreshed."""
+        key = params.cache_key()
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def finish_refresh(self, params: OptionsChainParams) -> None:
+        with self._lock:
+            self._refreshing.discard(params.cache_key())
+
+    def invalidate(self, params: Optional[OptionsChainParams] = None) -> None:
+        """Drop one chain from the cache, or every chain if params is None."""
+        keys = [params.cache_key()] if params is not None else None
+        if keys is None:
+            self.entries.clear()
+            if self.persist_dir:
+                keys = [
+                    f[: -len(".parquet")]
+                    for f in os.listdir(self.persist_dir)
+                    if f.endswith(".parquet")
+                ]
+        for key in keys or []:
+            self.entries.pop(key)
+            if self.persist_dir and os.path.exists(self._path(key)):
+                os.remove(self._path(key))
+
+    def stats(self) -> Dict[str, int]:
+        """Get the fresh/stale/miss counters and current in-memory size."""
+        memory = self.entries.stats()
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "refreshing": len(self._refreshing),
+                "entries": memory["entries"],
+                "bytes": memory["bytes"],
+            }
@@ -0,0 +1,281 @@
+"""
+Local filtering of cached options chains
+"""
+import re
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from marketdata.client_params import BasicParams, OptionsChainParams
+from marketdata.store import MARKET_TIMEZONE
+
+# Every OptionsChainParams field that narrows a chain, and the value that
+# doesn't narrow it. A chain fetched with all of them at these values is a
+# superset of the chain for any combination of them.
+SUPERSET_FIELDS = {
+    "from_to_params": None,
+    "expiration": "all",
+    "month": None,
+    "year": None,
+    "weekly": None,
+    "monthly": None,
+    "quarterly": None,
+    "dte": None,
+    "side": "both",
+    "range": "all",
+    "strike": None,
+    "strikeLimit": None,
+    "minOpenInterest": None,
+    "minVolume": None,
+    "maxBidAskSpread": None,
+    "maxBidAskSpreadPct": None,
+    "nonstandard": True,
+    "columns": None,
+}
+
+# Parameters that narrow which expirations are returned. When none are given,
+# the API returns the next monthly expiration only.
+_EXPIRATION_FIELDS = (
+    "expiration",
+    "month",
+    "year",
+    "weekly",
+    "monthly",
+    "quarterly",
+    "dte",
+)
+
+_STRIKE_COMPARISON = re.compile(r"^(>=|<=|>|<)\s*([\d.]+)$")
+_STRIKE_RANGE = re.compile(r"^([\d.]+)\s*-\s*([\d.]+)$")
+_OPTION_ROOT = re.compile(r"^([A-Z.]+\d*?)\d{6}[CP]\d{8}$")
+
+
+def superset_params(params: OptionsChainParams) -> OptionsChainParams:
+    """Get the parameters of the full chain that every filter variation of
+    params selects from: all expirations, strikes and sides, without pagination."""
+    superset = params.make_copy(**SUPERSET_FIELDS)
+    if params.basic_params:
+        basic_params = BasicParams()
+        basic_params.params = {
+            k: v
+            for k, v in params.basic_params.params.items()
+            if k not in ("limit", "offset")
+        }
+        superset.basic_params = basic_params
+    superset.output = "dataframe"
+    return superset
+
+
+def expiration_dates(expiration: pd.Series) -> np.ndarray:
+    """Convert an expiration column (ISO timestamps or unix seconds) to datetime64[D]
+    dates in the market's timezone."""
+    dates: np.ndarray
+    if pd.api.types.is_numeric_dtype(expiration):
+        times = pd.to_datetime(expiration, unit="s", utc=True).dt.tz_convert(
+            MARKET_TIMEZONE
+        )
+        dates = times.dt.tz_localize(None).to_numpy().astype("datetime64[D]")
+    else:
+        dates = expiration.astype(str).str[:10].to_numpy().astype("datetime64[D]")
+    return dates
+
+
+def _expiration_kinds(dates: np.ndarray) -> pd.DataFrame:
+    """Classify each distinct expiration date as monthly, quarterly or weekly."""
+    unique = pd.DatetimeIndex(np.unique(dates))
+    available = set(unique)
+    # Standard monthlies expire on the third Friday, or on the Thursday before
+    # when that Friday is a market holiday
+    third_friday = (unique.weekday == 4) & (unique.day >= 15) & (unique.day <= 21)
+    holiday_thursday = np.array(
+        [
+            d.weekday() == 3
+            and 14 <= d.day <= 20
+            and d + pd.Timedelta(days=1) not in available
+            for d in unique
+        ],
+        dtype=bool,
+    )
+    monthly = third_friday | holiday_thursday
+    # Quarterlies expire on the last trading day of a quarter
+    last_of_month = (
+        pd.Series(unique).groupby(unique.to_period("M")).transform("max").to_numpy()
+    )
+    quarterly = (
+        unique.month.isin([3, 6, 9, 12])
+        & (unique.day >= 24)
+        & (unique.to_numpy() == last_of_month)
+    )
+    return pd.DataFrame(
+        {"monthly": monthly, "quarterly": quarterly, "weekly": ~monthly & ~quarterly},
+        index=unique.to_numpy().astype("datetime64[D]"),
+    )
+
+
+def _strike_mask(strikes: np.ndarray, strike: Union[float, str]) -> np.ndarray:
+    if isinstance(strike, (int, float)):
+        close: np.ndarray = np.isclose(strikes, float(strike))
+        return close
+    strike = str(strike).strip()
+    match = _STRIKE_RANGE.match(strike)
+    if match:
+        return (strikes >= float(match.group(1))) & (strikes <= float(match.group(2)))
+    match = _STRIKE_COMPARISON.match(strike)
+    if match:
+        op, value = match.group(1), float(match.group(2))
+        return {
+            ">": strikes > value,
+            ">=": strikes >= value,
+            "<": strikes < value,
+            "<=": strikes <= value,
+        }[op]
+    return np.isin(strikes, [float(s) for s in strike.split(",")])
+
+
+def _is_nonstandard(chain: pd.DataFrame) -> np.ndarray:
+    """Adjusted (nonstandard) contracts have an option root that differs from
+    the underlying's symbol, e.g. AAPL1."""
+    roots = chain["optionSymbol"].astype(str).str.extract(_OPTION_ROOT, expand=False)
+    underlying = chain["underlying"].astype(str)
+    nonstandard: np.ndarray = (roots.notna() & (roots != underlying)).to_numpy()
+    return nonstandard
+
+
+def filter_chain(chain: pd.DataFrame, params: OptionsChainParams) -> pd.DataFrame:
+    """Apply the filters of params to a chain fetched with superset_params(params),
+    with the same semantics as the API applies them.
+
+    Args:
+        chain (pd.DataFrame): The superset chain.
+        params (OptionsChainParams): The parameters to filter by.
+
+    Returns:
+        pd.DataFrame: The rows and columns of chain that the API would have returned for
+            params.
+    """
+    mask = np.ones(len(chain), dtype=bool)
+    if len(chain) == 0:
+        return chain.copy()
+
+    if params.side in ("call", "put"):
+        mask &= (chain["side"] == params.side).to_numpy()
+    if params.range in ("itm", "otm"):
+        mask &= chain["inTheMoney"].to_numpy(dtype=bool) == (params.range == "itm")
+    if not params.nonstandard and "optionSymbol" in chain:
+        mask &= ~_is_nonstandard(chain)
+
+    strikes = chain["strike"].to_numpy(dtype=np.float64)
+    if params.strike is not None:
+        mask &= _strike_mask(strikes, params.strike)
+    if params.minOpenInterest is not None:
+        mask &= chain["openInterest"].to_numpy() >= params.minOpenInterest
+    if params.minVolume is not None:
+        mask &= chain["volume"].to_numpy() >= params.minVolume
+    if params.maxBidAskSpread is not None or params.maxBidAskSpreadPct is not None:
+        spread = chain["ask"].to_numpy(dtype=np.float64) - chain["bid"].to_numpy(
+            dtype=np.float64
+        )
+        if params.maxBidAskSpread is not None:
+            mask &= spread <= params.maxBidAskSpread
+        if params.maxBidAskSpreadPct is not None:
+            # A percentage of the underlying's price
+            mask &= (
+                spread / chain["underlyingPrice"].to_numpy(dtype=np.float64) * 100
+                <= params.maxBidAskSpreadPct
+            )
+
+    mask &= _expiration_mask(chain, params, mask)
+
+    if params.strikeLimit is not None:
+        # Keep the strikeLimit strikes closest to the underlying's price
+        selected = np.unique(strikes[mask])
+        price = (
+            np.nanmedian(chain["underlyingPrice"].to_numpy(dtype=np.float64)[mask])
+            if mask.any()
+            else 0.0
+        )
+        nearest = selected[
+            np.argsort(np.abs(selected - price), kind="stable")[: params.strikeLimit]
+        ]
+        mask &= np.isin(strikes, nearest)
+
+    filtered = chain[mask]
+    if params.basic_params:
+        offset = params.basic_params.params.get("offset") or 0
+        limit = params.basic_params.params.get("limit")
+        filtered = filtered.iloc[offset : offset + limit if limit else None]
+    if params.columns:
+        filtered = filtered[
+            [c for c in params.columns.split(",") if c in filtered.columns]
+        ]
+    return filtered.reset_index(drop=True)
+
+
+def _expiration_mask(
+    chain: pd.DataFrame, params: OptionsChainParams, mask: np.ndarray
+) -> np.ndarray:
+    dates = expiration_dates(chain["expiration"])
+    expiration_mask = np.ones(len(chain), dtype=bool)
+
+    if params.from_to_params:
+        # On the chain endpoint from/to limit the expiration dates
+        if "from" in params.from_to_params.params:
+            expiration_mask &= dates >= np.datetime64(
+                params.from_to_params.params["from"]
+            )
+        if "to" in params.from_to_params.params:
+            expiration_mask &= dates <= np.datetime64(
+                params.from_to_params.params["to"]
+            )
+
+    if params.expiration is not None and params.expiration != "all":
+        expiration_mask &= dates == np.datetime64(str(params.expiration)[:10])
+    if params.month is not None:
+        expiration_mask &= (
+            dates.astype("datetime64[M]").astype(int) % 12 + 1 == params.month
+        )
+    if params.year is not None:
+        expiration_mask &= (
+            dates.astype("datetime64[Y]").astype(int) + 1970 == params.year
+        )
+
+    included = [k for k in ("weekly", "monthly", "quarterly") if getattr(params, k)]
+    excluded = [
+        k for k in ("weekly", "monthly", "quarterly") if getattr(params, k) is False
+    ]
+    if included or excluded:
+        kinds = _expiration_kinds(dates).reindex(dates)
+        if included:
+            expiration_mask &= kinds[included].to_numpy().any(axis=1)
+        if excluded:
+            expiration_mask &= ~kinds[excluded].to_numpy().any(axis=1)
+
+    if params.dte is not None:
+        # A single expiration, the one closest to dte days out
+        candidates = mask & expiration_mask
+        if candidates.any():
+            dte = chain["dte"].to_numpy()
+            distance = np.abs(dte[candidates] - params.dte)
+            closest = dates[candidates][np.lexsort((dates[candidates], distance))[0]]
+            expiration_mask &= dates == closest
+    elif (
+        all(getattr(params, f) is None for f in _EXPIRATION_FIELDS)
+        and not params.from_to_params
+    ):
+        expiration_mask &= dates == _next_monthly(dates[mask & expiration_mask])
+
+    return expiration_mask
+
+
+def _next_monthly(dates: np.ndarray) -> Optional[np.datetime64]:
+    if len(dates) == 0:
+        return None
+    kinds = _expiration_kinds(dates)
+    monthlies = kinds.index[kinds["monthly"].to_numpy()]
+    first: np.datetime64 = (
+        (monthlies[0] if len(monthlies) else kinds.index[0])
+        .to_datetime64()
+        .astype("datetime64[D]")
+    )
+    return first
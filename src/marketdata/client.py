@@ -2,52 +2,351 @@
 marketdata.app API Client
 """
 import os
-from time import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from time import perf_counter, sleep, time
+from typing import TYPE_CHECKING, Any, Callable, Deque, Iterator, Mapping, Tuple
 from urllib.parse import urlencode
 import requests
+from requests.adapters import HTTPAdapter
 import datetime
-import json
-import hashlib
- 
-import numpy as np
-import pandas as pd
+
 from loguru import logger
-import pandas as pd
 
 from marketdata.client_params import BasicParams, FromToParams, OptionsChainParams
-from marketdata.credentials import MARKET_DATA_API_KEY
+from marketdata.credentials import get_api_key
+from marketdata.metrics import MetricsRegistry, get_metrics
+from marketdata.rate_limit import (
+    RateLimiter,
+    endpoint_name,
+    estimate_credits,
+    get_rate_limiter,
+)
+from marketdata.singleflight import SingleFlight, request_key
+
+if TYPE_CHECKING:
+    # pandas is imported when a response is decoded into a DataFrame, so
+    # scripts that only use raw output don't pay for importing it
+    import pandas as pd
+
+BASE_URL = "https://api.marketdata.app/v1/"
+
+# Number of results per page when paging through an endpoint
+DEFAULT_PAGE_SIZE = 500
+
+# Responses that are worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+def retry_after(status: int, headers: Mapping[str, str]) -> float | None:
+    """Get the delay in seconds requested by the Retry-After header of a 429 or
+    503 response, or None when it doesn't ask for one."""
+    if status not in (429, 503):
+        return None
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time())
 
-BASE_URL = 'https://api.marketdata.app/v1/'
 
 class MarketDataClient:
-    
-    def __init__(self) -> None:
-        self.BASE_URL = 'https://api.marketdata.app/v1/'
-        self.api_key = MARKET_DATA_API_KEY
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_key}'
-        }
+    def __init__(
+        self,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float | None = 30.0,
+        rate_limiter: RateLimiter | None = None,
+        coalesce: bool = True,
+        base_url: str = BASE_URL,
+        metrics: MetricsRegistry | None = None,
+        api_key: str | None = None,
+    ) -> None:
+        """Initializes the client. All endpoint methods share one pooled
+        requests.Session, so connections are kept alive and reused between calls.
+
+        Args:
+            pool_connections (int, optional): Number of host connection pools to cache.
+                Defaults to 10.
+            pool_maxsize (int, optional): Maximum number of connections kept in each
+                pool. Raise this when the client is shared between many threads.
+                Defaults to 10.
+            max_retries (int, optional): Number of times a failed request (connection
+                errors and 429/5xx responses) is retried. Defaults to 3.
+            backoff_factor (float, optional): Exponential backoff factor between
+                retries, in seconds. Defaults to 0.5.
+            timeout (float, optional): Timeout in seconds for each request. Defaults to
+                30.0.
+            rate_limiter (RateLimiter, optional): Limiter for the request rate and
+                credit budget. Defaults to the limiter shared by all clients in the
+                process.
+            coalesce (bool, optional): When the client is shared between threads, share
+                one in-flight request between concurrent identical requests (same URL
+                and parameters) instead of sending each of them. Defaults to True.
+            base_url (str, optional): Root URL of the v1 API, e.g. a local mock server
+                for benchmarks. Defaults to BASE_URL.
+            metrics (MetricsRegistry, optional): Registry the request latency, bytes,
+                status codes, retries and rate limiter waits are recorded in. Defaults
+                to the registry shared by all clients in the process.
+            api_key (str, optional): The marketdata.app API key. Defaults to the
+                MARKET_DATA_API_KEY environment variable, read when the first request is
+                sent.
+        """
+        self.BASE_URL = base_url if base_url.endswith("/") else base_url + "/"
+        self._api_key = api_key
         self.api_calls = 0
-    
+        self.metrics = metrics or get_metrics()
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.coalesce = coalesce
+        self._in_flight = SingleFlight()
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        # Retries are sent by _send rather than by urllib3, so each one goes
+        # through the rate limiter
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=0,
+        )
+        # The Authorization header is added by the first request, see _send
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def api_key(self) -> str:
+        """The API key, read from the environment on first use unless one was given."""
+        if self._api_key is None:
+            self._api_key = get_api_key()
+        return self._api_key
+
+    @property
+    def headers(self) -> dict:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+    def __enter__(self) -> "MarketDataClient":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the pooled session and release all of its connections."""
+        self.session.close()
+
+    def _get(self, url: str, params: dict | None = None) -> requests.Response:
+        """Send a GET request, sharing the response of an identical request that
+        another thread already has in flight."""
+        if not self.coalesce:
+            return self._send(url, params)
+        return self._in_flight.do(
+            request_key(url, params), lambda: self._send(url, params)
+        )
+
+    def _send(self, url: str, params: dict | None = None) -> requests.Response:
+        """Send a GET request through the pooled session once the rate limiter
+        allows it, retrying connection errors, timeouts and 429/5xx responses
+        with exponential backoff. Every attempt goes through the rate limiter.
+
+        Raises:
+            requests.ConnectionError, requests.Timeout: The last error when every
+                attempt failed to get a response.
+        """
+        endpoint = endpoint_name(url)
+        credits = estimate_credits(endpoint, params)
+        metrics = self.metrics
+        if "Authorization" not in self.session.headers:
+            self.session.headers.update(self.headers)
+        delay: float | None
+        for attempt in range(self.max_retries + 1):
+            queued_at = perf_counter()
+            self.rate_limiter.acquire(endpoint, credits)
+            sent_at = perf_counter()
+            metrics.observe_queue_wait("rate_limiter", endpoint, sent_at - queued_at)
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # No response, so nothing was charged
+                self.rate_limiter.refund(endpoint, credits)
+                if attempt == self.max_retries:
+                    raise
+                metrics.record_retry(endpoint, type(e).__name__)
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"{endpoint} request failed ({type(e).__name__}: {e}). Retrying "
+                    f"in {delay:.1f}s"
+                )
+                sleep(delay)
+                continue
+
+            self.api_calls += 1
+            metrics.observe_request(
+                endpoint,
+                perf_counter() - sent_at,
+                response.status_code,
+                len(response.content),
+            )
+            self.rate_limiter.record_usage(
+                endpoint, credits, response.headers, response.status_code
+            )
+            if (
+                response.status_code in RETRY_STATUS_CODES
+                and attempt < self.max_retries
+            ):
+                metrics.record_retry(endpoint, response.status_code)
+                delay = retry_after(response.status_code, response.headers)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    f"{endpoint} returned status {response.status_code}. Retrying in "
+                    f"{delay:.1f}s"
+                )
+                response.close()
+                sleep(delay)
+                continue
+            return response
+        # The last attempt always returns or raises
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff: backoff_factor, then twice that, and so on."""
+        return self.backoff_factor * 2.0**attempt
+
+    def iter_pages(
+        self,
+        fetch: Callable[[BasicParams], Any],
+        basic_params: BasicParams | None = None,
+        page_size: int | None = None,
+        prefetch: int = 2,
+    ) -> Iterator["pd.DataFrame"]:
+        """Walk the limit/offset pages of an endpoint, yielding each page as a
+        DataFrame as soon as it arrives. Up to prefetch pages are requested ahead
+        on worker threads while the caller processes the current one, so memory
+        stays bounded by the page size rather than the size of the result set.
+
+        Args:
+            fetch (Callable[[BasicParams], Any]): Requests one page. Called with a copy
+                of basic_params selecting the page and returns the endpoint method's
+                (data, status_code).
+            basic_params (BasicParams, optional): See BasicParams class. Its offset is
+                the first page's offset. Defaults to None.
+            page_size (int, optional): Number of results per page. Defaults to the limit
+                of basic_params.
+            prefetch (int, optional): Number of pages requested concurrently. Defaults
+                to 2.
+
+        Yields:
+            pd.DataFrame: The pages, in order. Iteration stops at the first short, empty
+                or failed page.
+        """
+        import pandas as pd
+
+        basic_params = basic_params or BasicParams()
+        limit: int = page_size or basic_params.params.get("limit") or DEFAULT_PAGE_SIZE
+        next_offset: int = basic_params.params.get("offset", 0)
+        pending: Deque[Tuple[int, Future]] = deque()
+        executor = ThreadPoolExecutor(max_workers=max(1, prefetch))
+
+        def request_page() -> None:
+            nonlocal next_offset
+            future = executor.submit(fetch, basic_params.with_page(next_offset, limit))
+            pending.append((next_offset, future))
+            next_offset += limit
+
+        try:
+            for _ in range(max(1, prefetch)):
+                request_page()
+            while pending:
+                offset, future = pending.popleft()
+                data, status_code = future.result()
+                if not isinstance(data, pd.DataFrame):
+                    if not (isinstance(data, dict) and data.get("s") == "no_data"):
+                        logger.error(
+                            f"Error fetching page at offset {offset}. Status code: "
+                            f"{status_code}"
+                        )
+                        logger.error(data)
+                    break
+                if len(data) < limit:
+                    # A short page is the last one
+                    if not data.empty:
+                        yield data
+                    break
+                request_page()
+                yield data
+        finally:
+            # Don't send the pages requested past the end
+            for _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+
+    def iter_options_chain(
+        self,
+        params: OptionsChainParams,
+        page_size: int | None = None,
+        prefetch: int = 2,
+    ) -> Iterator["pd.DataFrame"]:
+        """Get an options chain page by page. See iter_pages."""
+        return self.iter_pages(
+            lambda page_params: self.get_options_chain(
+                params.make_copy(basic_params=page_params, output="dataframe")
+            ),
+            params.basic_params,
+            page_size,
+            prefetch,
+        )
+
+    def iter_stock_news(
+        self,
+        symbol: str,
+        basic_params: BasicParams | None = None,
+        from_to_params: FromToParams | None = None,
+        page_size: int | None = None,
+        prefetch: int = 2,
+    ) -> Iterator["pd.DataFrame"]:
+        """Get the news for a symbol page by page. See iter_pages."""
+        return self.iter_pages(
+            lambda page_params: self.get_stock_news(
+                symbol, page_params, from_to_params
+            ),
+            basic_params,
+            page_size,
+            prefetch,
+        )
+
     def handle_response(self, response, output):
         try:
             if output == "raw":
                 return response.json(), response.status_code
             elif output == "dataframe":
                 if 200 <= response.status_code < 300:
-                    df = pd.DataFrame(response.json())
-                    try:
-                        df.drop(columns=['s'], inplace=True)
-                    except KeyError:
-                        pass
-                    return df, response.status_code
+                    from marketdata.decoding import decode_body
+
+                    return (
+                        decode_body(
+                            response.content, response.headers.get("Content-Type", "")
+                        ),
+                        response.status_code,
+                    )
                 else:
-                    return response.json(), response.status_code                
+                    return response.json(), response.status_code
         # Handle the case where the response is not JSON
         except ValueError:
             return response.text, response.status_code
-    
+
     # /v1/funds/candles/{resolution}/{symbol}/
     def get_fund_candles(
         self,
@@ -56,20 +355,19 @@ class MarketDataClient:
         basic_params: BasicParams | None = None,
         from_to_params: FromToParams | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'funds/candles/{resolution}/{symbol}/'
+        url = self.BASE_URL + f"funds/candles/{resolution}/{symbol}/"
         params = {}
-        
+
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
         if columns:
-            params['columns'] = columns
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+            params["columns"] = columns
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/indices/candles/{resolution}/{symbol}/
@@ -80,20 +378,19 @@ class MarketDataClient:
         basic_params: BasicParams | None = None,
         from_to_params: FromToParams | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'indices/candles/{resolution}/{symbol}/'
+        url = self.BASE_URL + f"indices/candles/{resolution}/{symbol}/"
         params = {}
-        
+
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
         if columns:
-            params['columns'] = columns
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+            params["columns"] = columns
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/indicies/quotes/{symbol}/
@@ -102,58 +399,58 @@ class MarketDataClient:
         symbol: str,
         basic_params: BasicParams | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'indices/quotes/{symbol}/'
+        url = self.BASE_URL + f"indices/quotes/{symbol}/"
         params = {}
-        
+
         if basic_params:
             params.update(basic_params.params)
         if columns:
-            params['columns'] = columns
-        
+            params["columns"] = columns
+
         # Remove the lookup_date parameter if it exists
-        if isinstance(basic_params, dict) and basic_params.get('lookup_date'):
-            del basic_params['lookup_date']
-            logger.warning("The lookup_date parameter is not supported for this endpoint. It will be ignored.")
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+        if isinstance(basic_params, dict) and basic_params.get("lookup_date"):
+            del basic_params["lookup_date"]
+            logger.warning(
+                "The lookup_date parameter is not supported for this endpoint. It will be ignored."
+            )
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
-            
+
     # /v1/markets/status/
     def get_markets_status(
         self,
         basic_params: BasicParams | None = None,
         from_to_params: FromToParams | None = None,
         country: str = "US",
-        output = "dataframe"
+        output="dataframe",
     ) -> dict | str:
         """Get market status ("open" or "closed") for a date or range of dates.
 
         Args:
-            
+
             basic_params (BasicParams, optional): See BasicParams class. Defaults to None.
             from_to_params (FromToParams, optional): See FromToParams class. Defaults to None.
             country (str, optional): Use to specify the country of the exchange. Use the two digit ISO 3166 country code. Defaults to "US".
             output (str, optional): The output format. Can be "dataframe", which is a pandas dataframe or "raw", which is the raw JSON response. Defaults to "dataframe".
-            
+
         Returns:
             dict, str: Returns the raw data and the status code.
         """
-        url = BASE_URL + 'markets/status/'
-        
+        url = self.BASE_URL + "markets/status/"
+
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
-        params['country'] = country
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+        params["country"] = country
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
-        
+
     # /v1/options/chain/{underlying}/
     def get_options_chain(self, params: OptionsChainParams):
         """Get options chain for a symbol.
@@ -164,25 +461,24 @@ class MarketDataClient:
         Returns:
             dict, str: Returns the raw data as a dictionary or an error message.
         """
-        url = BASE_URL + f'options/chain/{params.underlying}/'
+        url = self.BASE_URL + f"options/chain/{params.underlying}/"
         request_params = params.to_dict()
 
         # Remove 'underlying' and 'id' from request_params as they're not needed in the API call
-        request_params.pop('underlying', None)
-        request_params.pop('id', None)
+        request_params.pop("underlying", None)
+        request_params.pop("id", None)
 
         # Handle nested objects
         if params.basic_params:
             request_params.update(params.basic_params.params)
-            request_params.pop('basic_params', None)
+            request_params.pop("basic_params", None)
         if params.from_to_params:
             request_params.update(params.from_to_params.params)
-            request_params.pop('from_to_params', None)
+            request_params.pop("from_to_params", None)
 
         logger.warning(f"Debug - Full URL: {url}?{urlencode(request_params)}")
         url = f"{url}?{urlencode(request_params)}"
-        response = requests.get(url, headers=self.headers)
-        self.api_calls += 1
+        response = self._get(url)
         return self.handle_response(response, params.output)
 
     # /v1/options/expirations/{underlying}/
@@ -192,25 +488,22 @@ class MarketDataClient:
         basic_params: BasicParams | None = None,
         strike: float | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'options/expirations/{underlying}/'
+        url = self.BASE_URL + f"options/expirations/{underlying}/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if strike:
-            params['strike'] = strike
+            params["strike"] = strike
         if columns:
-            params['columns'] = columns
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+            params["columns"] = columns
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
-    
 
     # /v1/options/lookup/{userInput}/
     # This doesn't work in the Swagger UI, so not implemented here
-        
 
     # /v1/options/quotes/{optionSymbol}/
     def get_options_quotes(
@@ -219,21 +512,19 @@ class MarketDataClient:
         basic_params: BasicParams | None = None,
         from_to_params: FromToParams | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'options/quotes/{option_symbol}/'
+        url = self.BASE_URL + f"options/quotes/{option_symbol}/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
         if columns:
-            params['columns'] = columns
+            params["columns"] = columns
 
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+        response = self._get(url, params)
         return self.handle_response(response, output)
-        
 
     # /v1/options/strikes/{underlying}/
     def get_options_strikes(
@@ -242,10 +533,10 @@ class MarketDataClient:
         basic_params: BasicParams | None = None,
         expiration_date: datetime.date | None = None,
         columns: str = None,
-        output: str = "dataframe"
+        output: str = "dataframe",
     ):
         """Get a list of current or historical options strikes for an underlying
-        symbol. If no optional parameters are used, the endpoint returns the 
+        symbol. If no optional parameters are used, the endpoint returns the
         strikes for every expiration in the chain.
 
         Args:
@@ -258,19 +549,17 @@ class MarketDataClient:
         Returns:
             _type_: _description_
         """
-        url = BASE_URL + f'options/strikes/{underlying}/'
+        url = self.BASE_URL + f"options/strikes/{underlying}/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if expiration_date:
-            params['expiration'] = expiration_date.strftime('%Y-%m-%d')
+            params["expiration"] = expiration_date.strftime("%Y-%m-%d")
         if columns:
-            params['columns'] = columns
-            
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+            params["columns"] = columns
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
-    
 
     # /v1/stocks/bulkcandles/{resolution}/
     def get_bulk_stock_candles(
@@ -284,31 +573,36 @@ class MarketDataClient:
         adjust_splits: bool = None,
         adjust_dividends: bool = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        """This seems to be incorrectly implemented in the API. Can't get
-        it to work and the Swagger UI gives invalid input fields.
+        """Get daily candles for multiple symbols in one request. With snapshot=True
+        the symbols are ignored and one candle is returned for every symbol in
+        the market, for the day in basic_params (lookup_date) or the latest session.
+
+        The Swagger UI gives invalid input fields for this endpoint, so not every
+        parameter combination has been verified against the API.
         """
-        url = BASE_URL + f'stocks/bulkcandles/daily/'
+        url = self.BASE_URL + f"stocks/bulkcandles/daily/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
         if exchange:
-            params['exchange'] = exchange
+            params["exchange"] = exchange
         if adjust_splits:
-            params['adjust_splits'] = adjust_splits
+            params["adjust_splits"] = adjust_splits
         if adjust_dividends:
-            params['adjust_dividends'] = adjust_dividends
+            params["adjust_dividends"] = adjust_dividends
         if columns:
-            params['columns'] = columns
-        params['symbols'] = ','.join(symbols)
-        params['country'] = country
-        params['snapshot'] = snapshot
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+            params["columns"] = columns
+        if snapshot:
+            params["snapshot"] = "true"
+        else:
+            params["symbols"] = ",".join(symbols)
+        params["country"] = country
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/stocks/bulkquotes/
@@ -317,24 +611,25 @@ class MarketDataClient:
         symbols: list[str],
         basic_params: BasicParams | None = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + 'stocks/bulkquotes/'
+        url = self.BASE_URL + "stocks/bulkquotes/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if columns:
-            params['columns'] = columns
-        params['symbols'] = ','.join(symbols)
-        
+            params["columns"] = columns
+        params["symbols"] = ",".join(symbols)
+
         # If the lookup_date is in the params, remove it
-        if isinstance(basic_params, dict) and basic_params.get('lookup_date'):
-            del basic_params['lookup_date']
-            logger.warning("The lookup_date parameter is not supported for this endpoint. It will be ignored.")
-        
-        response = requests.get(url, headers=self.headers, params=params)
+        if isinstance(basic_params, dict) and basic_params.get("lookup_date"):
+            del basic_params["lookup_date"]
+            logger.warning(
+                "The lookup_date parameter is not supported for this endpoint. It will be ignored."
+            )
+
         # TODO: Verify that this is actually counted as a single API call
-        self.api_calls += 1
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/stocks/candles/{resolution}/{symbol}/
@@ -350,10 +645,10 @@ class MarketDataClient:
         exchange_country: str = "US",
         adjust_splits: bool = None,
         adjust_dividends: bool = None,
-        output = "dataframe"
+        output="dataframe",
     ):
         """Get historical stock candles for a symbol.
-        
+
         Args:
             symbol (str): The company's ticker symbol. If no exchange is specified, by default a US exchange will be assumed. You may embed the exchange in the ticker symbol using the Yahoo Finance or TradingView formats. Ticker Formats: (TICKER, TICKER.EX, EXCHANGE:TICKER)
             resolution (str, optional): The duration of each candle. Minutely Resolutions: (1, 3, 5, 15, 30, 45, ...) Hourly Resolutions: (H, 1H, 2H, ...) Daily Resolutions: (D, 1D, 2D, ...) Weekly Resolutions: (W, 1W, 2W, ...) Monthly Resolutions: (M, 1M, 2M, ...) Yearly Resolutions:(Y, 1Y, 2Y, ...)'). Defaults to "1D".
@@ -369,43 +664,42 @@ class MarketDataClient:
         Returns:
             _type_: _description_
         """
-        
-        url = BASE_URL + f'stocks/candles/{resolution}/{symbol}/'
+
+        url = self.BASE_URL + f"stocks/candles/{resolution}/{symbol}/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
-            
+
         options = {
-            'columns': columns,
-            'exchange': exchange,
-            'extended_hours': extended_hours,
-            'exchange_country': exchange_country,
-            'adjust_splits': adjust_splits,
-            'adjust_dividends': adjust_dividends
+            "columns": columns,
+            "exchange": exchange,
+            "extended_hours": extended_hours,
+            "exchange_country": exchange_country,
+            "adjust_splits": adjust_splits,
+            "adjust_dividends": adjust_dividends,
         }
-        
+
         # Update params with non-None options
         for key, value in options.items():
             if value is not None:
                 params[key] = value
 
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+        response = self._get(url, params)
         return self.handle_response(response, output)
-    
+
     # /v1/stocks/earnings/{symbol}/
     def get_earnings(
-            self,
-            symbol: str,
-            basic_params: BasicParams | None = None,
-            from_to_params: FromToParams | None = None,
-            report: str = None,
-            columns: str = None,
-            output: str = "dataframe"
-        ):
-        url = BASE_URL + f'stocks/earnings/{symbol}/'
+        self,
+        symbol: str,
+        basic_params: BasicParams | None = None,
+        from_to_params: FromToParams | None = None,
+        report: str = None,
+        columns: str = None,
+        output: str = "dataframe",
+    ):
+        url = self.BASE_URL + f"stocks/earnings/{symbol}/"
         params = {}
 
         # Unpack parameters from objects if they are not None
@@ -415,11 +709,10 @@ class MarketDataClient:
             params.update(from_to_params.params)
 
         # Update params with other optional parameters if they are not None
-        optional_params = {'report': report, 'columns': columns}
+        optional_params = {"report": report, "columns": columns}
         params.update({k: v for k, v in optional_params.items() if v is not None})
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/stocks/news/{symbol}/
@@ -427,19 +720,18 @@ class MarketDataClient:
         self,
         symbol: str,
         basic_params: BasicParams = None,
-        from_to_params: FromToParams = None,
-        output = "dataframe"
+        from_to_params: FromToParams | None = None,
+        output="dataframe",
     ):
-        url = BASE_URL + f'stocks/news/{symbol}/'
+        url = self.BASE_URL + f"stocks/news/{symbol}/"
         params = {}
-        
+
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
 
     # /v1/stocks/quotes/{symbol}/
@@ -448,22 +740,20 @@ class MarketDataClient:
         symbol: str,
         basic_params: BasicParams = None,
         columns: str = None,
-        output = "dataframe"
+        output="dataframe",
     ):
-        url = BASE_URL + f'stocks/quotes/{symbol}/'
+        url = self.BASE_URL + f"stocks/quotes/{symbol}/"
         params = {}
-        
+
         if basic_params:
             params.update(basic_params.params)
         if columns:
-            params['columns'] = columns
-        
+            params["columns"] = columns
+
         # This is one of the few API calls that does not have a lookup_date,
         # so we need to remove it if it exists
-        if isinstance(basic_params, dict) and basic_params.get('lookup_date'):
-            del basic_params['lookup_date']
-        
-        response = requests.get(url, headers=self.headers, params=params)
-        self.api_calls += 1
+        if isinstance(basic_params, dict) and basic_params.get("lookup_date"):
+            del basic_params["lookup_date"]
+
+        response = self._get(url, params)
         return self.handle_response(response, output)
-    
\ No newline at end of file
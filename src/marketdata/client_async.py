@@ -2,9 +2,10 @@
 marketdata.app API Client
 """
 import os
+import random
 import sys
-from time import time
-from urllib.parse import urlencode
+from time import perf_counter, time
+from urllib.parse import quote, urlencode
 import datetime
 
 
@@ -15,25 +16,467 @@ import pandas as pd
 import aiohttp
 from aiohttp import TCPConnector, ClientSession
 import asyncio
-from typing import Any, Dict, List, Optional, Tuple
+from collections import deque
+from itertools import islice
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Coroutine,
+    Deque,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 import datetime
 
-from marketdata import BasicParams, FromToParams
-from marketdata import MARKET_DATA_API_KEY
-from marketdata.client_params import OptionsChainParams, OptionsQuoteParams
+from marketdata.credentials import get_api_key
+from marketdata.client import DEFAULT_PAGE_SIZE, RETRY_STATUS_CODES, retry_after
+from marketdata.client_params import (
+    BasicParams,
+    FromToParams,
+    OptionsChainParams,
+    OptionsQuoteParams,
+)
+from marketdata.decoding import decode_body, decode_frame_ipc, frame_from_ipc
+from marketdata.metrics import MetricsRegistry, get_metrics
+from marketdata.rate_limit import (
+    RateLimiter,
+    endpoint_name,
+    estimate_credits,
+    get_rate_limiter,
+)
+from marketdata.singleflight import AsyncSingleFlight, request_key
+
+BASE_URL = "https://api.marketdata.app/v1/"
+
+# An inclusive (from, to) date range
+DateWindow = Tuple[datetime.date, datetime.date]
+
+
+def candle_windows(
+    resolution: str,
+    from_date: datetime.date,
+    to_date: datetime.date,
+    window: Optional[datetime.timedelta] = None,
+) -> List[DateWindow]:
+    """Split a date range into consecutive (from, to) windows, both inclusive.
+
+    Unless a window span is given, minute candles are requested a month at a
+    time and hourly candles a year at a time. Daily and coarser candles are
+    small enough to request in one go.
+    """
+    if window is None:
+        if resolution.isdigit():
+            window = datetime.timedelta(days=31)
+        elif resolution.upper().endswith("H"):
+            window = datetime.timedelta(days=366)
+        else:
+            return [(from_date, to_date)]
+
+    window = max(window, datetime.timedelta(days=1))
+    windows = []
+    window_from = from_date
+    while window_from <= to_date:
+        window_to = min(window_from + window - datetime.timedelta(days=1), to_date)
+        windows.append((window_from, window_to))
+        window_from = window_to + datetime.timedelta(days=1)
+    return windows
+
+
+def symbol_batches(
+    symbols: List[str], max_symbols: int = 500, max_length: int = 4000
+) -> List[List[str]]:
+    """Split a symbol list into batches for a bulk endpoint's symbols= parameter.
+    Each batch has at most max_symbols symbols and its URL encoded symbols value
+    is at most max_length characters, so requests stay within server and URL
+    length limits. Duplicate symbols are dropped.
+    """
+    batches = []
+    batch: List[str] = []
+    length = 0
+    for symbol in dict.fromkeys(symbols):
+        # Joined with an encoded comma (%2C)
+        symbol_length = len(quote(symbol, safe="")) + (3 if batch else 0)
+        if batch and (len(batch) >= max_symbols or length + symbol_length > max_length):
+            batches.append(batch)
+            batch, length = [], 0
+            symbol_length = len(quote(symbol, safe=""))
+        batch.append(symbol)
+        length += symbol_length
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def error_result(error: BaseException) -> Dict[str, str]:
+    """Describe a request that failed without a response in the same shape as
+    the API's own error responses, so batch results can be handled uniformly."""
+    return {"s": "error", "errmsg": f"{type(error).__name__}: {error}"}
 
-BASE_URL = 'https://api.marketdata.app/v1/'
 
 class MarketDataAsyncClient:
-    
-    def __init__(self) -> None:
-        self.BASE_URL = 'https://api.marketdata.app/v1/'
-        self.api_key = MARKET_DATA_API_KEY
-        self.headers = {
-            'Content-Type': 'application/json',
-            'Authorization': f'Bearer {self.api_key}'
-        }
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_connections_per_host: int = 0,
+        keepalive_timeout: float = 30.0,
+        dns_cache_ttl: int = 300,
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 30.0,
+        request_timeout: float = 30.0,
+        coalesce: bool = True,
+        decode_executor: Optional[Executor] = None,
+        decode_offload_bytes: int = 64 * 1024,
+        base_url: str = BASE_URL,
+        metrics: Optional[MetricsRegistry] = None,
+        api_key: Optional[str] = None,
+    ) -> None:
+        """Initializes the async client. All requests made by the client share a
+        single pooled aiohttp session, so connections (and their TLS sessions)
+        are kept alive and reused between calls.
+
+        Args:
+            max_connections (int, optional): Total number of simultaneous connections in
+                the pool. Defaults to 100.
+            max_connections_per_host (int, optional): Limit of simultaneous connections
+                to the API host. 0 means no per-host limit. Defaults to 0.
+            keepalive_timeout (float, optional): Seconds an idle connection is kept open
+                for reuse. Defaults to 30.0.
+            dns_cache_ttl (int, optional): Seconds a resolved DNS entry is cached.
+                Defaults to 300.
+            rate_limiter (RateLimiter, optional): Limiter for the request rate and
+                credit budget. Defaults to the limiter shared by all clients in the
+                process.
+            max_retries (int, optional): Number of times a request is retried after a
+                connection error, a timeout or a 429/5xx response. Defaults to 3.
+            backoff_base (float, optional): Base delay in seconds of the jittered
+                exponential backoff between retries. Defaults to 0.5.
+            backoff_max (float, optional): Maximum backoff delay in seconds. Defaults to
+                30.0.
+            request_timeout (float, optional): Timeout in seconds for each request
+                attempt. Defaults to 30.0.
+            coalesce (bool, optional): Share one in-flight request between concurrent
+                identical requests (same URL and parameters) instead of sending each of
+                them. Defaults to True.
+            decode_executor (Executor, optional): Pool that decodes response bodies into
+                DataFrames, so decoding large batches uses more than the event loop's
+                core. A ProcessPoolExecutor sends frames back as Arrow IPC buffers. None
+                decodes on the event loop. Defaults to None.
+            decode_offload_bytes (int, optional): Smaller responses are decoded on the
+                event loop even with a decode_executor, as handing them off costs more
+                than decoding them. Defaults to 64 KiB.
+            base_url (str, optional): Root URL of the v1 API, e.g. a local mock server
+                for benchmarks. Defaults to BASE_URL.
+            metrics (MetricsRegistry, optional): Registry the request latency, bytes,
+                status codes, retries and queue waits are recorded in. Defaults to the
+                registry shared by all clients in the process.
+            api_key (str, optional): The marketdata.app API key. Defaults to the
+                MARKET_DATA_API_KEY environment variable, read when the first request is
+                sent.
+        """
+        self.BASE_URL = base_url if base_url.endswith("/") else base_url + "/"
+        self._api_key = api_key
         self.api_calls = 0
+        self.metrics = metrics or get_metrics()
+        self.max_connections = max_connections
+        self.max_connections_per_host = max_connections_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.request_timeout = aiohttp.ClientTimeout(total=request_timeout)
+        self.coalesce = coalesce
+        self.decode_executor = decode_executor
+        self.decode_offload_bytes = decode_offload_bytes
+        self._in_flight = AsyncSingleFlight()
+        self._session: Optional[ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @property
+    def api_key(self) -> str:
+        """The API key, read from the environment on first use unless one was given."""
+        if self._api_key is None:
+            self._api_key = get_api_key()
+        return self._api_key
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}",
+        }
+
+    async def __aenter__(self) -> "MarketDataAsyncClient":
+        self._get_session()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    def _get_session(self) -> ClientSession:
+        """Return the pooled session, creating it on first use.
+
+        A session is bound to the event loop it was created in, so a new one is
+        opened when the client is used from a different loop (e.g. after a
+        previous ``asyncio.run`` has finished).
+        """
+        loop = asyncio.get_running_loop()
+        if (
+            self._session is None
+            or self._session.closed
+            or self._session_loop is not loop
+        ):
+            connector = TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_connections_per_host,
+                ttl_dns_cache=self.dns_cache_ttl,
+                keepalive_timeout=self.keepalive_timeout,
+            )
+            self._session = ClientSession(connector=connector, headers=self.headers)
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        """Close the pooled session and release all of its connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+
+    async def _get(
+        self, url: str, params: Optional[dict] = None
+    ) -> aiohttp.ClientResponse:
+        """Send a GET request, sharing the response of an identical request that
+        is already in flight."""
+        if not self.coalesce:
+            return await self._send(url, params)
+        return await self._in_flight.do(
+            request_key(url, params), lambda: self._send(url, params)
+        )
+
+    async def _send(
+        self, url: str, params: Optional[dict] = None
+    ) -> aiohttp.ClientResponse:
+        """Send a GET request through the pooled session once the rate limiter
+        allows it, retrying connection errors, timeouts and 429/5xx responses.
+        The body is read, which returns the connection to the pool, without
+        explicitly releasing the response, so the returned response can still be
+        decoded (aiohttp refuses to read a released response).
+
+        Raises:
+            aiohttp.ClientError, asyncio.TimeoutError: The last error when every attempt
+                failed to get a response.
+        """
+        endpoint = endpoint_name(url)
+        credits = estimate_credits(endpoint, params)
+        metrics = self.metrics
+        delay: Optional[float]
+        for attempt in range(self.max_retries + 1):
+            queued_at = perf_counter()
+            await self.rate_limiter.acquire_async(endpoint, credits)
+            sent_at = perf_counter()
+            metrics.observe_queue_wait("rate_limiter", endpoint, sent_at - queued_at)
+            try:
+                response = await self._get_session().get(
+                    url, params=params, timeout=self.request_timeout
+                )
+                try:
+                    body = await response.read()
+                except BaseException:
+                    response.release()
+                    raise
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # No response, so nothing was charged
+                self.rate_limiter.refund(endpoint, credits)
+                if attempt == self.max_retries:
+                    raise
+                metrics.record_retry(endpoint, type(e).__name__)
+                delay = self._backoff(attempt)
+                logger.warning(
+                    f"{endpoint} request failed ({type(e).__name__}: {e}). Retrying "
+                    f"in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+
+            self.api_calls += 1
+            metrics.observe_request(
+                endpoint, perf_counter() - sent_at, response.status, len(body)
+            )
+            self.rate_limiter.record_usage(
+                endpoint, credits, response.headers, response.status
+            )
+            if response.status in RETRY_STATUS_CODES and attempt < self.max_retries:
+                metrics.record_retry(endpoint, response.status)
+                delay = retry_after(response.status, response.headers)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(
+                    f"{endpoint} returned status {response.status}. Retrying in "
+                    f"{delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            return response
+        # The last attempt always returns or raises
+        raise AssertionError("unreachable")
+
+    def _backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter, so retries from many concurrent
+        requests don't arrive in waves."""
+        return random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2**attempt)
+        )
+
+    def _run(self, coro: Coroutine[Any, Any, Any]) -> Any:
+        """Run a coroutine to completion in a new event loop, closing the pooled
+        session created for that loop before the loop is torn down."""
+
+        async def run_and_close() -> Any:
+            try:
+                return await coro
+            finally:
+                await self.close()
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+        else:
+            coro.close()
+            raise RuntimeError(
+                "The blocking batch methods can't be called from a running event loop. "
+                "Await the *_batch coroutines instead, e.g. await "
+                "client.get_stock_candles_batch(...)"
+            )
+
+        if sys.platform.startswith("win"):
+            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+
+        return asyncio.run(run_and_close())
+
+    async def iter_pages(
+        self,
+        fetch: Callable[[BasicParams], Awaitable[Any]],
+        basic_params: Optional[BasicParams] = None,
+        page_size: Optional[int] = None,
+        prefetch: int = 2,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Walk the limit/offset pages of an endpoint, yielding each page as a
+        DataFrame as soon as it arrives. Up to prefetch pages are requested ahead
+        while the caller processes the current one, so memory stays bounded by
+        the page size rather than the size of the result set.
+
+        Args:
+            fetch (Callable[[BasicParams], Awaitable[Any]]): Requests one page. Called
+                with a copy of basic_params selecting the page and returns the endpoint
+                coroutine's result.
+            basic_params (BasicParams, optional): See BasicParams class. Its offset is
+                the first page's offset. Defaults to None.
+            page_size (int, optional): Number of results per page. Defaults to the limit
+                of basic_params.
+            prefetch (int, optional): Number of pages requested concurrently. Defaults
+                to 2.
+
+        Yields:
+            pd.DataFrame: The pages, in order. Iteration stops at the first short, empty
+                or failed page.
+        """
+        basic_params = basic_params or BasicParams()
+        limit: int = page_size or basic_params.params.get("limit") or DEFAULT_PAGE_SIZE
+        next_offset: int = basic_params.params.get("offset", 0)
+        pending: Deque[Tuple[int, "asyncio.Future[Any]"]] = deque()
+
+        def request_page() -> None:
+            nonlocal next_offset
+            task = asyncio.ensure_future(
+                fetch(basic_params.with_page(next_offset, limit))
+            )
+            pending.append((next_offset, task))
+            next_offset += limit
+
+        try:
+            for _ in range(max(1, prefetch)):
+                request_page()
+            while pending:
+                offset, task = pending.popleft()
+                data = await task
+                if isinstance(data, tuple):
+                    data = data[0]
+                if not isinstance(data, pd.DataFrame):
+                    if not (isinstance(data, dict) and data.get("s") == "no_data"):
+                        logger.error(f"Error fetching page at offset {offset}")
+                        logger.error(data)
+                    break
+                if len(data) < limit:
+                    # A short page is the last one
+                    if not data.empty:
+                        yield data
+                    break
+                request_page()
+                yield data
+        finally:
+            # Don't send the pages requested past the end
+            for _, task in pending:
+                task.cancel()
+
+    def iter_options_chain(
+        self,
+        params: OptionsChainParams,
+        page_size: Optional[int] = None,
+        prefetch: int = 2,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Get an options chain page by page. See iter_pages."""
+        return self.iter_pages(
+            lambda page_params: self.get_options_chain(
+                params.make_copy(basic_params=page_params, output="dataframe")
+            ),
+            params.basic_params,
+            page_size,
+            prefetch,
+        )
+
+    def iter_options_quotes(
+        self,
+        params: OptionsQuoteParams,
+        page_size: Optional[int] = None,
+        prefetch: int = 2,
+    ) -> AsyncIterator[pd.DataFrame]:
+        """Get the quote history of an option page by page. See iter_pages."""
+        return self.iter_pages(
+            lambda page_params: self.get_options_quotes(
+                params.make_copy(basic_params=page_params, output="dataframe")
+            ),
+            params.basic_params,
+            page_size,
+            prefetch,
+        )
+
+    async def _decode_frame(
+        self, body: bytes, content_type: str = ""
+    ) -> pd.DataFrame | dict:
+        """Decode a JSON or CSV response body, on the decode executor if there is
+        one and the body is large enough to be worth handing off."""
+        if self.decode_executor is None or len(body) < self.decode_offload_bytes:
+            return decode_body(body, content_type)
+        loop = asyncio.get_running_loop()
+        if isinstance(self.decode_executor, ProcessPoolExecutor):
+            result = await loop.run_in_executor(
+                self.decode_executor, decode_frame_ipc, body, content_type
+            )
+            return frame_from_ipc(result) if isinstance(result, bytes) else result
+        return await loop.run_in_executor(
+            self.decode_executor, decode_body, body, content_type
+        )
 
     async def handle_response_async(self, response, output):
         try:
@@ -45,101 +488,88 @@ class MarketDataAsyncClient:
                     return await response.text(), response.status
             elif output == "dataframe":
                 if 200 <= response.status < 300:
-                    json_data = await response.json()
-                    df = pd.DataFrame(json_data)
-                    try:
-                        df.drop(columns=['s'], inplace=True)
-                    except KeyError:
-                        pass
-                    return df, response.status
+                    body = await response.read()
+                    return (
+                        await self._decode_frame(
+                            body, response.headers.get("Content-Type", "")
+                        ),
+                        response.status,
+                    )
                 else:
                     try:
-                        return await response.json(), response.status
-                    except Exception as e:
+                        return await response.json(content_type=None), response.status
+                    except ValueError as e:
                         logger.error(f"Error getting response: {e}")
                         logger.error(await response.text())
-                        exit()
+                        return await response.text(), response.status
         # Handle the case where the response is not JSON
         except ValueError:
             return await response.text(), response.status
-        
-        
+
     # /v1/options/chain/{underlying}/
     async def get_options_chain(self, params: OptionsChainParams):
         """Get options chain for a symbol asynchronously."""
 
-        url = BASE_URL + f'options/chain/{params.underlying}/'
+        url = self.BASE_URL + f"options/chain/{params.underlying}/"
         api_params = params.to_dict()
         if params.basic_params:
             api_params.update(params.basic_params.params)
         if params.from_to_params:
             api_params.update(params.from_to_params.params)
 
-        async with aiohttp.ClientSession() as session:
-            for key, value in api_params.items():
-                if isinstance(value, bool):
-                    api_params[key] = str(value).lower()
-                elif isinstance(value, datetime.date):
-                    api_params[key] = value.strftime('%Y-%m-%d')
-            
-            if 'basic_params' in api_params:
-                if 'dateformat' in api_params['basic_params']:
-                    api_params['dateformat'] = api_params['basic_params']['dateformat']
-                if 'date' in api_params['basic_params']:
-                    api_params['date'] = api_params['basic_params']['date']
-                if 'format' in api_params['basic_params']:
-                    api_params['format'] = api_params['basic_params']['format']
-                if 'headers' in api_params['basic_params']:
-                    api_params['headers'] = api_params['basic_params']['headers']
-                if 'limit' in api_params['basic_params']:
-                    api_params['limit'] = api_params['basic_params']['limit']
-                del api_params['basic_params']
-                
-            url = f"{url}?{urlencode(api_params)}"
-            async with session.get(url, headers=self.headers) as response:
-                url_with_token = url + '&token=' + self.api_key
-                # logger.debug(f"API call (Option Chain): {url_with_token}")
-                self.api_calls += 1
-                data, status_code = await self.handle_response_async(response, params.output)
-                if not 200 <= status_code < 300:
-                    # logger.error(f"Error fetching options chain for {params.underlying}. Status code: {status_code}")
-                    pass
-
-        if isinstance(data, dict) and 's' in data and data.get('s') == 'error':
+        for key, value in api_params.items():
+            if isinstance(value, bool):
+                api_params[key] = str(value).lower()
+            elif isinstance(value, datetime.date):
+                api_params[key] = value.strftime("%Y-%m-%d")
+
+        if "basic_params" in api_params:
+            if "dateformat" in api_params["basic_params"]:
+                api_params["dateformat"] = api_params["basic_params"]["dateformat"]
+            if "date" in api_params["basic_params"]:
+                api_params["date"] = api_params["basic_params"]["date"]
+            if "format" in api_params["basic_params"]:
+                api_params["format"] = api_params["basic_params"]["format"]
+            if "headers" in api_params["basic_params"]:
+                api_params["headers"] = api_params["basic_params"]["headers"]
+            if "limit" in api_params["basic_params"]:
+                api_params["limit"] = api_params["basic_params"]["limit"]
+            del api_params["basic_params"]
+
+        url = f"{url}?{urlencode(api_params)}"
+        response = await self._get(url)
+        data, status_code = await self.handle_response_async(response, params.output)
+        if isinstance(data, dict) and "s" in data and data.get("s") == "error":
             logger.error(data)
             return data
         else:
             return data
-        
 
     # /v1/options/quotes/{optionSymbol}/
     async def get_options_quotes(self, params: OptionsQuoteParams):
-
-        url = BASE_URL + f'options/quotes/{params.option_symbol}/'
+        url = self.BASE_URL + f"options/quotes/{params.option_symbol}/"
         api_params = {}
         if params.basic_params:
             api_params.update(params.basic_params.params)
         if params.from_to_params:
             api_params.update(params.from_to_params.params)
         if params.columns:
-            api_params['columns'] = params.columns
-
-        async with aiohttp.ClientSession() as session:
-            for key, value in api_params.items():
-                if isinstance(value, bool):
-                    api_params[key] = str(value).lower()
-                if isinstance(value, datetime.date):
-                    api_params[key] = value.strftime('%Y-%m-%d')
-            url_with_params = url + '?' + '&'.join([f'{k}={v}' for k, v in api_params.items()])
-            # logger.debug(f"API call (Options Quotes): {url_with_params}")
-            async with session.get(url, headers=self.headers, params=api_params) as response:
-                self.api_calls += 1
-                data, status_code = await self.handle_response_async(response, params.output)
-                if not 200 <= status_code < 300:
-                    logger.error(f"Error fetching options quotes for {params.option_symbol}. Status code: {status_code}")
-                
-        return data
+            api_params["columns"] = params.columns
 
+        for key, value in api_params.items():
+            if isinstance(value, bool):
+                api_params[key] = str(value).lower()
+            if isinstance(value, datetime.date):
+                api_params[key] = value.strftime("%Y-%m-%d")
+        response = await self._get(url, api_params)
+        data, status_code = await self.handle_response_async(response, params.output)
+        if not 200 <= status_code < 300:
+            logger.error(
+                f"Error fetching options quotes for {params.option_symbol}. Status "
+                f"code: {status_code}"
+            )
+
+        return data
 
     # /v1/stocks/candles/{resolution}/{symbol}/
     async def get_stock_candles(
@@ -154,139 +584,639 @@ class MarketDataAsyncClient:
         exchange_country: str = "US",
         adjust_splits: Optional[bool] = None,
         adjust_dividends: Optional[bool] = None,
-        output: str = "dataframe"
+        output: str = "dataframe",
     ):
         """Get historical stock candles for a symbol asynchronously."""
-        
-        url = BASE_URL + f'stocks/candles/{resolution}/{symbol}/'
+
+        url = self.BASE_URL + f"stocks/candles/{resolution}/{symbol}/"
         params = {}
         if basic_params:
             params.update(basic_params.params)
         if from_to_params:
             params.update(from_to_params.params)
-        
+
         options = {
-            'columns': columns,
-            'exchange': exchange,
-            'extended_hours': extended_hours,
-            'exchange_country': exchange_country,
-            'adjust_splits': adjust_splits,
-            'adjust_dividends': adjust_dividends
+            "columns": columns,
+            "exchange": exchange,
+            "extended_hours": extended_hours,
+            "exchange_country": exchange_country,
+            "adjust_splits": adjust_splits,
+            "adjust_dividends": adjust_dividends,
         }
-    
+
         # Update params with non-None options
         for key, value in options.items():
             if value is not None:
                 params[key] = value
 
-        async with aiohttp.ClientSession() as session:
-            for key, value in params.items():
-                # Convert boolean values to lowercase strings
-                if isinstance(value, bool):
-                    value = str(value).lower()
-                    params[key] = value
-                    
-            async with session.get(url, headers=self.headers, params=params) as response:
-                # Construct full url with params for logging
-                url_with_token = url + '&' + self.api_key
-                logger.debug(f"API call (Candles): {url_with_token}")
-                self.api_calls += 1
-                return await self.handle_response_async(response, output)
-            
-    def get_stock_candles_parallel(self, symbols: List[str], resolution: str, from_date: datetime.date, to_date: datetime.date, max_concurrent: int = 50) -> Dict[str, pd.DataFrame | None]:
-            async def fetch_stock(session, semaphore, symbol) -> Tuple[str, Any, int]:
-                async with semaphore:
-                    try:
-                        data, status = await self.get_stock_candles(
-                            symbol,
-                            resolution=resolution,
-                            basic_params=BasicParams(dateformat="timestamp", format="json"),
-                            from_to_params=FromToParams(from_date=from_date, to_date=to_date),
-                        )
-                        return symbol, data, status
-                    except Exception as e:
-                        return symbol, None, str(e)
-
-            async def get_price_histories_async() -> Dict[str, Any]:
-                connector = TCPConnector(limit=max_concurrent)
-                async with ClientSession(connector=connector) as session:
-                    semaphore = asyncio.Semaphore(max_concurrent)
-                    tasks = [fetch_stock(session, semaphore, symbol) for symbol in symbols]
-                    return await asyncio.gather(*tasks)
-
-            if sys.platform.startswith('win'):
-                asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-
-            start_time = time()
-            results = asyncio.run(get_price_histories_async())
-            end_time = time()
-            execution_time = end_time - start_time
-
-            output = {}
-            for symbol, data, status in results:
-                if data is not None:
-                    output[symbol] = data
-                    logger.debug(f"{symbol}: Successfully fetched candles. Status: {status}")
+        for key, value in params.items():
+            # Convert boolean values to lowercase strings
+            if isinstance(value, bool):
+                value = str(value).lower()
+                params[key] = value
+
+        response = await self._get(url, params)
+        # Construct full url with params for logging
+        url_with_token = url + "&" + self.api_key
+        logger.debug(f"API call (Candles): {url_with_token}")
+        return await self.handle_response_async(response, output)
+
+    async def get_stock_candles_windowed(
+        self,
+        symbol: str,
+        resolution: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        window: Optional[datetime.timedelta] = None,
+        basic_params: Optional[BasicParams] = None,
+        max_concurrent: int = 8,
+        window_retries: int = 2,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        **kwargs: Any,
+    ) -> Tuple[pd.DataFrame | dict, Optional[int]]:
+        """Get stock candles for a long date range by splitting it into windows
+        that are fetched concurrently and stitched back together.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            from_date (date): First date of the range (inclusive).
+            to_date (date): Last date of the range (inclusive).
+            window (timedelta, optional): Span of each request. Defaults to a span
+                suited to the resolution (see candle_windows).
+            basic_params (BasicParams, optional): See BasicParams class. Defaults to
+                None.
+            max_concurrent (int, optional): Maximum number of windows fetched at once.
+                Ignored when semaphore is given. Defaults to 8.
+            window_retries (int, optional): Number of times the windows that failed are
+                fetched again. Defaults to 2.
+            semaphore (asyncio.Semaphore, optional): Semaphore limiting concurrent
+                requests, to share a limit with other requests. Defaults to None.
+            **kwargs: Passed on to get_stock_candles.
+
+        Raises:
+            ValueError: If from_date is after to_date.
+
+        Returns:
+            Tuple[pd.DataFrame | dict, int | None]: The candles sorted by time and
+                de-duplicated, and the status code.
+            If any window still fails after the retries, an error response describing
+                the failed windows.
+        """
+        if from_date > to_date:
+            raise ValueError(
+                f"from_date ({from_date}) cannot be after to_date ({to_date})"
+            )
+        semaphore = semaphore or asyncio.Semaphore(max_concurrent)
+
+        async def fetch_window(
+            window_from: datetime.date, window_to: datetime.date
+        ) -> Tuple[DateWindow, Any, Optional[int]]:
+            async with self.metrics.queued(semaphore, "stocks/candles"):
+                try:
+                    data, status = await self.get_stock_candles(
+                        symbol,
+                        resolution,
+                        basic_params=basic_params,
+                        from_to_params=FromToParams(
+                            from_date=window_from, to_date=window_to
+                        ),
+                        **kwargs,
+                    )
+                except Exception as e:
+                    data, status = error_result(e), None
+                return (window_from, window_to), data, status
+
+        windows = candle_windows(resolution, from_date, to_date, window)
+        window_retries = max(window_retries, 0)
+        fetched: Dict[DateWindow, Tuple[Any, Optional[int]]] = {}
+        failed: List[Tuple[DateWindow, Any, Optional[int]]] = []
+        for attempt in range(window_retries + 1):
+            results = await asyncio.gather(*(fetch_window(*w) for w in windows))
+            failed = []
+            for w, data, status in results:
+                if isinstance(data, pd.DataFrame) or (
+                    isinstance(data, dict) and data.get("s") == "no_data"
+                ):
+                    fetched[w] = (data, status)
                 else:
-                    output[symbol] = None
-                    logger.warning(f"{symbol}: Failed to fetch candles. Status: {status}")
-
-            logger.debug(f"Fetched candles for {len(symbols)} symbols in {execution_time:.2f} seconds")
-            return output   
-    
-    def get_options_chains_parallel(self, params_list: List[OptionsChainParams], max_concurrent: int = 50) -> List[dict]:
-        async def fetch_options_chain(session, params: OptionsChainParams):
-            result = await self.get_options_chain(params)
-            return params.id, params.underlying, result
-
-        async def get_all_options_chains():
-            connector = TCPConnector(limit=max_concurrent)
-            async with ClientSession(connector=connector) as session:
-                semaphore = asyncio.Semaphore(max_concurrent)
-                async def bounded_fetch(params):
-                    async with semaphore:
-                        return await fetch_options_chain(session, params)
-                tasks = [bounded_fetch(params) for params in params_list]
-                return await asyncio.gather(*tasks)
-
-        if sys.platform.startswith('win'):
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+                    failed.append((w, data, status))
+            if not failed:
+                break
+            windows = [w for w, _, _ in failed]
+            if attempt < window_retries:
+                logger.warning(
+                    f"{symbol}: Retrying {len(windows)} failed candle windows"
+                )
+
+        if failed:
+            errors = "; ".join(f"{w[0]} to {w[1]}: {data}" for w, data, _ in failed)
+            return {
+                "s": "error",
+                "errmsg": f"{len(failed)} candle windows failed. {errors}",
+            }, failed[0][2]
+
+        frames = [
+            data for data, _ in fetched.values() if isinstance(data, pd.DataFrame)
+        ]
+        if not frames:
+            # No window had data, so pass on the API's no_data response
+            return next(iter(fetched.values()))
+        status = next(
+            status
+            for data, status in fetched.values()
+            if isinstance(data, pd.DataFrame)
+        )
+        if len(frames) == 1:
+            return frames[0], status
+        df = (
+            pd.concat(frames, ignore_index=True)
+            .drop_duplicates(subset="t", keep="last")
+            .sort_values("t", ignore_index=True)
+        )
+        return df, status
+
+    # /v1/stocks/bulkquotes/
+    async def get_bulk_stock_quotes(
+        self,
+        symbols: List[str],
+        basic_params: Optional[BasicParams] = None,
+        columns: Optional[str] = None,
+        output: str = "dataframe",
+    ) -> Tuple[Any, int]:
+        """Get real-time quotes for multiple symbols in one request asynchronously.
+        See get_bulk_stock_quotes_batched for symbol lists of any size."""
+        url = self.BASE_URL + "stocks/bulkquotes/"
+        params = {}
+        if basic_params:
+            params.update(basic_params.params)
+        if columns:
+            params["columns"] = columns
+        params["symbols"] = ",".join(symbols)
 
-        results = asyncio.run(get_all_options_chains())
-        
-        output = []
-        for r in results:            
-            _, _, data = r
-            if data is not None:
-                output.append(data)
-        return output
-    
-    def get_options_quotes_parallel(self, params_list: List[OptionsQuoteParams], max_concurrent: int = 50) -> Dict[str, Any]:
-        """Get options quotes for multiple option symbols asynchronously.
+        response = await self._get(url, params)
+        data, status = await self.handle_response_async(response, output)
+        return data, status
+
+    # /v1/stocks/bulkcandles/{resolution}/
+    async def get_bulk_stock_candles(
+        self,
+        symbols: List[str],
+        resolution: str = "daily",
+        basic_params: Optional[BasicParams] = None,
+        from_to_params: Optional[FromToParams] = None,
+        snapshot: bool = False,
+        adjust_splits: Optional[bool] = None,
+        columns: Optional[str] = None,
+        output: str = "dataframe",
+    ) -> Tuple[Any, int]:
+        """Get a day's candle for multiple symbols in one request asynchronously.
+        See get_bulk_stock_candles_batched for symbol lists of any size."""
+        url = self.BASE_URL + f"stocks/bulkcandles/{resolution}/"
+        params = {}
+        if basic_params:
+            params.update(basic_params.params)
+        if from_to_params:
+            params.update(from_to_params.params)
+        if adjust_splits is not None:
+            params["adjustsplits"] = str(adjust_splits).lower()
+        if columns:
+            params["columns"] = columns
+        if snapshot:
+            params["snapshot"] = "true"
+        else:
+            params["symbols"] = ",".join(symbols)
+
+        response = await self._get(url, params)
+        data, status = await self.handle_response_async(response, output)
+        return data, status
+
+    async def _fetch_symbol_batches(
+        self,
+        fetch: Callable[[List[str]], Awaitable[Tuple[Any, Optional[int]]]],
+        endpoint: str,
+        symbols: List[str],
+        max_symbols: int,
+        max_concurrent: int,
+        batch_retries: int,
+    ) -> Tuple[pd.DataFrame | dict, List[str]]:
+        """Fetch a bulk endpoint in symbol batches concurrently, retrying only the
+        batches that failed, and merge the batches into one DataFrame."""
+        semaphore = asyncio.Semaphore(max_concurrent)
+
+        async def fetch_batch(
+            batch: List[str],
+        ) -> Tuple[List[str], Any, Optional[int]]:
+            async with self.metrics.queued(semaphore, endpoint):
+                try:
+                    data, status = await fetch(batch)
+                except Exception as e:
+                    data, status = error_result(e), None
+                return batch, data, status
+
+        batches = symbol_batches(symbols, max_symbols)
+        frames: List[pd.DataFrame] = []
+        failed: List[Tuple[List[str], Any, Optional[int]]] = []
+        for attempt in range(batch_retries + 1):
+            results = await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+            failed = []
+            for batch, data, status in results:
+                if isinstance(data, pd.DataFrame):
+                    frames.append(data)
+                elif not (isinstance(data, dict) and data.get("s") == "no_data"):
+                    failed.append((batch, data, status))
+            if not failed:
+                break
+            batches = [batch for batch, _, _ in failed]
+            if attempt < batch_retries:
+                logger.warning(f"Retrying {len(batches)} failed bulk batches")
+
+        failed_symbols = [symbol for batch, _, _ in failed for symbol in batch]
+        if failed:
+            logger.error(
+                f"{len(failed)} bulk batches ({len(failed_symbols)} symbols) failed: "
+                f"{failed[0][1]}"
+            )
+        if not frames:
+            return (failed[0][1] if failed else {"s": "no_data"}), failed_symbols
+        return pd.concat(frames, ignore_index=True), failed_symbols
+
+    async def get_bulk_stock_quotes_batched(
+        self,
+        symbols: List[str],
+        basic_params: Optional[BasicParams] = None,
+        columns: Optional[str] = None,
+        max_symbols: int = 500,
+        max_concurrent: int = 8,
+        batch_retries: int = 2,
+    ) -> Tuple[pd.DataFrame | dict, List[str]]:
+        """Get real-time quotes for any number of symbols. The symbols are split
+        into batches (see symbol_batches) that are requested concurrently, and
+        batches that fail are retried on their own.
 
         Args:
-            params_list (List[OptionsQuoteParams]): List of OptionsQuoteParams objects.
-            max_concurrent (int, optional): Maximum number of concurrent requests. Defaults to 50.
+            symbols (List[str]): The ticker symbols.
+            basic_params (BasicParams, optional): See BasicParams class. Defaults to
+                None.
+            columns (str, optional): Only return these columns. Defaults to None.
+            max_symbols (int, optional): Maximum number of symbols per request. Defaults
+                to 500.
+            max_concurrent (int, optional): Maximum number of concurrent requests.
+                Defaults to 8.
+            batch_retries (int, optional): Number of times the batches that failed are
+                requested again. Defaults to 2.
 
         Returns:
-            Dict[str, Any]: Dictionary containing the option symbol as the key and "data" and "status code" in a dict as the value.
+            Tuple[pd.DataFrame | dict, List[str]]: The quotes of all batches merged into
+                one DataFrame (or the error response if every batch failed), and the
+                symbols of the batches that still failed after the retries.
+        """
+        return await self._fetch_symbol_batches(
+            lambda batch: self.get_bulk_stock_quotes(
+                batch, basic_params=basic_params, columns=columns
+            ),
+            "stocks/bulkquotes",
+            symbols,
+            max_symbols,
+            max_concurrent,
+            batch_retries,
+        )
+
+    async def get_bulk_stock_candles_batched(
+        self,
+        symbols: List[str],
+        resolution: str = "daily",
+        basic_params: Optional[BasicParams] = None,
+        from_to_params: Optional[FromToParams] = None,
+        adjust_splits: Optional[bool] = None,
+        columns: Optional[str] = None,
+        max_symbols: int = 500,
+        max_concurrent: int = 8,
+        batch_retries: int = 2,
+    ) -> Tuple[pd.DataFrame | dict, List[str]]:
+        """Get a day's candle for any number of symbols. The symbols are split into
+        batches that are requested concurrently, and batches that fail are retried
+        on their own. See get_bulk_stock_quotes_batched for the batching arguments.
+
+        Returns:
+            Tuple[pd.DataFrame | dict, List[str]]: The candles of all batches merged
+                into one DataFrame (or the error response if every batch failed), and
+                the symbols of the batches that still failed after the retries.
+        """
+        return await self._fetch_symbol_batches(
+            lambda batch: self.get_bulk_stock_candles(
+                batch,
+                resolution,
+                basic_params=basic_params,
+                from_to_params=from_to_params,
+                adjust_splits=adjust_splits,
+                columns=columns,
+            ),
+            "stocks/bulkcandles",
+            symbols,
+            max_symbols,
+            max_concurrent,
+            batch_retries,
+        )
+
+    def get_bulk_stock_quotes_parallel(
+        self, symbols: List[str], **kwargs: Any
+    ) -> Tuple[pd.DataFrame | dict, List[str]]:
+        """Blocking version of get_bulk_stock_quotes_batched, which takes the same
+        arguments."""
+        results: Tuple[pd.DataFrame | dict, List[str]] = self._run(
+            self.get_bulk_stock_quotes_batched(symbols, **kwargs)
+        )
+        return results
+
+    def get_bulk_stock_candles_parallel(
+        self, symbols: List[str], **kwargs: Any
+    ) -> Tuple[pd.DataFrame | dict, List[str]]:
+        """Blocking version of get_bulk_stock_candles_batched, which takes the same
+        arguments."""
+        results: Tuple[pd.DataFrame | dict, List[str]] = self._run(
+            self.get_bulk_stock_candles_batched(symbols, **kwargs)
+        )
+        return results
+
+    async def _iter_batch(
+        self,
+        fetch: Callable[[Any, asyncio.Semaphore], Awaitable[Tuple[Any, Any]]],
+        items: List[Any],
+        max_concurrent: int,
+    ) -> AsyncIterator[Tuple[Any, Any]]:
+        """Run fetch for every item, at most max_concurrent at a time, and yield
+        the results in the order they complete. A fetch is only started when
+        one finishes, so a caller that stops iterating early stops the batch:
+        no more fetches start, and the ones in flight are cancelled when the
+        iterator is closed."""
+        max_concurrent = max(1, max_concurrent)
+        semaphore = asyncio.Semaphore(max_concurrent)
+        remaining = iter(items)
+        running: Set["asyncio.Future[Tuple[Any, Any]]"] = set()
+
+        def start(count: int) -> None:
+            for item in islice(remaining, count):
+                running.add(asyncio.ensure_future(fetch(item, semaphore)))
+
+        try:
+            start(max_concurrent)
+            while running:
+                done, _ = await asyncio.wait(
+                    running, return_when=asyncio.FIRST_COMPLETED
+                )
+                running.difference_update(done)
+                start(len(done))
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    def iter_stock_candles_batch(
+        self,
+        symbols: List[str],
+        resolution: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        max_concurrent: int = 50,
+        wire_format: str = "json",
+    ) -> AsyncIterator[Tuple[str, pd.DataFrame | dict]]:
+        """Get stock candles for multiple symbols in the running event loop,
+        yielding each symbol's candles as soon as they arrive.
+
+        Args:
+            symbols (List[str]): The ticker symbols.
+            resolution (str): The candle resolution.
+            from_date (date): First date of the range (inclusive).
+            to_date (date): Last date of the range (inclusive).
+            max_concurrent (int, optional): Maximum number of concurrent requests.
+                Defaults to 50.
+            wire_format (str, optional): Format the candles are transferred in, "json"
+                or "csv". CSV responses are smaller and parsed with Arrow's
+                multithreaded CSV reader. Defaults to "json".
+
+        Yields:
+            Tuple[str, pd.DataFrame | dict]: The symbol and its candles, or the error
+                response (see error_result) if they couldn't be fetched.
+        """
+
+        async def fetch_stock(
+            symbol: str, semaphore: asyncio.Semaphore
+        ) -> Tuple[str, pd.DataFrame | dict]:
+            # Long intraday ranges are split into windows, which all share
+            # the batch's concurrency limit
+            try:
+                data, status = await self.get_stock_candles_windowed(
+                    symbol,
+                    resolution,
+                    from_date,
+                    to_date,
+                    basic_params=BasicParams(
+                        dateformat="timestamp", format=wire_format
+                    ),
+                    semaphore=semaphore,
+                )
+            except Exception as e:
+                data, status = error_result(e), None
+            if isinstance(data, pd.DataFrame):
+                logger.debug(
+                    f"{symbol}: Successfully fetched candles. Status: {status}"
+                )
+            else:
+                logger.warning(f"{symbol}: Failed to fetch candles. Status: {status}")
+            return symbol, data
+
+        return self._iter_batch(fetch_stock, symbols, max_concurrent)
+
+    async def get_stock_candles_batch(
+        self,
+        symbols: List[str],
+        resolution: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        max_concurrent: int = 50,
+        wire_format: str = "json",
+    ) -> Dict[str, pd.DataFrame | dict]:
+        """Get stock candles for multiple symbols in the running event loop. See
+        iter_stock_candles_batch for the arguments.
+
+        Returns:
+            Dict[str, pd.DataFrame | dict]: The candles of each symbol, in the order of
+                symbols, or the error response if they couldn't be fetched.
         """
-        async def fetch_options_quote(semaphore, params: OptionsQuoteParams):
-            async with semaphore:
-                result = await self.get_options_quotes(params)
+        start_time = time()
+        results = {
+            symbol: data
+            async for symbol, data in self.iter_stock_candles_batch(
+                symbols, resolution, from_date, to_date, max_concurrent, wire_format
+            )
+        }
+        logger.debug(
+            f"Fetched candles for {len(symbols)} symbols in {time() - start_time:.2f} "
+            "seconds"
+        )
+        return {symbol: results[symbol] for symbol in symbols}
+
+    def iter_options_chains_batch(
+        self,
+        params_list: List[OptionsChainParams],
+        max_concurrent: int = 50,
+    ) -> AsyncIterator[Tuple[OptionsChainParams, Any]]:
+        """Get options chains in the running event loop, yielding each chain as
+        soon as it arrives.
+
+        Args:
+            params_list (List[OptionsChainParams]): List of OptionsChainParams objects.
+            max_concurrent (int, optional): Maximum number of concurrent requests.
+                Defaults to 50.
+
+        Yields:
+            Tuple[OptionsChainParams, Any]: The parameters of the chain and its data, or
+                the error response if it couldn't be fetched.
+        """
+
+        async def fetch_options_chain(
+            params: OptionsChainParams, semaphore: asyncio.Semaphore
+        ) -> Tuple[OptionsChainParams, Any]:
+            async with self.metrics.queued(semaphore, "options/chain"):
+                try:
+                    result = await self.get_options_chain(params)
+                except Exception as e:
+                    logger.error(
+                        f"Error fetching options chain for {params.underlying}: {e}"
+                    )
+                    result = error_result(e)
+                return params, result
+
+        return self._iter_batch(fetch_options_chain, params_list, max_concurrent)
+
+    async def get_options_chains_batch(
+        self,
+        params_list: List[OptionsChainParams],
+        max_concurrent: int = 50,
+    ) -> Dict[str, Any]:
+        """Get options chains in the running event loop. See iter_options_chains_batch
+        for the arguments.
+
+        Returns:
+            Dict[str, Any]: The data of each chain keyed by the id of its parameters, in
+                the order of params_list.
+        """
+        results = {
+            params.id: data
+            async for params, data in self.iter_options_chains_batch(
+                params_list, max_concurrent
+            )
+        }
+        return {params.id: results[params.id] for params in params_list}
+
+    def iter_options_quotes_batch(
+        self,
+        params_list: List[OptionsQuoteParams],
+        max_concurrent: int = 50,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Get options quotes in the running event loop, yielding each option's
+        quotes as soon as they arrive.
+
+        Args:
+            params_list (List[OptionsQuoteParams]): List of OptionsQuoteParams objects.
+            max_concurrent (int, optional): Maximum number of concurrent requests.
+                Defaults to 50.
+
+        Yields:
+            Tuple[str, Any]: The option symbol and its quotes, or the error response if
+                they couldn't be fetched.
+        """
+
+        async def fetch_options_quote(
+            params: OptionsQuoteParams, semaphore: asyncio.Semaphore
+        ) -> Tuple[str, Any]:
+            async with self.metrics.queued(semaphore, "options/quotes"):
+                try:
+                    result = await self.get_options_quotes(params)
+                except Exception as e:
+                    logger.error(
+                        f"Error fetching options quotes for {params.option_symbol}: {e}"
+                    )
+                    result = error_result(e)
                 return params.option_symbol, result
 
-        async def get_all_options_quotes():
-            semaphore = asyncio.Semaphore(max_concurrent)
-            tasks = [fetch_options_quote(semaphore, params) for params in params_list]
-            return await asyncio.gather(*tasks)
+        return self._iter_batch(fetch_options_quote, params_list, max_concurrent)
 
-        if sys.platform.startswith('win'):
-            asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    async def get_options_quotes_batch(
+        self,
+        params_list: List[OptionsQuoteParams],
+        max_concurrent: int = 50,
+    ) -> Dict[str, Any]:
+        """Get options quotes in the running event loop. See iter_options_quotes_batch
+        for the arguments.
+
+        Returns:
+            Dict[str, Any]: The quotes of each option keyed by option symbol, in the
+                order of params_list.
+        """
+        results = {
+            symbol: data
+            async for symbol, data in self.iter_options_quotes_batch(
+                params_list, max_concurrent
+            )
+        }
+        return {
+            params.option_symbol: results[params.option_symbol]
+            for params in params_list
+        }
+
+    def get_stock_candles_parallel(
+        self,
+        symbols: List[str],
+        resolution: str,
+        from_date: datetime.date,
+        to_date: datetime.date,
+        max_concurrent: int = 50,
+        wire_format: str = "json",
+    ) -> Dict[str, pd.DataFrame | dict]:
+        """Get stock candles for multiple symbols asynchronously. Blocks until
+        all are fetched; from async code await get_stock_candles_batch instead.
+
+        Returns:
+            Dict[str, pd.DataFrame | dict]: The candles of each symbol, or the error
+                response (see error_result) if they couldn't be fetched.
+        """
+        results: Dict[str, pd.DataFrame | dict] = self._run(
+            self.get_stock_candles_batch(
+                symbols, resolution, from_date, to_date, max_concurrent, wire_format
+            )
+        )
+        return results
+
+    def get_options_chains_parallel(
+        self, params_list: List[OptionsChainParams], max_concurrent: int = 50
+    ) -> List[dict]:
+        """Get options chains asynchronously. Blocks until all are fetched; from
+        async code await get_options_chains_batch instead.
+
+        Returns:
+            List[dict]: The data of each chain, in the order of params_list so they can
+                be matched to it.
+        """
+        results = self._run(self.get_options_chains_batch(params_list, max_concurrent))
+        return [results[params.id] for params in params_list]
+
+    def get_options_quotes_parallel(
+        self, params_list: List[OptionsQuoteParams], max_concurrent: int = 50
+    ) -> Dict[str, Any]:
+        """Get options quotes for multiple option symbols asynchronously. Blocks
+        until all are fetched; from async code await get_options_quotes_batch instead.
 
-        results = asyncio.run(get_all_options_quotes())
+        Args:
+            params_list (List[OptionsQuoteParams]): List of OptionsQuoteParams objects.
+            max_concurrent (int, optional): Maximum number of concurrent requests. Defaults to 50.
 
-        output = {}
-        for option_symbol, data in results:
-            output[option_symbol] = data
-        return output
+        Returns:
+            Dict[str, Any]: Dictionary containing the option symbol as the key and "data" and "status code" in a dict as the value.
+        """
+        results: Dict[str, Any] = self._run(
+            self.get_options_quotes_batch(params_list, max_concurrent)
+        )
+        return results
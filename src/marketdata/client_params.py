@@ -1,22 +1,24 @@
 import copy
-from dataclasses import asdict, dataclass
+from dataclasses import asdict, dataclass, field
 import datetime
+import hashlib
+import json
 from typing import Any, Dict, Optional
 from uuid import UUID, uuid4
 
 
 class BasicParams:
-    """This class is used to create the basic parameters for the API calls. 
-        These parameters are common to all the API calls.
+    """This class is used to create the basic parameters for the API calls.
+    These parameters are common to all the API calls.
     """
-    
+
     def __init__(
         self,
         lookup_date: datetime.date | None = None,
-        dateformat: str = "timestamp",
+        dateformat: str | None = "timestamp",
         human: bool = False,
         offset: int | None = None,
-        limit: int = 500,
+        limit: int | None = 500,
         format: str = "json",
         data_headers: bool = True,
     ):
@@ -31,34 +33,50 @@ class BasicParams:
             format (str, optional): The format parameter allows you to specify the format you wish to receive the data in. "json", "csv". Defaults to "json".
             data_headers (bool, optional): Used to turn off headers when using CSV output. Defaults to None.
         """
-        self.params = {}
+        self.params: Dict[str, Any] = {}
         if lookup_date:
-            self.params['date'] = lookup_date.strftime('%Y-%m-%d')
+            self.params["date"] = lookup_date.strftime("%Y-%m-%d")
         if dateformat:
-            self.params['dateformat'] = dateformat
+            self.params["dateformat"] = dateformat
         if human:
-            self.params['human'] = human
+            self.params["human"] = human
         if offset:
-            self.params['offset'] = offset
+            self.params["offset"] = offset
         if limit:
-            self.params['limit'] = limit
+            self.params["limit"] = limit
         if format:
-            self.params['format'] = format
+            self.params["format"] = format
         if data_headers:
-            self.params['headers'] = data_headers
+            self.params["headers"] = data_headers
 
     def __str__(self) -> str:
         return str(self.params)
-    
+
     def to_dict(self) -> Dict[str, Any]:
         return self.params
-                
+
+    def with_page(self, offset: int, limit: int) -> "BasicParams":
+        """Returns a copy of the parameters that selects one page of results.
+
+        Args:
+            offset (int): Index of the first result of the page.
+            limit (int): Number of results per page.
+        """
+        new_params = copy.copy(self)
+        new_params.params = dict(self.params)
+        new_params.params.pop("offset", None)
+        if offset:
+            new_params.params["offset"] = offset
+        new_params.params["limit"] = limit
+        return new_params
+
+
 class FromToParams:
     """
     This class is used to create the from and to parameters for the API calls.
     These are used with API calls that can select a range of dates.
     """
-    
+
     def __init__(
         self,
         from_date: datetime.date | None = None,
@@ -72,20 +90,21 @@ class FromToParams:
             to_date (date, optional): Limit the status to dates before to (inclusive). Should be combined with from to create a range. Defaults to None.
             countback (int, optional): Countback will fetch a number of dates before (to the left of) to. If you use from, countback is not required. Defaults to None.
         """
-        self.params = {}
+        self.params: Dict[str, Any] = {}
         if from_date:
-            self.params['from'] = from_date.strftime('%Y-%m-%d')
+            self.params["from"] = from_date.strftime("%Y-%m-%d")
         if to_date:
-            self.params['to'] = to_date.strftime('%Y-%m-%d')
+            self.params["to"] = to_date.strftime("%Y-%m-%d")
         if countback:
-            self.params['countback'] = countback
-            
+            self.params["countback"] = countback
+
     def __str__(self) -> str:
         return str(self.params)
-    
+
     def to_dict(self) -> Dict[str, Any]:
         return self.params
-    
+
+
 @dataclass
 class OptionsChainParams:
     underlying: str
@@ -97,8 +116,8 @@ class OptionsChainParams:
     weekly: Optional[bool] = None
     monthly: Optional[bool] = None
     quarterly: Optional[bool] = None
-    dte: Optional[int] = None    
-    feed: Optional[str] = None  # "live" or "cached"        
+    dte: Optional[int] = None
+    feed: Optional[str] = None  # "live" or "cached"
     side: str = "both"
     range: str = "all"
     strike: Optional[float] = None
@@ -110,7 +129,7 @@ class OptionsChainParams:
     nonstandard: bool = False
     columns: Optional[str] = None
     output: str = "dataframe"
-    id: str = str(uuid4())
+    id: str = field(default_factory=lambda: str(uuid4()))
 
     def to_dict(self):
         def serialize(v):
@@ -122,24 +141,40 @@ class OptionsChainParams:
                 return v
 
         out = {k: serialize(v) for k, v in asdict(self).items() if v is not None}
-        del out['id']
+        del out["id"]
         return out
 
-    def make_copy(self, **kwargs) -> 'OptionsChainParams':
+    def cache_key(self) -> str:
+        """Returns a hash that is equal for any two parameter sets requesting the
+        same chain. Unlike id, it doesn't change between copies of the parameters.
+        The wire format (format and headers) doesn't change the chain, so it is
+        not part of the key."""
+        request = self.to_dict()
+        if isinstance(request.get("basic_params"), dict):
+            request["basic_params"] = {
+                k: v
+                for k, v in request["basic_params"].items()
+                if k not in ("format", "headers")
+            }
+        canonical = json.dumps(request, sort_keys=True, default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def make_copy(self, **kwargs) -> "OptionsChainParams":
         new_params = copy.deepcopy(self)
-        
+
         # Update the new object with the provided overrides
         for key, value in kwargs.items():
             if hasattr(new_params, key):
                 setattr(new_params, key, value)
             else:
                 raise ValueError(f"Invalid parameter: {key}")
-            
+
         # Create a new UUID for the new object
-        new_params.id = uuid4()
-                
+        new_params.id = str(uuid4())
+
         return new_params
 
+
 @dataclass
 class OptionsQuoteParams:
     option_symbol: str
@@ -152,14 +187,14 @@ class OptionsQuoteParams:
         out = {k: v for k, v in asdict(self).items() if v is not None}
         return out
 
-    def make_copy(self, **kwargs) -> 'OptionsQuoteParams':
+    def make_copy(self, **kwargs) -> "OptionsQuoteParams":
         new_params = copy.deepcopy(self)
-        
+
         # Update the new object with the provided overrides
         for key, value in kwargs.items():
             if hasattr(new_params, key):
                 setattr(new_params, key, value)
             else:
                 raise ValueError(f"Invalid parameter: {key}")
-            
-        return new_params
\ No newline at end of file
+
+        return new_params
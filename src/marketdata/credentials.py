@@ -1,9 +1,10 @@
 import os
-from typing import Optional
+from typing import Any
 
-def get_api_key() -> Optional[str]:
+
+def get_api_key() -> str:
     """Get API key from environment variable or raise helpful error."""
-    api_key = os.environ.get('MARKET_DATA_API_KEY')
+    api_key = os.environ.get("MARKET_DATA_API_KEY")
     if not api_key:
         raise ValueError(
             "MARKET_DATA_API_KEY environment variable not set. "
@@ -11,4 +12,10 @@ def get_api_key() -> Optional[str]:
         )
     return api_key
 
-MARKET_DATA_API_KEY = get_api_key()
\ No newline at end of file
+
+def __getattr__(name: str) -> Any:
+    # MARKET_DATA_API_KEY is read when it is used rather than at import, so the
+    # package can be imported without a key, e.g. to read the cache
+    if name == "MARKET_DATA_API_KEY":
+        return get_api_key()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,194 @@
+"""
+Decoding of API responses into typed DataFrames
+"""
+import csv
+import io
+import json
+from typing import Any, Callable, Dict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+
+_loads: Callable[[Any], Any]
+try:
+    # orjson is optional, but decodes large responses several times faster
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover
+    _loads = json.loads
+
+# Most endpoints return parallel arrays, one per column. These are the dtypes
+# of the known columns; anything else is left to numpy's inference.
+# fmt: off
+FLOAT_COLUMNS = {
+    # Candles
+    "o", "h", "l", "c",
+    # Quotes and option chains
+    "ask", "bid", "mid", "last", "change", "changepct", "strike", "underlyingPrice",
+    "intrinsicValue", "extrinsicValue", "iv", "delta", "gamma", "theta", "vega", "rho",
+    "high", "low", "open", "close", "52weekHigh", "52weekLow",
+}
+# fmt: on
+INT_COLUMNS = {"v", "volume", "bidSize", "askSize", "openInterest", "dte"}
+BOOL_COLUMNS = {"inTheMoney"}
+# Columns holding a small set of repeated values
+CATEGORY_COLUMNS = {"underlying", "side", "symbol", "exchange"}
+# Dates and times. These are int64 epoch seconds with dateformat="unix" and are
+# left as strings with dateformat="timestamp"
+TIME_COLUMNS = {"t", "expiration", "firstTraded", "updated", "date", "reportDate"}
+
+
+def loads(body: bytes) -> Any:
+    """Parse a JSON response body."""
+    return _loads(body)
+
+
+def _typed_column(name: str, values: list) -> Any:
+    if name in FLOAT_COLUMNS:
+        # None becomes NaN
+        return np.array(values, dtype=np.float64)
+    if name in INT_COLUMNS or (
+        name in TIME_COLUMNS and values and isinstance(values[0], int)
+    ):
+        try:
+            return np.array(values, dtype=np.int64)
+        except (TypeError, ValueError, OverflowError):
+            # Missing values, which int64 can't hold
+            return np.array(values, dtype=np.float64)
+    if name in BOOL_COLUMNS:
+        return np.array(values, dtype=bool)
+    if name in CATEGORY_COLUMNS:
+        return pd.Categorical(values)
+    if values and isinstance(values[0], str):
+        return np.array(values, dtype=object)
+    return np.asarray(values)
+
+
+def columns_to_frame(data: Dict[str, Any]) -> pd.DataFrame:
+    """Build a DataFrame with typed columns from a parallel-array response. The
+    status field 's' is dropped."""
+    columns = {}
+    for name, values in data.items():
+        if name == "s":
+            continue
+        columns[name] = (
+            _typed_column(name, values) if isinstance(values, list) else values
+        )
+    return pd.DataFrame(columns)
+
+
+def decode_frame(body: bytes) -> pd.DataFrame | Dict[str, Any]:
+    """Decode a successful JSON response body into a typed DataFrame.
+
+    Args:
+        body (bytes): The raw response body.
+
+    Returns:
+        pd.DataFrame | dict: The DataFrame, or the parsed body if it has no column
+        arrays (e.g. {"s": "no_data"}).
+    """
+    data = loads(body)
+    if not isinstance(data, dict) or not any(
+        isinstance(v, list) for v in data.values()
+    ):
+        return data
+    return columns_to_frame(data)
+
+
+def _csv_column_types(body: bytes) -> Dict[str, pa.DataType]:
+    """Get the Arrow types of the known columns of a CSV body. Time columns are
+    typed from their first value: int64 for unix seconds, otherwise strings, so
+    they match the JSON decoding rather than being parsed as timestamps."""
+    first_line_end = body.find(b"\n")
+    second_line_end = body.find(b"\n", first_line_end + 1)
+    head = body[: second_line_end if second_line_end != -1 else len(body)].decode(
+        "utf-8", errors="replace"
+    )
+    rows = list(csv.reader(io.StringIO(head)))
+    header = rows[0] if rows else []
+    first_row = rows[1] if len(rows) > 1 else []
+
+    column_types = {}
+    for i, name in enumerate(header):
+        if name in FLOAT_COLUMNS:
+            column_types[name] = pa.float64()
+        elif name in INT_COLUMNS:
+            column_types[name] = pa.int64()
+        elif name in BOOL_COLUMNS:
+            column_types[name] = pa.bool_()
+        elif name in CATEGORY_COLUMNS:
+            column_types[name] = pa.dictionary(pa.int32(), pa.string())
+        elif name in TIME_COLUMNS:
+            value = first_row[i] if i < len(first_row) else ""
+            column_types[name] = (
+                pa.int64() if value.lstrip("-").isdigit() else pa.string()
+            )
+    return column_types
+
+
+def decode_csv(body: bytes, block_size: int = 1 << 20) -> pd.DataFrame | Dict[str, Any]:
+    """Decode a CSV response body (format="csv" with headers) into a typed
+    DataFrame, with the same column types as the JSON decoding. The body is
+    read in full, then split into blocks that Arrow's CSV reader parses on
+    its thread pool.
+
+    Args:
+        body (bytes): The raw response body.
+        block_size (int, optional): Bytes per block parsed by a thread.
+            Defaults to 1 MiB.
+
+    Returns:
+        pd.DataFrame | dict: The DataFrame, or {"s": "no_data"} if the body is empty.
+    """
+    if not body.strip():
+        return {"s": "no_data"}
+    table = pacsv.read_csv(
+        pa.BufferReader(body),
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        convert_options=pacsv.ConvertOptions(column_types=_csv_column_types(body)),
+    )
+    return table.to_pandas(split_blocks=True)
+
+
+def decode_body(body: bytes, content_type: str = "") -> pd.DataFrame | Dict[str, Any]:
+    """Decode a successful response body with the decoder for its content type:
+    decode_csv for text/csv, otherwise decode_frame."""
+    if "csv" in (content_type or ""):
+        return decode_csv(body)
+    return decode_frame(body)
+
+
+def decode_frame_ipc(body: bytes, content_type: str = "") -> bytes | Dict[str, Any]:
+    """Decode a response body like decode_body, but return a DataFrame as an
+    Arrow IPC stream. Meant to run in a process pool: the stream is a single
+    buffer that is cheap to send back to the parent process, where
+    frame_from_ipc turns it into a DataFrame.
+
+    Args:
+        body (bytes): The raw response body.
+        content_type (str, optional): The response's Content-Type. Defaults to "".
+
+    Returns:
+        bytes | dict: The Arrow IPC stream, or the parsed body if it has no column
+            arrays.
+    """
+    df = decode_body(body, content_type)
+    if not isinstance(df, pd.DataFrame):
+        return df
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    stream: bytes = sink.getvalue().to_pybytes()
+    return stream
+
+
+def frame_from_ipc(stream: bytes) -> pd.DataFrame:
+    """Read a DataFrame from an Arrow IPC stream written by decode_frame_ipc.
+    Numeric columns without missing values share the stream's memory instead
+    of being copied."""
+    table = pa.ipc.open_stream(pa.py_buffer(stream)).read_all()
+    return table.to_pandas(split_blocks=True)
@@ -1,80 +1,218 @@
 import os
 import re
+import shutil
+from concurrent.futures import Executor, ThreadPoolExecutor
 from datetime import date, timedelta, datetime
-import json
-from typing import Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
 
 from loguru import logger
+import numpy as np
 import pandas as pd
 
 from marketdata.client import MarketDataClient
 from marketdata.client_async import MarketDataAsyncClient
-from marketdata.client_params import OptionsQuoteParams, OptionsChainParams
-       
+from marketdata.cache import LRUCache, _copy_on_write
+from marketdata.cache_manifest import CandleCacheManifest
+from marketdata.chain_cache import MISS, STALE, OptionsChainCache
+from marketdata.chain_filter import filter_chain, superset_params
+from marketdata.client_params import BasicParams, OptionsQuoteParams, OptionsChainParams
+from marketdata.market_calendar import market_holidays
+from marketdata.metrics import MetricsRegistry, get_metrics
+from marketdata.resample import (
+    can_resample,
+    candle_times,
+    period_bounds,
+    resample_candles,
+    resolution_span,
+)
+from marketdata.store import (
+    CANDLE_STORES,
+    MARKET_TIMEZONE,
+    CandleStore,
+    partition_ranges,
+    store_for_path,
+)
+
+# The earliest date requested when a symbol's full history is fetched
+HISTORY_START_DATE = date(2000, 1, 1)
+
+# Column names of candles returned with friendly_names=True
+FRIENDLY_CANDLE_COLUMNS = {
+    "t": "datetime",
+    "o": "open",
+    "h": "high",
+    "l": "low",
+    "c": "close",
+    "v": "volume",
+}
+
+
+def _to_date(value: Any) -> date:
+    """Convert an ISO formatted date or timestamp string (e.g. a candle's 't'
+    value) to a date."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
 class MarketDataManager:
-    
-    def __init__(self, cache_dir: str="./data/cache"):
-        self.client = MarketDataClient()
-        self.client_async = MarketDataAsyncClient()
-        self.candle_cache = {}
-        self.first_available_cache = {}
-        
+    def __init__(
+        self,
+        cache_dir: str = "./data/cache",
+        incremental: bool = True,
+        max_cached_frames: int | None = None,
+        max_cache_bytes: int | None = 1024**3,
+        store: str = "parquet",
+        chain_ttls: Dict[str, float] | None = None,
+        chain_stale_ttl: float = 30.0,
+        persist_chains: bool = False,
+        decode_executor: Executor | None = None,
+        wire_format: str = "json",
+        base_url: str | None = None,
+        metrics: MetricsRegistry | None = None,
+        api_key: str | None = None,
+        resample: bool = True,
+    ):
+        """
+        Args:
+            cache_dir (str, optional): Directory for the on-disk caches. Defaults to
+                "./data/cache".
+            incremental (bool, optional): When cached candles only partially cover a
+                request, fetch just the missing leading/trailing ranges and merge them
+                into the cache instead of refetching the full history. Defaults to True.
+            max_cached_frames (int, optional): Maximum number of candle frames kept in
+                memory, one per symbol, resolution and store partition (a month of
+                intraday candles or a year of others). None means no limit. Defaults to
+                None.
+            max_cache_bytes (int, optional): Maximum memory used by the in-memory candle
+                frames, as measured by DataFrame.memory_usage(deep=True). Least recently
+                used frames are evicted and re-read from the file cache when needed
+                again. None means no limit. Defaults to 1 GiB.
+            store (str, optional): Format of the on-disk candle cache. "parquet" stores
+                partitioned, compressed datasets. "feather" stores uncompressed Arrow
+                IPC files that are memory-mapped on read, so processes reading the same
+                candles share memory. Defaults to "parquet".
+            chain_ttls (Dict[str, float], optional): Seconds an options chain is served
+                from the cache, by feed ("live" or "cached"). Defaults to
+                chain_cache.DEFAULT_CHAIN_TTLS.
+            chain_stale_ttl (float, optional): Seconds after expiry an options chain is
+                still returned while it is refreshed in the background. Defaults to
+                30.0.
+            persist_chains (bool, optional): Also keep cached options chains on disk
+                under cache_dir, so they survive restarts. Defaults to False.
+            decode_executor (Executor, optional): Thread or process pool the async
+                client decodes large responses on, instead of the event loop. Defaults
+                to None.
+            wire_format (str, optional): Format candles and options chains are
+                transferred in, "json" or "csv". CSV responses are smaller and faster to
+                parse. Chain requests that set a format in their basic_params keep it.
+                Defaults to "json".
+            base_url (str, optional): Root URL of the v1 API the clients call, e.g. a
+                local mock server. Defaults to the marketdata.app API.
+            metrics (MetricsRegistry, optional): Registry the clients' requests and the
+                cache tiers' hits, misses and fills are recorded in. Defaults to the
+                registry shared by the process, which is disabled until
+                metrics.enable_metrics() is called.
+            api_key (str, optional): The marketdata.app API key. Defaults to the
+                MARKET_DATA_API_KEY environment variable, read when the first request is
+                sent, so a manager that only reads the cache doesn't need one.
+            resample (bool, optional): Answer candle requests that aren't cached from
+                cached candles of a finer resolution that covers the range, e.g. hourly
+                and 4-hourly candles from 1-minute candles or weekly candles from daily
+                ones, instead of fetching them. See resample.can_resample. Defaults to
+                True.
+        """
+        if store not in CANDLE_STORES:
+            raise ValueError(
+                f"Invalid store: {store}. Must be one of {list(CANDLE_STORES)}"
+            )
+        if wire_format not in ("json", "csv"):
+            raise ValueError(
+                f"Invalid wire_format: {wire_format}. Must be 'json' or 'csv'"
+            )
+        self.metrics = metrics or get_metrics()
+        client_options: Dict[str, Any] = {"base_url": base_url} if base_url else {}
+        client_options["metrics"] = self.metrics
+        client_options["api_key"] = api_key
+        self.client = MarketDataClient(**client_options)
+        self.client_async = MarketDataAsyncClient(
+            decode_executor=decode_executor, **client_options
+        )
+        self.candle_cache = LRUCache(
+            max_entries=max_cached_frames, max_bytes=max_cache_bytes
+        )
+        self.incremental = incremental
+        self.resample = resample
+        self.wire_format = wire_format
+        self.cache_dir = cache_dir
+        self.candle_dir = os.path.join(cache_dir, "candles")
+
         if not os.path.exists(cache_dir):
             os.makedirs(cache_dir)
-        if not os.path.exists(f"{cache_dir}/candles"):
-            os.makedirs(f"{cache_dir}/candles")
-    
+        if not os.path.exists(self.candle_dir):
+            os.makedirs(self.candle_dir)
+
+        self.manifest = CandleCacheManifest(
+            os.path.join(self.candle_dir, "_manifest.sqlite"),
+            legacy_dir=self.candle_dir,
+        )
+        self.store: CandleStore = CANDLE_STORES[store](self.candle_dir)
+
+        self.chain_cache = OptionsChainCache(
+            ttls=chain_ttls,
+            stale_ttl=chain_stale_ttl,
+            persist_dir=os.path.join(cache_dir, "chains") if persist_chains else None,
+            metrics=self.metrics,
+        )
+        # Stale chains are refreshed on a background thread with a client of
+        # its own, since an async client's session belongs to one event loop
+        self._chain_refresher: ThreadPoolExecutor | None = None
+        self._chain_refresh_client: MarketDataAsyncClient | None = None
+
     def validate_resolution(self, resolution: str):
         # Validate the input resolution
         pattern = re.compile(r"(\d+[MHWDY]?\b)")
         if not pattern.match(resolution):
-            logger.error("Invalid resolution format. Must be in the format <number>[MHDWY]")
+            logger.error(
+                "Invalid resolution format. Must be in the format <number>[MHDWY]"
+            )
             return False
         return True
-    
+
     def get_first_available_date(self, symbol: str, resolution: str):
         # Get the first available date for the symbol
         # This is useful for determining the earliest date that we can get data for
         # for a given symbol
-        
+
         if not self.validate_resolution(resolution):
-            logger.error("Invalid resolution format. Must be in the format <number>[MHDWY]")
-            raise ValueError("Invalid resolution format. Must be in the format <number>[MHDWY]")
-        
-        if symbol not in self.first_available_cache:
-        
-            if not os.path.exists(f"./data/cache/candles/_first_available_{symbol}.json"):
-                return None
-            
-            with open(f"./data/cache/candles/_first_available_{symbol}.json", "rb") as f:
-                first_available = json.load(f)
-                self.first_available_cache[symbol] = first_available
-        
-        first_available_date = self.first_available_cache[symbol].get(resolution, None)
-        if first_available_date:
-            return date.fromisoformat(first_available_date)
-            
+            logger.error(
+                "Invalid resolution format. Must be in the format <number>[MHDWY]"
+            )
+            raise ValueError(
+                "Invalid resolution format. Must be in the format <number>[MHDWY]"
+            )
+
+        entry = self.manifest.get(symbol, resolution)
+        if entry:
+            return entry["first_available"]
+
     def set_first_available_date(self, symbol: str, resolution: str, date: date):
         # Set the first available date for the symbol
         # This is useful for determining the earliest date that we can get data for
         # for a given symbol
-        
+
         if not self.validate_resolution(resolution):
-            logger.error("Invalid resolution format. Must be in the format <number>[MHDWY]")
-            raise ValueError("Invalid resolution format. Must be in the format <number>[MHDWY]")
-        
-        if symbol not in self.first_available_cache:
-            self.first_available_cache[symbol] = {}
-        
-        self.first_available_cache[symbol][resolution] = date.isoformat()
-        
-        with open(f"./data/cache/candles/_first_available_{symbol}.json", "w", encoding="utf-8") as f:
-            # Serialize the date object to a string
-            out_str = json.dumps(self.first_available_cache[symbol])
-            # Write the string to the file
-            f.write(out_str)
-            
-    
+            logger.error(
+                "Invalid resolution format. Must be in the format <number>[MHDWY]"
+            )
+            raise ValueError(
+                "Invalid resolution format. Must be in the format <number>[MHDWY]"
+            )
+
+        self.manifest.set_first_available(symbol, resolution, date)
+
     def get_stock_candles(
         self,
         symbols: List[str],
@@ -82,206 +220,860 @@ class MarketDataManager:
         from_date: date | datetime,
         to_date: date | datetime | None = None,
         friendly_names=True,
-        use_cache=True
-    ) -> Dict[str, tuple[pd.DataFrame, int]]:
+        use_cache=True,
+    ) -> Dict[str, pd.DataFrame | None]:
         if isinstance(from_date, datetime):
             from_date = from_date.date()
         if isinstance(to_date, datetime):
             to_date = to_date.date()
-        
+
         if to_date is None:
             to_date = date.today()
-            
+
         if from_date > to_date:
             logger.error("from_date cannot be after to_date")
             raise ValueError("from_date cannot be after to_date")
-            # return {symbol: None for symbol in symbols}        
-        
+            # return {symbol: None for symbol in symbols}
+
         if to_date > date.today():
             to_date = date.today()
-        
+
         # Adjust for weekends and Mondays before 6pm
         if to_date.weekday() == 5:
             to_date -= timedelta(days=1)
         elif to_date.weekday() == 6:
             to_date -= timedelta(days=2)
-        elif to_date.weekday() == 0 and datetime.now().time() < datetime.strptime("18:00", "%H:%M").time():
+        elif (
+            to_date.weekday() == 0
+            and datetime.now().time() < datetime.strptime("18:00", "%H:%M").time()
+        ):
             to_date -= timedelta(days=3)
-        
+
         self.validate_resolution(resolution)
-        
-        results = {}
+
+        results: Dict[str, pd.DataFrame | None] = {}
         symbols_to_fetch = []
-        
+        gaps_to_fetch = {}
+        symbol_from_dates = {}
+        # One indexed lookup for the cache state of every requested symbol
+        entries = self.manifest.get_many(symbols, resolution)
+
         for symbol in symbols:
-            first_available_date = self.get_first_available_date(symbol, resolution)
+            entry = entries.get(symbol, {})
+            first_available_date = entry.get("first_available")
             if first_available_date and from_date < first_available_date:
-                logger.warning(f"Adjusting request date for {symbol} to available data from {first_available_date}")
+                logger.warning(
+                    f"Adjusting request date for {symbol} to available data from {first_available_date}"
+                )
                 symbol_from_date = first_available_date
             else:
                 symbol_from_date = from_date
-            
-            # Check in-memory cache
-            cached_data = self.candle_cache.get(f"{symbol}_{resolution}", None)
-            if cached_data:
-                cached_from_date = cached_data["from_date"]
-                cached_to_date = cached_data["to_date"]
-                if isinstance(cached_from_date, str):
-                    cached_from_date = date.fromisoformat(cached_from_date)
-                if isinstance(cached_to_date, str):
-                    cached_to_date = date.fromisoformat(cached_to_date)
-                if symbol_from_date >= cached_from_date and to_date <= cached_to_date:
-                    results[symbol] = cached_data["data"]
-                                
-            # Check file cache if not in memory
-            if symbol not in results:
-                file_list = [f for f in os.listdir("./data/cache/candles") if f.startswith(f"{symbol}_{resolution}")]
-                for f in file_list:
-                    parts = f.split("_")
-                    from_date_file, to_date_file = map(date.fromisoformat, [parts[2], parts[3].split(".")[0]])
-                    if symbol_from_date >= from_date_file and to_date <= to_date_file:
-                        df = pd.read_parquet(f"./data/cache/candles/{f}")
-                        self.candle_cache[f"{symbol}_{resolution}"] = \
-                        {
-                            "data": df,
-                            "from_date": symbol_from_date,
-                            "to_date": to_date_file
-                        }
-                        results[symbol] = df
-                        break
-            
+            symbol_from_dates[symbol] = symbol_from_date
+
+            if entry.get("path"):
+                if (
+                    symbol_from_date >= entry["from_date"]
+                    and to_date <= entry["to_date"]
+                ):
+                    self.metrics.record_cache("candle_disk", "hit")
+                    results[symbol] = self._read_cached_candles(
+                        symbol, resolution, entry, symbol_from_date, to_date
+                    )
+                    continue
+
+            # Build the candles from a finer resolution before fetching anything
+            if self.resample:
+                df = self._resample_cached_candles(
+                    symbol, resolution, symbol_from_date, to_date
+                )
+                if df is not None:
+                    results[symbol] = df
+                    continue
+
+            if entry.get("path"):
+                if self.incremental:
+                    self.metrics.record_cache("candle_disk", "partial")
+                    # Only the ranges outside the cached coverage need fetching
+                    gaps_to_fetch[symbol] = self._candle_cache_gaps(
+                        symbol_from_date, to_date, entry["from_date"], entry["to_date"]
+                    )
+                    continue
+
             # If not found in cache, add to list to update via API request
-            if symbol not in results:
-                symbols_to_fetch.append(symbol)
-        
+            self.metrics.record_cache("candle_disk", "miss")
+            symbols_to_fetch.append(symbol)
+
         # Update symbols that were not found in the available cache
-        if symbols_to_fetch:            
+        if symbols_to_fetch:
             self._update_candle_cache(symbols_to_fetch, resolution)
-            for symbol in symbols_to_fetch:
-                if symbol not in results:
-                    results[symbol] = None
+        if gaps_to_fetch:
+            self._top_up_candle_cache(gaps_to_fetch, resolution)
+        refreshed = symbols_to_fetch + list(gaps_to_fetch)
+        if refreshed:
+            entries.update(self.manifest.get_many(refreshed, resolution))
+            for symbol in refreshed:
+                entry = entries.get(symbol, {})
+                if entry.get("path"):
+                    results[symbol] = self._read_cached_candles(
+                        symbol, resolution, entry, symbol_from_dates[symbol], to_date
+                    )
                 else:
-                    results[symbol] = self.candle_cache[f"{symbol}_{resolution}"]["data"]
-        
+                    results[symbol] = None
+
         # Process each dataframe
         for symbol, df in results.items():
             if df is not None:
-                
-                if first_available_date is None:                    
-                    try:
-                        actual_from_date = df.at[0, 't']
-                        self.set_first_available_date(symbol, resolution, date.fromisoformat(actual_from_date))
-                    except AttributeError as e:
-                        logger.error(f"Failed to set first available date for {symbol}")
-                        logger.error(df)
-                        raise e
-                    
-                if self.get_first_available_date(symbol, resolution) > from_date:
-                    logger.warning(f"Requested data is not available for {symbol} from {from_date}. Using first available data from {self.get_first_available_date(symbol, resolution)} instead.")
-                
-                try:                    
-                    if 't' in df.columns:                        
-                        df.set_index('t', inplace=True)
-                except AttributeError as e:
-                    logger.error(f"Failed to set index for {symbol}")
-                    raise e
-                except KeyError as e:
-                    print(results['SPY'])
-                    raise e
-                
-                # Filter the data to the requested date range
-                df = df[(df.index >= from_date.isoformat()) & (df.index <= to_date.isoformat())]
-                df.reset_index(inplace=True)
-                
+                first_available_date = entries.get(symbol, {}).get("first_available")
+                if first_available_date and first_available_date > from_date:
+                    logger.warning(
+                        f"Requested data is not available for {symbol} from "
+                        f"{from_date}. Using first available data from "
+                        f"{first_available_date} instead."
+                    )
+
+                # A view of the cached frame. With Copy-on-Write the copy shares
+                # the cached columns until the caller writes to them; without it
+                # an in-place edit would reach the cache, so the data is copied.
+                df = self._slice_candles(df, from_date, to_date).copy(
+                    deep=not _copy_on_write()
+                )
+
                 if friendly_names:
-                    df = df.rename(columns={'t': 'datetime', 'o': 'open', 'h': 'high', 'l': 'low', 'c': 'close', 'v': 'volume'})
-                
+                    df.columns = [FRIENDLY_CANDLE_COLUMNS.get(c, c) for c in df.columns]
+
                 results[symbol] = df
-        
+
         return results
-    
+
+    def _read_cached_candles(
+        self, symbol: str, resolution: str, entry: dict, from_date: date, to_date: date
+    ) -> pd.DataFrame | None:
+        """Get a symbol's cached candles covering a date range. The memory cache
+        holds the candles of each store partition (a month of intraday candles, a
+        year of others) separately. On a miss only the partitions overlapping the
+        range are read from the candle store, which skips the rest of the
+        symbol's history. Callers slice the range they need."""
+        from_date = max(from_date, entry["from_date"])
+        to_date = min(to_date, entry["to_date"])
+        frames: Dict[date, pd.DataFrame] = {}
+        missing: List[Tuple[date, date]] = []
+        for start, end in partition_ranges(resolution, from_date, to_date):
+            cached_data = self.candle_cache.get(
+                (symbol, resolution, start),
+                None,
+                covers=lambda c: c["from_date"] <= max(start, from_date)
+                and min(end, to_date) <= c["to_date"],
+            )
+            if cached_data is None:
+                missing.append((start, end))
+            else:
+                frames[start] = cached_data["data"]
+
+        if not missing:
+            self.metrics.record_cache("candle_memory", "hit")
+        else:
+            self.metrics.record_cache("candle_memory", "miss")
+            # Consecutive missing partitions are read together
+            runs = [list(missing[0])]
+            for start, end in missing[1:]:
+                if start == runs[-1][1] + timedelta(days=1):
+                    runs[-1][1] = end
+                else:
+                    runs.append([start, end])
+            try:
+                store = self._store_for_entry(symbol, resolution, entry)
+                for run_from, run_to in runs:
+                    run_from = max(run_from, entry["from_date"])
+                    run_to = min(run_to, entry["to_date"])
+                    df = store.read(
+                        symbol, resolution, run_from, run_to, path=entry["path"]
+                    )
+                    frames.update(
+                        self._cache_partitions(
+                            symbol,
+                            resolution,
+                            self._index_candles(df),
+                            run_from,
+                            run_to,
+                        )
+                    )
+            except FileNotFoundError:
+                logger.warning(
+                    f"Cached candles for {symbol} {resolution} are missing from "
+                    f"{entry['path']}"
+                )
+                return None
+            self.metrics.record_cache("candle_memory", "fill")
+
+        parts = [frames[start] for start in sorted(frames)]
+        return parts[0] if len(parts) == 1 else pd.concat(parts)
+
+    def _cache_partitions(
+        self,
+        symbol: str,
+        resolution: str,
+        df: pd.DataFrame,
+        from_date: date,
+        to_date: date,
+    ) -> Dict[date, pd.DataFrame]:
+        """Put indexed candles covering a date range into the memory cache, one
+        entry per store partition. Returns the candles of each partition, by the
+        partition's first date."""
+        frames: Dict[date, pd.DataFrame] = {}
+        for start, end in partition_ranges(resolution, from_date, to_date):
+            frames[start] = self._slice_candles(df, start, end)
+            self.candle_cache[(symbol, resolution, start)] = {
+                "data": frames[start],
+                "from_date": max(start, from_date),
+                "to_date": min(end, to_date),
+            }
+        return frames
+
+    def _forget_cached_candles(
+        self, symbol: str, resolution: str, from_date: date, to_date: date
+    ) -> None:
+        """Drop the memory cache partitions of a symbol that overlap a date range,
+        e.g. once their candles in the store have changed."""
+        for start, _ in partition_ranges(resolution, from_date, to_date):
+            self.candle_cache.pop((symbol, resolution, start))
+
+    def _resample_source(
+        self, symbol: str, resolution: str, from_date: date, to_date: date
+    ) -> dict | None:
+        """Find the cached resolution of a symbol that candles of resolution can be
+        built from for a date range. Of the finer resolutions that cover the range,
+        the coarsest is used, as it has the fewest candles to read and aggregate."""
+        source = None
+        for entry in self.manifest.get_resolutions(symbol):
+            if not entry["path"] or not can_resample(entry["resolution"], resolution):
+                continue
+            # The range before the first available date is covered by definition
+            start = (
+                max(from_date, entry["first_available"])
+                if entry["first_available"]
+                else from_date
+            )
+            if start < entry["from_date"] or to_date > entry["to_date"]:
+                continue
+            if source is None or resolution_span(entry["resolution"]) > resolution_span(
+                source["resolution"]
+            ):
+                source = entry
+        return source
+
+    def _resample_cached_candles(
+        self, symbol: str, resolution: str, from_date: date, to_date: date
+    ) -> pd.DataFrame | None:
+        """Build a symbol's candles for a date range from a finer cached resolution.
+        Returns None when no cached resolution covers the range."""
+        entry = self._resample_source(symbol, resolution, from_date, to_date)
+        if entry is None:
+            return None
+        # Read whole weeks, months or years, so the candles at the ends of the
+        # range aren't built from part of their period
+        window_from = max(period_bounds(from_date, resolution)[0], entry["from_date"])
+        window_to = min(period_bounds(to_date, resolution)[1], entry["to_date"])
+        df = self._read_cached_candles(
+            symbol, entry["resolution"], entry, window_from, window_to
+        )
+        if df is None:
+            return None
+        df = self._slice_candles(df, window_from, window_to)
+        logger.debug(
+            f"Resampling {symbol} {entry['resolution']} candles to {resolution} for "
+            f"{from_date} to {to_date}"
+        )
+        self.metrics.record_cache("resampled", "hit")
+        return self._index_candles(
+            resample_candles(df, entry["resolution"], resolution)
+        )
+
+    @staticmethod
+    def _index_candles(df: pd.DataFrame) -> pd.DataFrame:
+        """Put candles on a sorted DatetimeIndex in the market's timezone, so
+        date ranges can be sliced from them with a binary search. The 't' column
+        is kept as it is."""
+        times = candle_times(df["t"])
+        if not times.is_monotonic_increasing:
+            order = np.argsort(times.asi8, kind="stable")
+            df, times = df.iloc[order], times[order]
+        # A shallow copy, so the caller's frame keeps its index
+        df = df.copy(deep=False)
+        df.index = times
+        return df
+
+    @staticmethod
+    def _slice_candles(
+        df: pd.DataFrame, from_date: date, to_date: date
+    ) -> pd.DataFrame:
+        """Get the candles from the start of from_date to the end of to_date as a
+        view of df, found by binary search on its sorted DatetimeIndex."""
+        lower = pd.Timestamp(from_date).tz_localize(MARKET_TIMEZONE)
+        upper = pd.Timestamp(to_date + timedelta(days=1)).tz_localize(MARKET_TIMEZONE)
+        start, stop = df.index.searchsorted([lower, upper])
+        return df.iloc[start:stop]
+
+    def _store_for_entry(
+        self, symbol: str, resolution: str, entry: dict
+    ) -> CandleStore:
+        """Get the store that wrote a cache entry, which differs from self.store
+        when the cache was written by an earlier version or another backend."""
+        if entry["path"] == self.store.path(symbol, resolution):
+            return self.store
+        return store_for_path(entry["path"], self.candle_dir)
+
+    @staticmethod
+    def _candle_cache_gaps(
+        from_date: date, to_date: date, cached_from_date: date, cached_to_date: date
+    ) -> List[Tuple[date, date]]:
+        """Return the date ranges of a request that fall outside the cached range.
+
+        The gaps overlap the cached range by one day so that a partially cached
+        day (e.g. intraday candles fetched during the session) is completed.
+        """
+        gaps = []
+        if from_date < cached_from_date:
+            gaps.append((from_date, cached_from_date))
+        if to_date > cached_to_date:
+            gaps.append((cached_to_date, to_date))
+        return gaps
+
+    def _write_candle_cache(
+        self, symbol: str, resolution: str, df: pd.DataFrame
+    ) -> None:
+        """Replace a symbol's cached candles in the store and in memory with df."""
+        actual_from_date = _to_date(df.at[0, "t"])
+        actual_to_date = _to_date(df.at[df.index[-1], "t"])
+        old_entry = self.manifest.get(symbol, resolution)
+
+        # The store swaps the new data in atomically, then the manifest is
+        # pointed at it
+        self.store.write(symbol, resolution, df, replace=True)
+        path = self.store.path(symbol, resolution)
+        self.manifest.record_write(
+            symbol, resolution, actual_from_date, actual_to_date, len(df), path
+        )
+        self.metrics.record_cache("candle_disk", "fill")
+
+        # Remove data written by an earlier version or another backend
+        if old_entry and old_entry["path"] and old_entry["path"] != path:
+            if os.path.isfile(old_entry["path"]):
+                os.remove(old_entry["path"])
+            elif os.path.isdir(old_entry["path"]):
+                shutil.rmtree(old_entry["path"])
+
+        # And put the data into the in-memory cache
+        if old_entry and old_entry["path"]:
+            self._forget_cached_candles(
+                symbol, resolution, old_entry["from_date"], old_entry["to_date"]
+            )
+        self._cache_partitions(
+            symbol,
+            resolution,
+            self._index_candles(df),
+            actual_from_date,
+            actual_to_date,
+        )
+        self.metrics.record_cache("candle_memory", "fill")
+
     def _update_candle_cache(self, symbols: List[str], resolution: str):
-        
         logger.debug(f"Updating cache for {symbols} with resolution {resolution}")
-        
+
         # Since we are updating the cache we want to fetch all available data
-        from_date = date(2000, 1, 1)
-        to_date = date.today()        
-    
-        fetched_data = self.client_async.get_stock_candles_parallel(symbols, resolution, from_date, to_date)
-        for symbol, (data, status_code) in fetched_data.items():
-            if data.get("s") == "no_data":
-                logger.warning(f"No data available for {symbol} for resolution {resolution} and date range {from_date} to {to_date}")
+        from_date = HISTORY_START_DATE
+        to_date = date.today()
+
+        fetched_data = self.client_async.get_stock_candles_parallel(
+            symbols, resolution, from_date, to_date, wire_format=self.wire_format
+        )
+        for symbol, df in self._valid_candle_frames(
+            fetched_data, resolution, from_date, to_date
+        ):
+            logger.info(
+                f"Candle cache updated for {symbol} for resolution {resolution} and "
+                f"date range {from_date} to {to_date}"
+            )
+            self.set_first_available_date(symbol, resolution, _to_date(df.at[0, "t"]))
+            self._write_candle_cache(symbol, resolution, df)
+
+    def _top_up_candle_cache(
+        self, gaps: Dict[str, List[Tuple[date, date]]], resolution: str
+    ) -> None:
+        """Fetch only the missing date ranges for partially cached symbols and
+        merge them into the partitions of the store they fall in.
+
+        Args:
+            gaps (Dict[str, List[Tuple[date, date]]]): The (from, to) ranges to fetch
+                for each symbol.
+            resolution (str): The candle resolution.
+        """
+        # Symbols usually share the same gap (e.g. everything cached up to the
+        # previous session), so group them to fetch each range in one batch
+        symbols_by_gap: Dict[Tuple[date, date], List[str]] = {}
+        for symbol, symbol_gaps in gaps.items():
+            for gap in symbol_gaps:
+                symbols_by_gap.setdefault(gap, []).append(symbol)
+
+        new_frames: Dict[str, List[pd.DataFrame]] = {}
+        # The ranges the API answered for each symbol. A range without candles
+        # (e.g. before the listing, or only closed days) is covered all the same,
+        # so it isn't refetched by every request. Today is only covered by its
+        # candles, as its session may not have started yet.
+        covered: Dict[str, Tuple[date, date]] = {}
+        last_closed = date.today() - timedelta(days=1)
+        for (from_date, to_date), symbols in symbols_by_gap.items():
+            logger.debug(
+                f"Topping up cache for {symbols} with resolution {resolution} from "
+                f"{from_date} to {to_date}"
+            )
+            fetched_data = self.client_async.get_stock_candles_parallel(
+                symbols, resolution, from_date, to_date, wire_format=self.wire_format
+            )
+            for symbol, df in self._valid_candle_frames(
+                fetched_data, resolution, from_date, to_date
+            ):
+                new_frames.setdefault(symbol, []).append(df)
+            for symbol, data in fetched_data.items():
+                if isinstance(data, pd.DataFrame) or (
+                    isinstance(data, dict) and data.get("s") == "no_data"
+                ):
+                    gap_to = min(to_date, last_closed)
+                    covered_from, covered_to = covered.get(symbol, (from_date, gap_to))
+                    covered[symbol] = (
+                        min(covered_from, from_date),
+                        max(covered_to, gap_to),
+                    )
+
+        for symbol, (covered_from, covered_to) in covered.items():
+            entry = self.manifest.get(symbol, resolution)
+            frames = new_frames.get(symbol)
+            if not frames:
+                if entry is not None and entry["path"]:
+                    logger.info(
+                        f"No candles for {symbol} for resolution {resolution} from "
+                        f"{covered_from} to {covered_to}. Recorded as cached"
+                    )
+                    self.manifest.record_write(
+                        symbol,
+                        resolution,
+                        min(entry["from_date"], covered_from),
+                        max(entry["to_date"], covered_to),
+                        entry["row_count"],
+                        entry["path"],
+                    )
                 continue
-            elif data.get("s") == "error":
-                logger.error(f"Error fetching data for {symbol} for resolution {resolution} and date range {from_date} to {to_date}")
-                logger.error(data)
+
+            df = (
+                pd.concat(frames, ignore_index=True)
+                .drop_duplicates(subset="t", keep="last")
+                .sort_values("t", ignore_index=True)
+            )
+            path = self.store.path(symbol, resolution)
+            if entry is None:
+                # Removed from the cache since its gaps were found
+                self._write_candle_cache(symbol, resolution, df)
                 continue
-            elif 200 <= status_code < 300:
-                logger.info(f"Candle cache updated for {symbol} for resolution {resolution} and date range {from_date} to {to_date}")
-                df = pd.DataFrame(data)
-                actual_from_date = df.at[0, 't']
-                actual_to_date = df.at[df.index[-1], 't']
-                self.set_first_available_date(symbol, resolution, date.fromisoformat(actual_from_date))
-                
-                # Delete old files for this symbol and resolution
-                old_files = [f for f in os.listdir(f"./data/cache/candles") if f.startswith(f"{symbol}_{resolution}")]
-                for f in old_files:
-                    os.remove(f"./data/cache/candles/{f}")
-                
-                # Write the data to the file cache
-                df.to_parquet(f"./data/cache/candles/{symbol}_{resolution}_{actual_from_date}_{actual_to_date}.parquet")
-                
-                # And put the data into the in-memory cache
-                self.candle_cache[f"{symbol}_{resolution}"] = {
-                    "from_date": actual_from_date,
-                    "to_date": actual_to_date,
-                    "data": df
-                }
+            if entry["path"] != path:
+                # Migrate data written by an earlier version or another backend
+                old_store = self._store_for_entry(symbol, resolution, entry)
+                df = (
+                    pd.concat(
+                        [old_store.read(symbol, resolution, path=entry["path"]), df],
+                        ignore_index=True,
+                    )
+                    .drop_duplicates(subset="t", keep="last")
+                    .sort_values("t", ignore_index=True)
+                )
+                self._write_candle_cache(symbol, resolution, df)
+                continue
+
+            written_from = min(covered_from, _to_date(df.at[0, "t"]))
+            written_to = max(covered_to, _to_date(df.at[df.index[-1], "t"]))
+            self.store.write(symbol, resolution, df)
+            self.manifest.record_write(
+                symbol,
+                resolution,
+                min(entry["from_date"], written_from),
+                max(entry["to_date"], written_to),
+                self.store.count_rows(symbol, resolution),
+                path,
+            )
+            self.metrics.record_cache("candle_disk", "fill")
+            # The in-memory candles of these partitions no longer match the store
+            self._forget_cached_candles(symbol, resolution, written_from, written_to)
+            logger.info(
+                f"Candle cache topped up for {symbol} for resolution {resolution} "
+                f"with {len(df)} candles"
+            )
+
+    def _valid_candle_frames(
+        self, fetched_data: dict, resolution: str, from_date: date, to_date: date
+    ) -> Iterator[Tuple[str, pd.DataFrame]]:
+        """Yield (symbol, DataFrame) for each successful response from
+        get_stock_candles_parallel, logging the ones without usable data."""
+        for symbol, data in fetched_data.items():
+            if isinstance(data, pd.DataFrame):
+                yield symbol, data
+            elif isinstance(data, dict) and data.get("s") == "no_data":
+                logger.warning(
+                    f"No data available for {symbol} for resolution {resolution} and date range {from_date} to {to_date}"
+                )
+            elif isinstance(data, dict) and data.get("s") == "error":
+                logger.error(
+                    f"Error fetching data for {symbol} for resolution {resolution} and date range {from_date} to {to_date}"
+                )
+                logger.error(data)
             else:
-                logger.error(f"Unknown status code for {symbol} for resolution {resolution} and date range {from_date} to {to_date}")
+                logger.error(
+                    f"Unexpected response for {symbol} for resolution {resolution} "
+                    f"and date range {from_date} to {to_date}"
+                )
                 logger.error(data)
-                logger.error(status_code)
-                raise ValueError(f"Unknown status code for {symbol} for resolution {resolution} and date range {from_date} to {to_date}")
-    
-    
-    def get_option_chains(self, params: List[OptionsChainParams]) -> List[dict]:
+
+    def ingest_daily_snapshot(
+        self,
+        snapshot_date: date | None = None,
+        resolution: str = "1D",
+        holidays: Iterable[date] = (),
+    ) -> Dict[str, List[str]]:
+        """Fetch one day's candle for every symbol in the market with a single bulk
+        snapshot request and append it to the cached daily series.
+
+        A symbol's candle is only appended when its cached coverage ends on the
+        session before the snapshot's, so the cache never claims coverage across a
+        gap. Symbols whose coverage already includes the snapshot's day are left
+        as they are, and the others are left for get_stock_candles to top up. The candles are written
+        with one batched store write and the manifest is updated for all appended
+        symbols in one transaction.
+
+        Args:
+            snapshot_date (date, optional): The day to ingest. Defaults to the latest
+                session.
+            resolution (str, optional): The daily resolution the candles are cached
+                under. Defaults to "1D".
+            holidays (Iterable[date], optional): Closures to skip besides those of
+                market_calendar.market_holidays, e.g. ones announced after this release.
+                Defaults to ().
+
+        Returns:
+            Dict[str, List[str]]: The symbols whose candle was "appended", the cached
+                symbols skipped because their coverage is "already_cached" up to the
+                snapshot's day or "not_contiguous" with it, and the symbols "not_cached"
+                at all.
+        """
+        basic_params = BasicParams(
+            lookup_date=snapshot_date, limit=None, format=self.wire_format
+        )
+        df, status_code = self.client.get_bulk_stock_candles(
+            [], basic_params=basic_params, snapshot=True
+        )
+        if not isinstance(df, pd.DataFrame) or df.empty:
+            logger.error(
+                f"Daily snapshot for {snapshot_date or 'the latest session'} failed. "
+                f"Status: {status_code}"
+            )
+            logger.error(df)
+            return {
+                "appended": [],
+                "already_cached": [],
+                "not_contiguous": [],
+                "not_cached": [],
+            }
+
+        df = df.drop_duplicates(subset="symbol", keep="last").reset_index(drop=True)
+        symbols = df["symbol"].astype(str).to_numpy()
+        days = np.array([_to_date(t) for t in df["t"]], dtype="datetime64[D]")
+        entries = self.manifest.get_many(symbols, resolution)
+
+        # Vectorized coverage check: the snapshot extends a symbol's series if its
+        # day is after the cached to_date and no session lies between them
+        cached = np.array(
+            [
+                symbol in entries
+                and entries[symbol]["path"] == self.store.path(symbol, resolution)
+                for symbol in symbols
+            ],
+            dtype=bool,
+        )
+        cached_to = np.array(
+            [
+                entries[symbol]["to_date"] if is_cached else date.min
+                for symbol, is_cached in zip(symbols, cached)
+            ],
+            dtype="datetime64[D]",
+        )
+        after = cached & (cached_to < days)
+        gap_start = np.where(after, cached_to + 1, days)
+        first_day = (gap_start[after] if after.any() else days).min().astype(date)
+        holidays = market_holidays(first_day, days.max().astype(date), extra=holidays)
+        contiguous = after & (np.busday_count(gap_start, days, holidays=holidays) == 0)
+
+        # One batched write for every appended symbol
+        self.store.write_many(resolution, df[contiguous])
+        writes = []
+        for i in np.flatnonzero(contiguous):
+            symbol = symbols[i]
+            entry = entries[symbol]
+            day = days[i].astype(date)
+            writes.append(
+                (
+                    symbol,
+                    resolution,
+                    entry["from_date"],
+                    day,
+                    (entry["row_count"] or 0) + 1,
+                    entry["path"],
+                )
+            )
+            # The in-memory candles of its partition no longer match the store
+            self._forget_cached_candles(symbol, resolution, day, day)
+        self.manifest.record_writes(writes)
+        self.metrics.record_cache("candle_disk", "fill", len(writes))
+
+        result = {
+            "appended": symbols[contiguous].tolist(),
+            "already_cached": symbols[cached & ~after].tolist(),
+            "not_contiguous": symbols[after & ~contiguous].tolist(),
+            "not_cached": symbols[~cached].tolist(),
+        }
+        logger.info(
+            f"Ingested daily snapshot: {len(result['appended'])} appended, "
+            f"{len(result['already_cached'])} already cached, "
+            f"{len(result['not_contiguous'])} not contiguous, "
+            f"{len(result['not_cached'])} not cached"
+        )
+        return result
+
+    def get_option_chains(
+        self,
+        params: List[OptionsChainParams],
+        use_cache: bool = True,
+        filter_locally: bool = True,
+        fetch_superset: bool = False,
+    ) -> List[pd.DataFrame | dict]:
         """
         Fetch options chains for multiple symbols in parallel.
 
+        Chains fetched within their feed's TTL are served from the chain cache, and
+        identical requests in the list are fetched once. Chains that expired less
+        than chain_stale_ttl seconds ago are returned as they are and refreshed in
+        the background.
+
+        When the full chain a request filters (chain_filter.superset_params) is in
+        the cache, the request's strike, side, range, liquidity and expiration
+        filters are applied to it locally instead of calling the API, so sweeping
+        filter combinations over one underlying costs a single request.
+
         Args:
-            params (List[OptionsChainParams]): A list of OptionsChainParams objects 
+            params (List[OptionsChainParams]): A list of OptionsChainParams objects
                                             specifying the options chains to retrieve.
+            use_cache (bool, optional): Serve chains from the chain cache. When False
+                every chain is fetched and the cache is left untouched. Defaults to
+                True.
+            filter_locally (bool, optional): Filter cached full chains locally. Defaults
+                to True.
+            fetch_superset (bool, optional): Fetch the full chain of requests whose full
+                chain isn't cached and filter it locally, instead of fetching the
+                filtered chain. Full chains cost a credit per contract, so this pays off
+                when many filters are applied to the same chain. Defaults to False.
 
         Returns:
-            Dict[str, pd.DataFrame]: A dictionary where each key is a UUID (string) 
-            generated for the request, and each value is a pandas DataFrame 
-            containing the options chain data for the corresponding request.
-            The UUID can be used to match the returned data with the input parameters.
+            List[pd.DataFrame | dict]: The options chain data for each request, in the
+                order of params.
+            Failed requests have an error dict in their place.
         """
-        return self.client_async.get_options_chains_parallel(params)
+        if not use_cache:
+            return self.client_async.get_options_chains_parallel(
+                self._with_wire_format(params)
+            )
+
+        results: List[Any] = [None] * len(params)
+        remaining: List[int] = []
+        supersets: Dict[str, OptionsChainParams] = {}
+        members: Dict[str, List[int]] = {}
+        for i, chain_params in enumerate(params):
+            if not filter_locally or chain_params.output != "dataframe":
+                remaining.append(i)
+                continue
+            superset = superset_params(chain_params)
+            key = superset.cache_key()
+            supersets.setdefault(key, superset)
+            members.setdefault(key, []).append(i)
+
+        if supersets:
+            if fetch_superset:
+                chains = self._get_cached_option_chains(list(supersets.values()))
+            else:
+                # Peeked, so that only the user's requests are counted: a hit for
+                # each filtered from a cached full chain, and a lookup of their own
+                # for the rest
+                chains = []
+                stale = []
+                for key, superset in supersets.items():
+                    data, state = self.chain_cache.peek(superset)
+                    chains.append(data)
+                    if isinstance(data, pd.DataFrame):
+                        for _ in members[key]:
+                            self.chain_cache.record_lookup(state)
+                    if state == STALE:
+                        stale.append(superset)
+                if stale:
+                    self._refresh_option_chains(stale)
+            for key, chain in zip(supersets, chains):
+                for i in members[key]:
+                    if isinstance(chain, pd.DataFrame):
+                        results[i] = filter_chain(chain, params[i])
+                    else:
+                        remaining.append(i)
+
+        if remaining:
+            fetched = self._get_cached_option_chains([params[i] for i in remaining])
+            for i, data in zip(remaining, fetched):
+                results[i] = data
+        return results
+
+    def _get_cached_option_chains(
+        self, params: List[OptionsChainParams]
+    ) -> List[pd.DataFrame | dict]:
+        """Get chains from the chain cache, fetching the missing ones once each and
+        refreshing the stale ones in the background."""
+        results: List[Any] = [None] * len(params)
+        to_fetch: Dict[str, OptionsChainParams] = {}
+        positions: Dict[str, List[int]] = {}
+        stale: Dict[str, OptionsChainParams] = {}
+        for i, chain_params in enumerate(params):
+            data, state = self.chain_cache.lookup(chain_params)
+            key = chain_params.cache_key()
+            if state == MISS:
+                to_fetch.setdefault(key, chain_params)
+                positions.setdefault(key, []).append(i)
+                continue
+            results[i] = data
+            if state == STALE:
+                stale[key] = chain_params
+
+        if to_fetch:
+            fetched = self.client_async.get_options_chains_parallel(
+                self._with_wire_format(list(to_fetch.values()))
+            )
+            for (key, chain_params), data in zip(to_fetch.items(), fetched):
+                self.chain_cache.put(chain_params, data)
+                for i in positions[key]:
+                    results[i] = data
 
-    def get_options_quotes(self, params: List[OptionsQuoteParams]) -> Dict[str, pd.DataFrame]:
+        if stale:
+            self._refresh_option_chains(list(stale.values()))
+        return results
+
+    def _with_wire_format(
+        self, params: List[OptionsChainParams]
+    ) -> List[OptionsChainParams]:
+        """Request DataFrame chains in the manager's wire format, unless their
+        basic_params already choose one. The id of each request is kept."""
+        if self.wire_format == "json":
+            return params
+        converted = []
+        for chain_params in params:
+            if chain_params.output != "dataframe" or (
+                chain_params.basic_params
+                and chain_params.basic_params.params.get("format", "json") != "json"
+            ):
+                converted.append(chain_params)
+                continue
+            basic_params = BasicParams(
+                dateformat=None, limit=None, format=self.wire_format
+            )
+            if chain_params.basic_params:
+                basic_params.params = {
+                    **chain_params.basic_params.params,
+                    **basic_params.params,
+                }
+            # JSON dates default to unix seconds, CSV dates to timestamps
+            basic_params.params.setdefault("dateformat", "unix")
+            copy = chain_params.make_copy(basic_params=basic_params)
+            copy.id = chain_params.id
+            converted.append(copy)
+        return converted
+
+    def _refresh_option_chains(self, params: List[OptionsChainParams]) -> None:
+        """Refetch stale chains in the background. Chains already being refreshed are
+        skipped."""
+        params = [p for p in params if self.chain_cache.start_refresh(p)]
+        if not params:
+            return
+        client = self._chain_refresh_client
+        if self._chain_refresher is None or client is None:
+            self._chain_refresher = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="chain-refresh"
+            )
+            client = self._chain_refresh_client = MarketDataAsyncClient(
+                rate_limiter=self.client_async.rate_limiter,
+                decode_executor=self.client_async.decode_executor,
+                base_url=self.client_async.BASE_URL,
+                metrics=self.metrics,
+                api_key=self.client_async.api_key,
+            )
+
+        def refresh() -> None:
+            try:
+                fetched = client.get_options_chains_parallel(
+                    self._with_wire_format(params)
+                )
+                for chain_params, data in zip(params, fetched):
+                    self.chain_cache.put(chain_params, data)
+            except Exception as e:
+                logger.error(f"Error refreshing options chains: {e}")
+            finally:
+                for chain_params in params:
+                    self.chain_cache.finish_refresh(chain_params)
+
+        self._chain_refresher.submit(refresh)
+
+    def get_options_quotes(
+        self, params: List[OptionsQuoteParams]
+    ) -> Dict[str, pd.DataFrame]:
         """
         Fetch options quotes for multiple options in parallel.
 
         Args:
-            params (List[OptionsQuoteParams]): A list of OptionsQuoteParams objects 
+            params (List[OptionsQuoteParams]): A list of OptionsQuoteParams objects
                                             specifying the options quotes to retrieve.
 
         Returns:
-            Dict[str, pd.DataFrame]: A dictionary where each key is the option symbol (string) 
+            Dict[str, pd.DataFrame]: A dictionary where each key is the option symbol (string)
             for which quotes were requested, and each value is dictionary with "data" and "status_code"
-            values. "data" is a pandas DataFrame containing the quote data for that option symbol, 
+            values. "data" is a pandas DataFrame containing the quote data for that option symbol,
             and "status_code" is the HTTP status code for the request.
         """
         return self.client_async.get_options_quotes_parallel(params)
-    
+
     def get_api_call_count(self):
-        return self.client.api_calls + self.client_async.api_calls
-    
-    
-                    
+        refresh_calls = (
+            self._chain_refresh_client.api_calls if self._chain_refresh_client else 0
+        )
+        return self.client.api_calls + self.client_async.api_calls + refresh_calls
+
+    def get_credit_usage(self) -> dict:
+        """Get the API credits used today, in total and per endpoint, as tracked
+        by the rate limiter shared by the clients."""
+        return self.client.rate_limiter.usage()
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """Get the hit/miss/eviction counters and current size of the in-memory candle
+        cache."""
+        return self.candle_cache.stats()
+
+    def get_chain_cache_stats(self) -> Dict[str, int]:
+        """Get the fresh/stale/miss counters and current size of the options chain
+        cache."""
+        return self.chain_cache.stats()
+
+    def get_metrics_snapshot(self) -> dict:
+        """Get the request, queue wait and cache tier metrics recorded so far. See
+        MetricsRegistry.snapshot. Empty until metrics are enabled."""
+        return self.metrics.snapshot()
+
+
 if __name__ == "__main__":
     # mdm = MarketDataManager(API_KEY)
 
@@ -289,4 +1081,4 @@ if __name__ == "__main__":
     # logger.debug(df)
     # logger.debug(f"Status Code: {status_code}")
     # assert 200 <= status_code < 300
-    pass
\ No newline at end of file
+    pass
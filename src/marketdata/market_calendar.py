@@ -0,0 +1,88 @@
+"""
+US equity market holidays
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, List, Tuple
+
+from dateutil.easter import easter
+
+# Unscheduled full-day closures since HISTORY_START_DATE
+SPECIAL_CLOSURES = (
+    date(2001, 9, 11),
+    date(2001, 9, 12),
+    date(2001, 9, 13),
+    date(2001, 9, 14),
+    date(2004, 6, 11),
+    date(2007, 1, 2),
+    date(2012, 10, 29),
+    date(2012, 10, 30),
+    date(2018, 12, 5),
+    date(2025, 1, 9),
+)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """Get the nth (1-based, or -1 for the last) weekday of a month."""
+    if n < 0:
+        last = (date(year, month, 28) + timedelta(days=4)).replace(day=1) - timedelta(
+            days=1
+        )
+        return last - timedelta(days=(last.weekday() - weekday) % 7)
+    first = date(year, month, 1)
+    return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+
+
+def _observed(day: date) -> date:
+    """Holidays on a Saturday are observed on the Friday before, and holidays on
+    a Sunday on the Monday after."""
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+@lru_cache(maxsize=None)
+def _year_holidays(year: int) -> Tuple[date, ...]:
+    holidays = [
+        _nth_weekday(year, 1, 0, 3),  # Martin Luther King Jr. Day
+        _nth_weekday(year, 2, 0, 3),  # Washington's Birthday
+        easter(year) - timedelta(days=2),  # Good Friday
+        _nth_weekday(year, 5, 0, -1),  # Memorial Day
+        _observed(date(year, 7, 4)),
+        _nth_weekday(year, 9, 0, 1),  # Labor Day
+        _nth_weekday(year, 11, 3, 4),  # Thanksgiving
+        _observed(date(year, 12, 25)),
+    ]
+    # New Year's Day on a Saturday isn't observed on the Friday before, as that
+    # would close the market on the last day of the previous year
+    new_year = date(year, 1, 1)
+    if new_year.weekday() != 5:
+        holidays.append(_observed(new_year))
+    if year >= 2022:
+        holidays.append(_observed(date(year, 6, 19)))  # Juneteenth
+    holidays += [d for d in SPECIAL_CLOSURES if d.year == year]
+    return tuple(sorted(holidays))
+
+
+def market_holidays(
+    from_date: date, to_date: date, extra: Iterable[date] = ()
+) -> List[date]:
+    """Get the weekdays the US stock market is closed from from_date to to_date
+    (inclusive), following the NYSE holiday rules.
+
+    Args:
+        from_date (date): First date.
+        to_date (date): Last date.
+        extra (Iterable[date], optional): Further closures to include, e.g. ones
+            announced after this release. Defaults to ().
+
+    Returns:
+        List[date]: The holidays, sorted.
+    """
+    holidays = set(extra)
+    for year in range(from_date.year, to_date.year + 1):
+        holidays.update(_year_holidays(year))
+    return sorted(d for d in holidays if from_date <= d <= to_date)
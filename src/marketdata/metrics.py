@@ -0,0 +1,374 @@
+"""
+Request, queue and cache metrics with in-process snapshots and a Prometheus exporter
+"""
+import asyncio
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+# Upper bounds in seconds of the latency histogram buckets
+DEFAULT_LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+)
+
+# Cache events recorded by record_cache
+CACHE_EVENTS = ("hit", "stale", "partial", "miss", "fill")
+
+
+class Histogram:
+    """Counts of observations by bucket, with their sum. Not thread-safe on its
+    own; the registry updates histograms under its lock."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        # One count per bucket plus the +Inf bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get the cumulative bucket counts keyed by upper bound, the sum and the
+        count."""
+        cumulative: Dict[float, int] = {}
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            cumulative[bound] = total
+        return {"buckets": cumulative, "sum": self.sum, "count": self.count}
+
+
+class _QueuedSemaphore:
+    """Acquires a semaphore and records how long the caller queued for it."""
+
+    __slots__ = ("registry", "semaphore", "endpoint")
+
+    def __init__(
+        self, registry: "MetricsRegistry", semaphore: asyncio.Semaphore, endpoint: str
+    ) -> None:
+        self.registry = registry
+        self.semaphore = semaphore
+        self.endpoint = endpoint
+
+    async def __aenter__(self) -> None:
+        if not self.registry.enabled:
+            await self.semaphore.acquire()
+            return
+        start = time.perf_counter()
+        await self.semaphore.acquire()
+        self.registry.observe_queue_wait(
+            "concurrency", self.endpoint, time.perf_counter() - start
+        )
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.semaphore.release()
+
+
+class MetricsRegistry:
+    """Collects per-endpoint request latency, response bytes, status codes and
+    retries, the time requests queue for the rate limiter and concurrency
+    semaphores, and hit/miss/fill counts of each cache tier.
+
+    A registry is disabled until enable() is called, and every record method
+    returns immediately while it is disabled, so instrumented code pays one
+    attribute check. snapshot() returns plain dicts that any exporter can
+    consume; PrometheusExporter renders them in the Prometheus text format.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        latency_buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> None:
+        """
+        Args:
+            enabled (bool, optional): Start recording immediately. Defaults to False.
+            latency_buckets (Sequence[float], optional): Upper bounds in seconds of the
+                latency and queue wait histogram buckets. Defaults to
+                DEFAULT_LATENCY_BUCKETS.
+        """
+        self.enabled = enabled
+        self.latency_buckets = tuple(sorted(latency_buckets))
+        self._lock = threading.Lock()
+        self.reset()
+
+    def enable(self) -> None:
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+
+    def reset(self) -> None:
+        """Clear everything recorded so far."""
+        with self._lock:
+            self._latency: Dict[str, Histogram] = {}
+            self._bytes: Dict[str, int] = {}
+            self._statuses: Dict[Tuple[str, Optional[int]], int] = {}
+            self._retries: Dict[Tuple[str, str], int] = {}
+            self._queue_wait: Dict[Tuple[str, str], Histogram] = {}
+            self._cache: Dict[Tuple[str, str], int] = {}
+
+    def observe_request(
+        self, endpoint: str, seconds: float, status: Optional[int], nbytes: int = 0
+    ) -> None:
+        """Record one request attempt that got a response.
+
+        Args:
+            endpoint (str): The endpoint, e.g. "stocks/candles" (see
+                rate_limit.endpoint_name).
+            seconds (float): Time from sending the request to reading the whole body.
+            status (int): The response's status code.
+            nbytes (int, optional): Size of the response body. Defaults to 0.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._latency.get(endpoint)
+            if histogram is None:
+                histogram = self._latency[endpoint] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+            self._bytes[endpoint] = self._bytes.get(endpoint, 0) + nbytes
+            key = (endpoint, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def record_retry(
+        self, endpoint: str, reason: Union[int, str], count: int = 1
+    ) -> None:
+        """Record retries of a request, by reason: a status code or an exception
+        name."""
+        if not self.enabled or count <= 0:
+            return
+        with self._lock:
+            key = (endpoint, str(reason))
+            self._retries[key] = self._retries.get(key, 0) + count
+
+    def observe_queue_wait(self, queue: str, endpoint: str, seconds: float) -> None:
+        """Record how long a request waited to be sent, in the "rate_limiter" or
+        "concurrency" (semaphore) queue."""
+        if not self.enabled:
+            return
+        with self._lock:
+            key = (queue, endpoint)
+            histogram = self._queue_wait.get(key)
+            if histogram is None:
+                histogram = self._queue_wait[key] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+
+    def record_cache(self, tier: str, event: str, count: int = 1) -> None:
+        """Record cache lookups and fills.
+
+        Args:
+            tier (str): The cache, e.g. "candle_memory", "candle_disk" or "chain".
+            event (str): One of CACHE_EVENTS.
+            count (int, optional): Number of events. Defaults to 1.
+        """
+        if not self.enabled or count <= 0:
+            return
+        with self._lock:
+            key = (tier, event)
+            self._cache[key] = self._cache.get(key, 0) + count
+
+    def queued(self, semaphore: asyncio.Semaphore, endpoint: str) -> _QueuedSemaphore:
+        """Use in place of `async with semaphore:` to record the time spent
+        queueing for the semaphore."""
+        return _QueuedSemaphore(self, semaphore, endpoint)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get everything recorded so far as plain dicts:
+
+            {
+                "requests": {
+                    endpoint: {
+                        "latency": histogram,
+                        "bytes": int,
+                        "statuses": {status: int},
+                        "retries": {reason: int},
+                    }
+                },
+                "queue_wait": {queue: {endpoint: histogram}},
+                "cache": {tier: {event: int}},
+            }
+
+        where each histogram is
+        {"buckets": {upper bound: cumulative count}, "sum": float, "count": int}.
+        """
+        with self._lock:
+            requests: Dict[str, Dict[str, Any]] = {}
+            for endpoint in set(self._latency) | {e for e, _ in self._retries}:
+                histogram = self._latency.get(endpoint)
+                requests[endpoint] = {
+                    "latency": (
+                        histogram or Histogram(self.latency_buckets)
+                    ).snapshot(),
+                    "bytes": self._bytes.get(endpoint, 0),
+                    "statuses": {
+                        s: n for (e, s), n in self._statuses.items() if e == endpoint
+                    },
+                    "retries": {
+                        r: n for (e, r), n in self._retries.items() if e == endpoint
+                    },
+                }
+            queue_wait: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for (queue, endpoint), histogram in self._queue_wait.items():
+                queue_wait.setdefault(queue, {})[endpoint] = histogram.snapshot()
+            cache: Dict[str, Dict[str, int]] = {}
+            for (tier, event), count in self._cache.items():
+                cache.setdefault(tier, {})[event] = count
+        return {"requests": requests, "queue_wait": queue_wait, "cache": cache}
+
+
+def _labels(**labels: Any) -> str:
+    def escape(value: Any) -> str:
+        return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def _bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+def _histogram_lines(name: str, histogram: Dict[str, Any], **labels: Any) -> List[str]:
+    lines = [
+        f"{name}_bucket{_labels(**labels, le=_bound(bound))} {count}"
+        for bound, count in histogram["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_labels(**labels)} {histogram['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {histogram['count']}")
+    return lines
+
+
+def prometheus_text(snapshot: Dict[str, Any], namespace: str = "marketdata") -> str:
+    """Render a MetricsRegistry snapshot in the Prometheus text exposition format."""
+    lines: List[str] = []
+
+    def family(name: str, kind: str, help_text: str) -> str:
+        lines.append(f"# HELP {namespace}_{name} {help_text}")
+        lines.append(f"# TYPE {namespace}_{name} {kind}")
+        return f"{namespace}_{name}"
+
+    requests = snapshot["requests"]
+    name = family(
+        "request_duration_seconds",
+        "histogram",
+        "Time from sending a request to reading its response body.",
+    )
+    for endpoint, metrics in sorted(requests.items()):
+        lines += _histogram_lines(name, metrics["latency"], endpoint=endpoint)
+    name = family(
+        "response_bytes_total", "counter", "Bytes of response bodies received."
+    )
+    for endpoint, metrics in sorted(requests.items()):
+        lines.append(f"{name}{_labels(endpoint=endpoint)} {metrics['bytes']}")
+    name = family("responses_total", "counter", "Responses received, by status code.")
+    for endpoint, metrics in sorted(requests.items()):
+        for status, count in sorted(
+            metrics["statuses"].items(), key=lambda item: str(item[0])
+        ):
+            lines.append(f"{name}{_labels(endpoint=endpoint, status=status)} {count}")
+    name = family(
+        "retries_total",
+        "counter",
+        "Request attempts that were retried, by status code or exception.",
+    )
+    for endpoint, metrics in sorted(requests.items()):
+        for reason, count in sorted(metrics["retries"].items()):
+            lines.append(f"{name}{_labels(endpoint=endpoint, reason=reason)} {count}")
+    name = family(
+        "queue_wait_seconds",
+        "histogram",
+        "Time requests waited for the rate limiter or a concurrency limit.",
+    )
+    for queue, endpoints in sorted(snapshot["queue_wait"].items()):
+        for endpoint, histogram in sorted(endpoints.items()):
+            lines += _histogram_lines(name, histogram, queue=queue, endpoint=endpoint)
+    name = family(
+        "cache_events_total",
+        "counter",
+        "Cache lookups and fills, by cache tier and event.",
+    )
+    for tier, events in sorted(snapshot["cache"].items()):
+        for event, count in sorted(events.items()):
+            lines.append(f"{name}{_labels(tier=tier, event=event)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+class PrometheusExporter:
+    """Exports a registry in the Prometheus text format, on demand with render()
+    or to scrapers with serve()."""
+
+    def __init__(
+        self, registry: Optional[MetricsRegistry] = None, namespace: str = "marketdata"
+    ) -> None:
+        """
+        Args:
+            registry (MetricsRegistry, optional): The registry to export. Defaults to
+                the registry shared by all clients in the process.
+            namespace (str, optional): Prefix of the metric names. Defaults to
+                "marketdata".
+        """
+        self.registry = registry or get_metrics()
+        self.namespace = namespace
+
+    def render(self) -> str:
+        return prometheus_text(self.registry.snapshot(), self.namespace)
+
+    def serve(self, port: int = 9108, addr: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """Serve the metrics at http://addr:port/metrics from a daemon thread.
+        Call shutdown() on the returned server to stop it."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode()
+                self.send_response(200)
+                self.send_header(
+                    "Content-Type", "text/plain; version=0.0.4; charset=utf-8"
+                )
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        server = ThreadingHTTPServer((addr, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+
+_default_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Get the registry shared by every client and manager in the process that
+    wasn't given its own."""
+    return _default_metrics
+
+
+def enable_metrics() -> MetricsRegistry:
+    """Start recording into the process-wide registry."""
+    _default_metrics.enable()
+    return _default_metrics
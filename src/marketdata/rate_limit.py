@@ -0,0 +1,254 @@
+"""
+Process-wide request rate limiting and API credit budgeting
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Mapping, Optional
+from urllib.parse import urlparse
+
+from loguru import logger
+
+
+class CreditBudgetExceeded(RuntimeError):
+    """Raised when a request would exceed the daily credit budget and the
+    limiter is configured to shed load instead of waiting for the reset."""
+
+
+def endpoint_name(url: str) -> str:
+    """Get the endpoint a URL belongs to, e.g. "stocks/candles" for
+    https://api.marketdata.app/v1/stocks/candles/1D/AAPL/"""
+    parts = [p for p in urlparse(url).path.split("/") if p]
+    if parts and parts[0].startswith("v") and parts[0][1:].isdigit():
+        parts = parts[1:]
+    return "/".join(parts[:2])
+
+
+def estimate_credits(endpoint: str, params: Optional[Mapping[str, Any]] = None) -> int:
+    """Estimate the credits a request will consume before it is sent.
+
+    Bulk endpoints cost one credit per symbol. Option chains cost one credit per
+    contract returned, which isn't known up front, so they are estimated at one
+    credit and reconciled with the usage the API reports in the response headers.
+    """
+    params = params or {}
+    if endpoint in ("stocks/bulkquotes", "stocks/bulkcandles") and params.get(
+        "symbols"
+    ):
+        return max(1, len(str(params["symbols"]).split(",")))
+    return 1
+
+
+def _next_midnight() -> float:
+    tomorrow = datetime.now().date() + timedelta(days=1)
+    return datetime.combine(tomorrow, datetime.min.time()).timestamp()
+
+
+class RateLimiter:
+    """A token bucket request rate limiter with a daily API credit budget.
+
+    The limiter is thread-safe and asyncio-safe: a request reserves its slot
+    under a lock and then waits outside of it, with time.sleep in threads and
+    asyncio.sleep on an event loop, so one limiter can be shared by the sync and
+    async clients of a process.
+    """
+
+    def __init__(
+        self,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        daily_credits: Optional[int] = None,
+        on_exhausted: str = "block",
+    ):
+        """
+        Args:
+            requests_per_second (float, optional): Sustained request rate. None means no
+                rate limit. Defaults to None.
+            burst (int, optional): Number of requests that can be sent at once before
+                the rate applies. Defaults to requests_per_second (at least 1).
+            daily_credits (int, optional): Daily API credit budget, i.e. the plan limit.
+                None means no budget. Defaults to None.
+            on_exhausted (str, optional): What to do when a request would exceed the
+                budget: "block" waits for the daily reset, "raise" sheds the request
+                with CreditBudgetExceeded. Defaults to "block".
+        """
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._credits_used = 0
+        self._credits_by_endpoint: Dict[str, int] = {}
+        self._requests_by_endpoint: Dict[str, int] = {}
+        self._reset_at = _next_midnight()
+        self.configure(requests_per_second, burst, daily_credits, on_exhausted)
+
+    def configure(
+        self,
+        requests_per_second: Optional[float] = None,
+        burst: Optional[int] = None,
+        daily_credits: Optional[int] = None,
+        on_exhausted: str = "block",
+    ) -> None:
+        """Change the limits. Clients that already share this limiter pick up
+        the new limits immediately. See __init__ for the arguments."""
+        if on_exhausted not in ("block", "raise"):
+            raise ValueError(
+                f"Invalid on_exhausted: {on_exhausted}. Must be 'block' or 'raise'"
+            )
+        with self._lock:
+            self.requests_per_second = requests_per_second
+            self.burst = (
+                burst if burst is not None else max(1, int(requests_per_second or 1))
+            )
+            self.daily_credits = daily_credits
+            self.on_exhausted = on_exhausted
+            self._tokens = float(self.burst)
+            self._last_refill = time.monotonic()
+
+    def _reserve(self, endpoint: str, credits: int) -> float:
+        """Reserve a request slot and its credits. Returns how long the caller
+        must wait before sending the request."""
+        with self._lock:
+            wait = 0.0
+            now = time.time()
+            if now >= self._reset_at:
+                self._credits_used = 0
+                self._credits_by_endpoint.clear()
+                self._requests_by_endpoint.clear()
+                self._reset_at = _next_midnight()
+
+            if (
+                self.daily_credits is not None
+                and self._credits_used + credits > self.daily_credits
+            ):
+                if self.on_exhausted == "raise":
+                    raise CreditBudgetExceeded(
+                        f"{endpoint} needs {credits} credits but only "
+                        f"{max(0, self.daily_credits - self._credits_used)} of "
+                        f"{self.daily_credits} are left today"
+                    )
+                wait = self._reset_at - now
+                logger.warning(
+                    f"Daily credit budget exhausted. Waiting {wait:.0f}s for the reset"
+                )
+
+            if self.requests_per_second:
+                monotonic = time.monotonic()
+                self._tokens = min(
+                    float(self.burst),
+                    self._tokens
+                    + (monotonic - self._last_refill) * self.requests_per_second,
+                )
+                self._last_refill = monotonic
+                # Tokens may go negative: each waiter queues behind the ones
+                # that reserved before it
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.requests_per_second)
+
+            self._credits_used += credits
+            self._credits_by_endpoint[endpoint] = (
+                self._credits_by_endpoint.get(endpoint, 0) + credits
+            )
+            self._requests_by_endpoint[endpoint] = (
+                self._requests_by_endpoint.get(endpoint, 0) + 1
+            )
+            return wait
+
+    def acquire(self, endpoint: str = "", credits: int = 1) -> None:
+        """Block the calling thread until a request may be sent."""
+        wait = self._reserve(endpoint, credits)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, endpoint: str = "", credits: int = 1) -> None:
+        """Wait without blocking the event loop until a request may be sent."""
+        wait = self._reserve(endpoint, credits)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def refund(self, endpoint: str, credits: int) -> None:
+        """Give back the credits reserved for a request that wasn't charged, e.g.
+        one that failed before getting a response. The request still counts
+        against the request rate."""
+        with self._lock:
+            # Clamped, as the daily reset may have happened since the reservation
+            self._credits_used = max(0, self._credits_used - credits)
+            self._credits_by_endpoint[endpoint] = max(
+                0, self._credits_by_endpoint.get(endpoint, 0) - credits
+            )
+
+    def record_usage(
+        self,
+        endpoint: str,
+        estimated_credits: int,
+        headers: Optional[Mapping[str, str]] = None,
+        status: Optional[int] = None,
+    ) -> None:
+        """Reconcile the credits reserved for a request with the usage the API
+        reported in the X-Api-Ratelimit-* response headers. Error responses
+        without usage headers (e.g. 429 and 5xx) aren't charged by the API, so
+        their reservation is refunded; successful responses without them keep
+        the estimate."""
+        consumed = headers.get("X-Api-Ratelimit-Consumed") if headers else None
+        if (
+            (consumed is None or not consumed.isdigit())
+            and status is not None
+            and status >= 400
+        ):
+            self.refund(endpoint, estimated_credits)
+        if not headers:
+            return
+        with self._lock:
+            if consumed is not None and consumed.isdigit():
+                delta = int(consumed) - estimated_credits
+                self._credits_used += delta
+                self._credits_by_endpoint[endpoint] = (
+                    self._credits_by_endpoint.get(endpoint, 0) + delta
+                )
+            remaining = headers.get("X-Api-Ratelimit-Remaining")
+            if (
+                remaining is not None
+                and remaining.isdigit()
+                and self.daily_credits is not None
+            ):
+                # The server's count includes other processes using the same key
+                self._credits_used = max(
+                    self._credits_used, self.daily_credits - int(remaining)
+                )
+            reset = headers.get("X-Api-Ratelimit-Reset")
+            if reset is not None and reset.isdigit():
+                self._reset_at = float(reset)
+
+    def usage(self) -> Dict[str, Any]:
+        """Get the credits and requests used since the last daily reset."""
+        with self._lock:
+            return {
+                "credits_used": self._credits_used,
+                "credits_remaining": None
+                if self.daily_credits is None
+                else max(0, self.daily_credits - self._credits_used),
+                "credits_by_endpoint": dict(self._credits_by_endpoint),
+                "requests_by_endpoint": dict(self._requests_by_endpoint),
+                "reset_at": datetime.fromtimestamp(self._reset_at),
+            }
+
+
+_default_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Get the limiter shared by every client in the process that wasn't given
+    its own."""
+    return _default_limiter
+
+
+def configure_rate_limiter(
+    requests_per_second: Optional[float] = None,
+    burst: Optional[int] = None,
+    daily_credits: Optional[int] = None,
+    on_exhausted: str = "block",
+) -> RateLimiter:
+    """Set the limits of the process-wide limiter. See RateLimiter for the arguments."""
+    _default_limiter.configure(requests_per_second, burst, daily_credits, on_exhausted)
+    return _default_limiter
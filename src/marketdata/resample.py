@@ -0,0 +1,217 @@
+"""
+Aggregation of cached candles into coarser resolutions
+"""
+import re
+from datetime import date, time, timedelta
+from typing import Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from marketdata.store import MARKET_TIMEZONE
+
+# Start of the regular session. Intraday candles are aligned to it, so an
+# hourly candle covers 9:30 to 10:30 rather than straddling the open.
+SESSION_OPEN = time(9, 30)
+
+_RESOLUTION = re.compile(r"^(\d+)([MHWDY]?)$")
+# Minutes per unit of the intraday resolutions ("5" is five minutes)
+_INTRADAY_MINUTES = {"": 1, "H": 60}
+# Rough length of each unit, only used to order resolutions
+_UNIT_SPANS = {
+    "": timedelta(minutes=1),
+    "H": timedelta(hours=1),
+    "D": timedelta(days=1),
+    "W": timedelta(weeks=1),
+    "M": timedelta(days=31),
+    "Y": timedelta(days=366),
+}
+
+
+def parse_resolution(resolution: str) -> Tuple[int, str]:
+    """Split a resolution like "15", "4H" or "1W" into its count and unit. The
+    unit of minute resolutions is ""."""
+    match = _RESOLUTION.match(resolution.strip().upper())
+    if not match:
+        raise ValueError(
+            f"Invalid resolution: {resolution}. Must be in the format <number>[MHDWY]"
+        )
+    return int(match.group(1)), match.group(2)
+
+
+def resolution_span(resolution: str) -> timedelta:
+    """Get the approximate length of a candle of a resolution."""
+    count, unit = parse_resolution(resolution)
+    return count * _UNIT_SPANS[unit]
+
+
+def can_resample(source: str, target: str) -> bool:
+    """Whether candles of the target resolution can be built from candles of the
+    source resolution: intraday candles into intraday candles of a multiple of
+    their length, daily candles into weekly and monthly ones, and monthly candles
+    into yearly ones. Intraday candles aren't rolled up into daily ones, as the
+    API's daily candles use the official open and close rather than the first
+    and last trades."""
+    try:
+        source_count, source_unit = parse_resolution(source)
+        target_count, target_unit = parse_resolution(target)
+    except ValueError:
+        return False
+    if source_unit in _INTRADAY_MINUTES and target_unit in _INTRADAY_MINUTES:
+        source_minutes = source_count * _INTRADAY_MINUTES[source_unit]
+        target_minutes = target_count * _INTRADAY_MINUTES[target_unit]
+        return target_minutes > source_minutes and target_minutes % source_minutes == 0
+    if target_count != 1 or target_unit not in ("W", "M", "Y"):
+        return False
+    if (source_count, source_unit) == (1, "D"):
+        return True
+    # Weeks straddle months, so only months roll up into years
+    return (source_count, source_unit) == (1, "M") and target_unit == "Y"
+
+
+def period_bounds(day: date, resolution: str) -> Tuple[date, date]:
+    """Get the first and last dates of the candle of a resolution containing
+    day. Intraday candles never span days, so they give (day, day)."""
+    _, unit = parse_resolution(resolution)
+    if unit == "W":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    if unit == "M":
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if unit == "Y":
+        return day.replace(month=1, day=1), day.replace(month=12, day=31)
+    return day, day
+
+
+def candle_times(t: pd.Series) -> pd.DatetimeIndex:
+    """Convert a candle time column (unix seconds, ISO strings or datetimes) to
+    times in the market's timezone."""
+    if pd.api.types.is_numeric_dtype(t):
+        times = pd.to_datetime(t.to_numpy(), unit="s", utc=True)
+    elif pd.api.types.is_datetime64_any_dtype(t):
+        times = pd.DatetimeIndex(t)
+        if times.tz is None:
+            return times.tz_localize(MARKET_TIMEZONE)
+    else:
+        times = pd.to_datetime(t.to_numpy(), utc=True, format="ISO8601")
+    return pd.DatetimeIndex(times).tz_convert(MARKET_TIMEZONE)
+
+
+def _format_times(
+    times: pd.DatetimeIndex, like: pd.Series
+) -> Union[np.ndarray, pd.DatetimeIndex]:
+    """Convert market times back to the representation of the like column."""
+    if pd.api.types.is_numeric_dtype(like):
+        return times.as_unit("s").asi8
+    if pd.api.types.is_datetime64_any_dtype(like):
+        return (
+            times
+            if getattr(like.dt, "tz", None) is not None
+            else times.tz_localize(None)
+        )
+    # ISO strings with the UTC offset written as -05:00, like the API's
+    formatted = pd.Series(times.strftime("%Y-%m-%dT%H:%M:%S%z"))
+    return (formatted.str[:-2] + ":" + formatted.str[-2:]).to_numpy(dtype=object)
+
+
+def _group_keys(
+    local: np.ndarray, target: str, session_open: time
+) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """Get the group of each candle, and for intraday targets the start time of
+    each candle's group. local holds naive market times as datetime64[ns]."""
+    count, unit = parse_resolution(target)
+    days = local.astype("datetime64[D]")
+    if unit in _INTRADAY_MINUTES:
+        width = np.timedelta64(count * _INTRADAY_MINUTES[unit], "m")
+        opens = days + np.timedelta64(session_open.hour * 60 + session_open.minute, "m")
+        index = (local - opens) // width
+        # Groups are numbered within each day, so no candle spans two sessions
+        # however long it is
+        keys = days.view(np.int64) * 4096 + (index + 2048)
+        starts = np.maximum(opens + index * width, days.astype(local.dtype))
+        return keys, starts
+    if unit == "W":
+        # 1970-01-05 was a Monday
+        return (days.view(np.int64) - 4) // 7, None
+    if unit == "M":
+        return local.astype("datetime64[M]").view(np.int64), None
+    return local.astype("datetime64[Y]").view(np.int64), None
+
+
+def resample_candles(
+    df: pd.DataFrame, source: str, target: str, session_open: time = SESSION_OPEN
+) -> pd.DataFrame:
+    """Aggregate candles into a coarser resolution: the first open, highest high,
+    lowest low, last close and total volume of each group of candles.
+
+    Intraday candles are grouped into bins aligned to session_open within each
+    day, so no candle spans two sessions. Daily and monthly candles are grouped
+    by calendar week (Monday to Sunday), month or year, and each group's candle
+    keeps the time of its first candle, like the API's.
+
+    Args:
+        df (pd.DataFrame): Candles of the source resolution with 't', 'o', 'h', 'l', 'c'
+            and 'v' columns.
+        source (str): The resolution of df, e.g. "1" or "1D".
+        target (str): The resolution to aggregate to, e.g. "1H" or "1W". See
+            can_resample.
+        session_open (time, optional): Time of day intraday bins are aligned to.
+            Defaults to SESSION_OPEN.
+
+    Returns:
+        pd.DataFrame: The candles of the target resolution, sorted by time, with 't' in
+            the same representation as df.
+        Columns other than OHLCV keep the value of each group's first candle.
+    """
+    if not can_resample(source, target):
+        raise ValueError(
+            f"Candles of resolution {target} can't be built from {source} candles"
+        )
+    if df.empty:
+        return df.iloc[0:0].copy()
+
+    if isinstance(df.index, pd.DatetimeIndex) and df.index.tz is not None:
+        # Candles from the manager's cache are already indexed by time
+        times = df.index.tz_convert(MARKET_TIMEZONE)
+    else:
+        times = candle_times(df["t"])
+    order = (
+        None if times.is_monotonic_increasing else np.argsort(times.asi8, kind="stable")
+    )
+    if order is not None:
+        times = times[order]
+    local = times.tz_localize(None).to_numpy()
+    keys, bin_starts = _group_keys(local, target, session_open)
+
+    change = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    starts = np.concatenate(([0], change))
+    ends = np.append(change, len(keys))
+
+    def column(name: str) -> np.ndarray:
+        values: np.ndarray = df[name].to_numpy()
+        return values if order is None else values[order]
+
+    columns = {}
+    for name in df.columns:
+        if name == "t":
+            if bin_starts is None:
+                columns["t"] = column("t")[starts]
+            else:
+                group_times = pd.DatetimeIndex(bin_starts[starts]).tz_localize(
+                    MARKET_TIMEZONE
+                )
+                columns["t"] = _format_times(group_times, df["t"])
+        elif name == "o":
+            columns["o"] = column("o")[starts]
+        elif name == "h":
+            columns["h"] = np.fmax.reduceat(column("h"), starts)
+        elif name == "l":
+            columns["l"] = np.fmin.reduceat(column("l"), starts)
+        elif name == "c":
+            columns["c"] = column("c")[ends - 1]
+        elif name == "v":
+            columns["v"] = np.add.reduceat(column("v"), starts)
+        else:
+            columns[name] = column(name)[starts]
+    return pd.DataFrame(columns)
@@ -0,0 +1,105 @@
+"""
+Coalescing of identical concurrent requests
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import (
+    Any,
+    Callable,
+    Coroutine,
+    Dict,
+    Hashable,
+    Mapping,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+
+def request_key(
+    url: str, params: Optional[Mapping[str, Any]] = None
+) -> Tuple[str, tuple]:
+    """Normalize a request into a key that is equal for identical requests,
+    regardless of the order of their parameters."""
+    items = tuple(sorted((str(k), str(v)) for k, v in (params or {}).items()))
+    return url, items
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time across threads. Threads that ask
+    for a key while its call is in flight wait for that call and share its
+    result (or exception) instead of making their own.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            existing = self._calls.get(key)
+            if existing is None:
+                call: Future = Future()
+                self._calls[key] = call
+
+        result: T
+        if existing is not None:
+            result = existing.result()
+            return result
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """Runs at most one coroutine per key at a time on an event loop. Tasks that
+    ask for a key while its coroutine is in flight await the same task and share
+    its result (or exception). The coroutine is cancelled once every task
+    waiting on it has been cancelled.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        loop = asyncio.get_running_loop()
+        task = self._calls.get(key)
+        if task is None or task.get_loop() is not loop:
+            task = loop.create_task(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shielded so a waiter that is cancelled doesn't cancel the shared call
+            return await asyncio.shield(task)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                # The last waiter was cancelled, so nobody needs the result
+                if not task.done():
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+
+    def in_flight(self) -> int:
+        return len(self._calls)
@@ -0,0 +1,526 @@
+"""
+On-disk candle stores
+"""
+import os
+import shutil
+from datetime import date, datetime, time, timedelta
+from typing import Any, List, Optional, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Timezone used to map candle dates onto partitions and date range filters
+MARKET_TIMEZONE = "America/New_York"
+
+_PERIOD_FORMATS = {"year": "%Y", "month": "%Y-%m"}
+_PERIOD_LENGTHS = {"year": 4, "month": 7}
+
+
+def partition_period(resolution: str) -> str:
+    """Intraday candles are partitioned by month, everything else by year, which
+    keeps partitions at a few thousand to a few tens of thousands of rows."""
+    if resolution.isdigit() or resolution.upper().endswith("H"):
+        return "month"
+    return "year"
+
+
+def partition_ranges(
+    resolution: str, from_date: date, to_date: date
+) -> List[Tuple[date, date]]:
+    """Get the first and last dates of each partition overlapping a date range, in
+    order. A range ending before it starts gets the partition of from_date."""
+    ranges = []
+    start = from_date
+    while True:
+        if partition_period(resolution) == "year":
+            start, end = start.replace(month=1, day=1), start.replace(month=12, day=31)
+        else:
+            start = start.replace(day=1)
+            end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        ranges.append((start, end))
+        if end >= to_date:
+            return ranges
+        start = end + timedelta(days=1)
+
+
+def period_values(t: pd.Series, period: str) -> pd.Series:
+    """Get the partition value ("2024" or "2024-01") of each candle time."""
+    fmt = _PERIOD_FORMATS[period]
+    if pd.api.types.is_datetime64_any_dtype(t):
+        return t.dt.strftime(fmt)
+    if pd.api.types.is_numeric_dtype(t):
+        return (
+            pd.to_datetime(t, unit="s", utc=True)
+            .dt.tz_convert(MARKET_TIMEZONE)
+            .dt.strftime(fmt)
+        )
+    # ISO formatted strings, which start with the local date
+    return t.astype(str).str[: _PERIOD_LENGTHS[period]]
+
+
+def time_bounds(field_type: pa.DataType, from_date: date, to_date: date) -> tuple:
+    """Get [lower, upper) bounds on the 't' column that select every candle from
+    the start of from_date to the end of to_date, typed to match the column."""
+    lower = datetime.combine(from_date, time())
+    upper = datetime.combine(to_date + timedelta(days=1), time())
+    if pa.types.is_timestamp(field_type):
+        if field_type.tz:
+            lower = pd.Timestamp(lower).tz_localize(field_type.tz)
+            upper = pd.Timestamp(upper).tz_localize(field_type.tz)
+        return pa.scalar(lower, type=field_type), pa.scalar(upper, type=field_type)
+    if pa.types.is_integer(field_type) or pa.types.is_floating(field_type):
+        lower = pd.Timestamp(lower).tz_localize(MARKET_TIMEZONE).timestamp()
+        upper = pd.Timestamp(upper).tz_localize(MARKET_TIMEZONE).timestamp()
+        return int(lower), int(upper)
+    return lower.date().isoformat(), upper.date().isoformat()
+
+
+class ParquetCandleStore:
+    """Candles stored as one hive partitioned parquet dataset per symbol and
+    resolution, laid out as
+    ``{root}/{resolution}/{symbol}/{year|month}=.../part-0.parquet``.
+
+    Reads go through pyarrow dataset filters, so a date range request only
+    opens the partitions, and within them the row groups, that overlap it.
+    """
+
+    PART_FILE = "part-0.parquet"
+
+    def __init__(
+        self, root: str, row_group_size: int = 50_000, max_fragments: int = 32
+    ):
+        """
+        Args:
+            root (str): Directory the datasets are stored under.
+            row_group_size (int, optional): Maximum rows per parquet row group. Smaller
+                row groups let date filters skip more data. Defaults to 50,000.
+            max_fragments (int, optional): Files a partition may hold before write_many
+                compacts it into one. Defaults to 32.
+        """
+        self.root = root
+        self.row_group_size = row_group_size
+        self.max_fragments = max_fragments
+
+    def path(self, symbol: str, resolution: str) -> str:
+        return os.path.join(self.root, resolution, symbol)
+
+    def _partitioning(self, period: str) -> ds.Partitioning:
+        return ds.partitioning(pa.schema([(period, pa.string())]), flavor="hive")
+
+    def _dataset(self, path: str, resolution: str) -> ds.Dataset:
+        if os.path.isfile(path):
+            # A single file written before the store was partitioned
+            return ds.dataset(path, format="parquet")
+        return ds.dataset(
+            path,
+            format="parquet",
+            partitioning=self._partitioning(partition_period(resolution)),
+        )
+
+    def read(
+        self,
+        symbol: str,
+        resolution: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        path: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Read a symbol's candles, optionally limited to a date range.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            from_date (date, optional): First date to read (inclusive). Defaults to
+                None.
+            to_date (date, optional): Last date to read (inclusive). Defaults to None.
+            path (str, optional): Read from this dataset or file instead of the store's
+                own path. Defaults to None.
+
+        Returns:
+            pd.DataFrame: The candles, sorted by time.
+        """
+        dataset = self._dataset(path or self.path(symbol, resolution), resolution)
+        period = partition_period(resolution)
+        columns = [name for name in dataset.schema.names if name != period]
+
+        expression = None
+        if from_date is not None and to_date is not None:
+            lower, upper = time_bounds(
+                dataset.schema.field("t").type, from_date, to_date
+            )
+            expression = (ds.field("t") >= lower) & (ds.field("t") < upper)
+            if period in dataset.schema.names:
+                fmt = _PERIOD_FORMATS[period]
+                expression = (
+                    (ds.field(period) >= from_date.strftime(fmt))
+                    & (ds.field(period) <= to_date.strftime(fmt))
+                    & expression
+                )
+
+        df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+        if not df["t"].is_monotonic_increasing:
+            df = df.sort_values("t", ignore_index=True)
+        return df
+
+    def count_rows(self, symbol: str, resolution: str) -> int:
+        dataset = self._dataset(self.path(symbol, resolution), resolution)
+        return int(dataset.count_rows())
+
+    def write(
+        self, symbol: str, resolution: str, df: pd.DataFrame, replace: bool = False
+    ) -> None:
+        """Write candles to the store.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            df (pd.DataFrame): Candles with a 't' column.
+            replace (bool, optional): Replace all of the symbol's stored candles with
+                df. Otherwise the rows are merged into the partitions they fall in
+                (replacing rows with the same 't') and all other partitions are left
+                untouched. Defaults to False.
+        """
+        root = self.path(symbol, resolution)
+        period = partition_period(resolution)
+        df = df.reset_index(drop=True)
+        keys = period_values(df["t"], period)
+
+        if replace or not os.path.isdir(root):
+            tmp_root = f"{root}.tmp"
+            shutil.rmtree(tmp_root, ignore_errors=True)
+            for key, part in df.groupby(keys, sort=False):
+                self._write_partition(
+                    os.path.join(tmp_root, f"{period}={key}"), part, None
+                )
+            self._swap_dir(tmp_root, root)
+            return
+
+        schema = self._dataset(root, resolution).schema
+        schema = (
+            schema.remove(schema.get_field_index(period))
+            if period in schema.names
+            else schema
+        )
+        for key, part in df.groupby(keys, sort=False):
+            self._merge_partition(os.path.join(root, f"{period}={key}"), part, schema)
+
+    def write_many(
+        self, resolution: str, df: pd.DataFrame, symbol_column: str = "symbol"
+    ) -> None:
+        """Merge candles of many symbols into the store in one pass, e.g. a day's
+        candle for every symbol in the market.
+
+        Rows later than everything in the partition they fall in are written to a
+        new file in that partition, so appending them doesn't read or rewrite the
+        stored candles. Other rows are merged like write(). A partition holding
+        max_fragments files is compacted into one.
+
+        Args:
+            resolution (str): The candle resolution.
+            df (pd.DataFrame): Candles with a 't' column and a column of their symbols.
+            symbol_column (str, optional): The column holding each row's symbol.
+                Defaults to "symbol".
+        """
+        period = partition_period(resolution)
+        df = df.reset_index(drop=True)
+        keys = period_values(df["t"], period)
+        for (symbol, key), part in df.groupby(
+            [df[symbol_column], keys], sort=False, observed=True
+        ):
+            part = part.drop(columns=symbol_column)
+            part_dir = os.path.join(self.path(symbol, resolution), f"{period}={key}")
+            files = self._part_files(part_dir)
+            if not files or len(files) >= self.max_fragments:
+                self.write(symbol, resolution, part)
+                continue
+            schema = pq.read_schema(files[0])
+            table = pa.Table.from_pandas(part, schema=schema, preserve_index=False)
+            last = self._max_time(files, schema.get_field_index("t"))
+            if (
+                last is None
+                or not pc.greater(
+                    pc.min(table.column("t")), pa.scalar(last, schema.field("t").type)
+                ).as_py()
+            ):
+                self._merge_partition(part_dir, part, schema, files)
+                continue
+            self._write_file(
+                os.path.join(part_dir, f"part-{len(files):05d}.parquet"), table
+            )
+
+    @staticmethod
+    def _part_files(part_dir: str) -> List[str]:
+        try:
+            names = os.listdir(part_dir)
+        except FileNotFoundError:
+            return []
+        return [
+            os.path.join(part_dir, name)
+            for name in sorted(names)
+            if name.endswith(".parquet")
+        ]
+
+    @staticmethod
+    def _max_time(files: List[str], column: int) -> Any:
+        """Get the latest 't' in a partition's files from their row group
+        statistics, without reading any data. None when a file has no statistics."""
+        last = None
+        for file in files:
+            metadata = pq.read_metadata(file)
+            for i in range(metadata.num_row_groups):
+                statistics = metadata.row_group(i).column(column).statistics
+                if statistics is None or not statistics.has_min_max:
+                    return None
+                last = statistics.max if last is None else max(last, statistics.max)
+        return last
+
+    def _merge_partition(
+        self,
+        part_dir: str,
+        df: pd.DataFrame,
+        schema: Optional[pa.Schema],
+        files: Optional[List[str]] = None,
+    ) -> None:
+        """Merge candles into a partition (replacing rows with the same 't') and
+        compact its files into one."""
+        files = self._part_files(part_dir) if files is None else files
+        if files:
+            existing = pq.read_table(
+                files, schema=schema, partitioning=None
+            ).to_pandas()
+            df = (
+                pd.concat([existing, df], ignore_index=True)
+                .drop_duplicates(subset="t", keep="last")
+                .sort_values("t", ignore_index=True)
+            )
+        self._write_partition(part_dir, df, schema)
+        part_file = os.path.join(part_dir, self.PART_FILE)
+        for file in files:
+            if file != part_file:
+                os.remove(file)
+
+    def _write_partition(
+        self, part_dir: str, df: pd.DataFrame, schema: Optional[pa.Schema]
+    ) -> None:
+        os.makedirs(part_dir, exist_ok=True)
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        self._write_file(os.path.join(part_dir, self.PART_FILE), table)
+
+    def _write_file(self, path: str, table: pa.Table) -> None:
+        # Written to a hidden temporary file and swapped in, so readers never see
+        # a partial file
+        tmp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.tmp")
+        pq.write_table(table, tmp_path, row_group_size=self.row_group_size)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _swap_dir(new_dir: str, target: str) -> None:
+        old_dir = f"{target}.old"
+        shutil.rmtree(old_dir, ignore_errors=True)
+        if os.path.exists(target):
+            os.replace(target, old_dir)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if os.path.exists(new_dir):
+            os.replace(new_dir, target)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+    def delete(self, symbol: str, resolution: str) -> None:
+        shutil.rmtree(self.path(symbol, resolution), ignore_errors=True)
+
+
+def search_sorted(column: pa.ChunkedArray, value: Any) -> int:
+    """Get the index of the first element of a sorted column that is not less
+    than value. This is a binary search over the column's scalars, so the column
+    is never converted or copied."""
+    lo, hi = 0, len(column)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if pc.less(column[mid], value).as_py():
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class FeatherCandleStore:
+    """Candles stored as one uncompressed Arrow IPC (Feather v2) file per symbol
+    and resolution, laid out as ``{root}/{resolution}/{symbol}.arrow``.
+
+    Files are memory-mapped on read, so processes reading the same candles share
+    the pages through the OS page cache instead of each decoding a private copy.
+    Date ranges are served as zero-copy slices found by binary search on 't'.
+    """
+
+    SUFFIX = ".arrow"
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root (str): Directory the files are stored under.
+        """
+        self.root = root
+
+    def path(self, symbol: str, resolution: str) -> str:
+        return os.path.join(self.root, resolution, f"{symbol}{self.SUFFIX}")
+
+    def read_table(
+        self,
+        symbol: str,
+        resolution: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        path: Optional[str] = None,
+    ) -> pa.Table:
+        """Read a symbol's candles as an Arrow table backed by the memory-mapped
+        file, optionally sliced to a date range.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            from_date (date, optional): First date to read (inclusive). Defaults to
+                None.
+            to_date (date, optional): Last date to read (inclusive). Defaults to None.
+            path (str, optional): Read from this file instead of the store's own path.
+                Defaults to None.
+
+        Returns:
+            pa.Table: The candles, sorted by time.
+        """
+        source = pa.memory_map(path or self.path(symbol, resolution), "r")
+        table = pa.ipc.open_file(source).read_all()
+        if from_date is not None and to_date is not None:
+            lower, upper = time_bounds(table.schema.field("t").type, from_date, to_date)
+            start = search_sorted(table.column("t"), lower)
+            stop = search_sorted(table.column("t"), upper)
+            table = table.slice(start, stop - start)
+        return table
+
+    def read(
+        self,
+        symbol: str,
+        resolution: str,
+        from_date: Optional[date] = None,
+        to_date: Optional[date] = None,
+        path: Optional[str] = None,
+    ) -> pd.DataFrame:
+        """Read a symbol's candles, optionally limited to a date range. Numeric
+        columns of the returned DataFrame are views of the memory-mapped file.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            from_date (date, optional): First date to read (inclusive). Defaults to
+                None.
+            to_date (date, optional): Last date to read (inclusive). Defaults to None.
+            path (str, optional): Read from this file instead of the store's own path.
+                Defaults to None.
+
+        Returns:
+            pd.DataFrame: The candles, sorted by time.
+        """
+        table = self.read_table(symbol, resolution, from_date, to_date, path)
+        # One block per column lets pandas wrap the Arrow buffers instead of
+        # consolidating them into a new 2D array
+        return table.to_pandas(split_blocks=True)
+
+    def count_rows(self, symbol: str, resolution: str) -> int:
+        return int(self.read_table(symbol, resolution).num_rows)
+
+    def write(
+        self, symbol: str, resolution: str, df: pd.DataFrame, replace: bool = False
+    ) -> None:
+        """Write candles to the store.
+
+        Args:
+            symbol (str): The ticker symbol.
+            resolution (str): The candle resolution.
+            df (pd.DataFrame): Candles with a 't' column.
+            replace (bool, optional): Replace all of the symbol's stored candles with
+                df. Otherwise the rows are merged into the stored candles (replacing
+                rows with the same 't'). Defaults to False.
+        """
+        path = self.path(symbol, resolution)
+        schema = None
+        if not replace and os.path.exists(path):
+            existing = self.read_table(symbol, resolution)
+            schema = existing.schema
+            df = (
+                pd.concat([existing.to_pandas(), df], ignore_index=True)
+                .drop_duplicates(subset="t", keep="last")
+                .sort_values("t", ignore_index=True)
+            )
+
+        self._write_table(
+            path, pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+        )
+
+    def write_many(
+        self, resolution: str, df: pd.DataFrame, symbol_column: str = "symbol"
+    ) -> None:
+        """Merge candles of many symbols into the store in one pass, e.g. a day's
+        candle for every symbol in the market.
+
+        An IPC file can't be extended in place, so each symbol's file is still
+        rewritten, but rows later than the stored candles are appended to the
+        memory-mapped table as Arrow data without decoding the stored candles.
+        Other rows are merged like write().
+
+        Args:
+            resolution (str): The candle resolution.
+            df (pd.DataFrame): Candles with a 't' column and a column of their symbols.
+            symbol_column (str, optional): The column holding each row's symbol.
+                Defaults to "symbol".
+        """
+        for symbol, part in df.groupby(symbol_column, sort=False, observed=True):
+            part = part.drop(columns=symbol_column)
+            path = self.path(symbol, resolution)
+            if not os.path.exists(path):
+                self.write(symbol, resolution, part)
+                continue
+            existing = self.read_table(symbol, resolution)
+            table = pa.Table.from_pandas(
+                part, schema=existing.schema, preserve_index=False
+            )
+            if (
+                existing.num_rows
+                and not pc.greater(
+                    pc.min(table.column("t")), existing.column("t")[-1]
+                ).as_py()
+            ):
+                self.write(symbol, resolution, part)
+                continue
+            self._write_table(path, pa.concat_tables([existing, table]))
+
+    @staticmethod
+    def _write_table(path: str, table: pa.Table) -> None:
+        # Written to a temporary file and swapped in. Readers that still have the
+        # old file mapped keep a valid view of it until they unmap it.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with pa.OSFile(f"{path}.tmp", "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(f"{path}.tmp", path)
+
+    def delete(self, symbol: str, resolution: str) -> None:
+        path = self.path(symbol, resolution)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+CANDLE_STORES = {
+    "parquet": ParquetCandleStore,
+    "feather": FeatherCandleStore,
+}
+
+CandleStore = Union[ParquetCandleStore, FeatherCandleStore]
+
+
+def store_for_path(path: str, root: str) -> CandleStore:
+    """Get a store that can read the cached candles at path, whichever backend wrote
+    them."""
+    if path.endswith(FeatherCandleStore.SUFFIX):
+        return FeatherCandleStore(root)
+    return ParquetCandleStore(root)
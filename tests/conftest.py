@@ -0,0 +1,103 @@
+import asyncio
+import os
+import sys
+import threading
+from dataclasses import asdict
+
+import pytest
+from aiohttp import web
+
+from marketdata.manager import MarketDataManager
+from marketdata.metrics import MetricsRegistry
+from marketdata.rate_limit import RateLimiter
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.dirname(__file__)), "benchmarks")
+)
+
+from mock_server import MockConfig, create_app  # noqa: E402
+
+
+class MockAPI:
+    """The benchmark suite's mock API server, run on an event loop in a
+    background thread so tests can read and change its state directly."""
+
+    def __init__(self):
+        self.app = create_app(self.default_config())
+        self.app.middlewares.append(self._track_connections)
+        self.peers = set()
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        self.thread = threading.Thread(target=self._serve, args=(started,), daemon=True)
+        self.thread.start()
+        started.wait(10)
+        self.base_url = f"http://127.0.0.1:{self.port}/v1/"
+
+    @staticmethod
+    def default_config() -> MockConfig:
+        return MockConfig(latency=0.0, jitter=0.0)
+
+    @web.middleware
+    async def _track_connections(self, request: web.Request, handler):
+        self.peers.add(request.transport.get_extra_info("peername"))
+        return await handler(request)
+
+    def _serve(self, started: threading.Event):
+        asyncio.set_event_loop(self.loop)
+        self.runner = web.AppRunner(self.app, access_log=None)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = self.runner.addresses[0][1]
+        started.set()
+        self.loop.run_forever()
+
+    @property
+    def requests(self) -> int:
+        return self.app["stats"]["requests"]
+
+    @property
+    def connections(self) -> int:
+        """Number of distinct client connections requests arrived on."""
+        return len(self.peers)
+
+    def reset(self, **config):
+        self.app["config"].update({**asdict(self.default_config()), **config})
+        self.app["stats"].update({key: 0 for key in self.app["stats"]})
+        self.peers.clear()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(10)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(10)
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    server = MockAPI()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def mock_api(mock_server):
+    mock_server.reset()
+    return mock_server
+
+
+@pytest.fixture
+def rate_limiter():
+    return RateLimiter()
+
+
+@pytest.fixture
+def manager(tmp_path, mock_api, rate_limiter):
+    manager = MarketDataManager(
+        cache_dir=str(tmp_path),
+        base_url=mock_api.base_url,
+        api_key="test",
+        metrics=MetricsRegistry(enabled=True),
+    )
+    manager.client.rate_limiter = rate_limiter
+    manager.client_async.rate_limiter = rate_limiter
+    return manager
@@ -0,0 +1,48 @@
+import pandas as pd
+
+from marketdata.cache import LRUCache, frame_size
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LRUCache(max_entries=2)
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.get("a") == 1
+    cache["c"] = 3
+
+    assert "b" not in cache
+    assert list(cache._data) == ["a", "c"]
+    assert cache.stats() == {
+        "hits": 1,
+        "misses": 0,
+        "evictions": 1,
+        "entries": 2,
+        "bytes": 0,
+    }
+
+
+def test_entries_are_bounded_by_their_size():
+    frame = pd.DataFrame({"c": range(1000)})
+    size = frame_size(frame)
+    cache = LRUCache(max_bytes=2 * size)
+    for key in "abc":
+        cache[key] = {"data": frame}
+
+    assert list(cache._data) == ["b", "c"]
+    assert cache.stats()["bytes"] == 2 * size
+
+    # A value too large to ever fit doesn't push everything else out
+    cache["big"] = pd.concat([frame] * 3)
+    assert "big" not in cache
+    assert len(cache) == 2
+    assert cache.stats()["evictions"] == 2
+
+
+def test_uncovered_lookups_are_misses():
+    cache = LRUCache()
+    cache["a"] = {"to": 5}
+
+    assert cache.get("a", covers=lambda entry: entry["to"] >= 10) is None
+    assert cache.get("a", covers=lambda entry: entry["to"] >= 3) == {"to": 5}
+    assert cache.get("missing", "default") == "default"
+    assert (cache.hits, cache.misses) == (1, 2)
@@ -0,0 +1,75 @@
+import json
+from datetime import date
+
+from marketdata.cache_manifest import CandleCacheManifest
+
+
+def test_get_many(tmp_path):
+    manifest = CandleCacheManifest(str(tmp_path / "manifest.sqlite"))
+    # More symbols than SQLite binds in one query
+    symbols = [f"SYM{i}" for i in range(2000)]
+    manifest.record_writes(
+        (symbol, "1D", date(2024, 1, 2), date(2024, 6, 28), 124, f"/cache/{symbol}")
+        for symbol in symbols
+    )
+    manifest.record_write(
+        "SYM0", "1H", date(2024, 6, 3), date(2024, 6, 28), 140, "/cache/h"
+    )
+
+    entries = manifest.get_many(symbols + ["MISSING", "SYM1"], "1D")
+
+    assert set(entries) == set(symbols)
+    assert entries["SYM1999"] == {
+        "symbol": "SYM1999",
+        "resolution": "1D",
+        "from_date": date(2024, 1, 2),
+        "to_date": date(2024, 6, 28),
+        "first_available": None,
+        "row_count": 124,
+        "path": "/cache/SYM1999",
+        "updated_at": entries["SYM1999"]["updated_at"],
+    }
+    assert manifest.get_many([], "1D") == {}
+
+
+def test_record_write_keeps_first_available(tmp_path):
+    manifest = CandleCacheManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.set_first_available("AAA", "1D", date(2010, 6, 29))
+    manifest.record_write(
+        "AAA", "1D", date(2024, 1, 2), date(2024, 6, 28), 124, "/cache/AAA"
+    )
+
+    entry = manifest.get("AAA", "1D")
+    assert entry["first_available"] == date(2010, 6, 29)
+    assert (entry["from_date"], entry["to_date"]) == (
+        date(2024, 1, 2),
+        date(2024, 6, 28),
+    )
+    assert manifest.get("AAA", "1H") is None
+
+
+def test_legacy_cache_files_are_imported_once(tmp_path):
+    legacy = tmp_path / "candles"
+    legacy.mkdir()
+    (legacy / "AAA_1D_2020-01-02_2024-06-28.parquet").write_bytes(b"")
+    (legacy / "BBB_5_2024-06-03_2024-06-28.parquet").write_bytes(b"")
+    (legacy / "_first_available_AAA.json").write_text(json.dumps({"1D": "2010-06-29"}))
+    (legacy / "notes.txt").write_text("not a cache file")
+
+    manifest = CandleCacheManifest(
+        str(legacy / "_manifest.sqlite"), legacy_dir=str(legacy)
+    )
+
+    aaa = manifest.get("AAA", "1D")
+    assert (aaa["from_date"], aaa["to_date"]) == (date(2020, 1, 2), date(2024, 6, 28))
+    assert aaa["first_available"] == date(2010, 6, 29)
+    assert aaa["path"] == str(legacy / "AAA_1D_2020-01-02_2024-06-28.parquet")
+    assert manifest.get("BBB", "5")["to_date"] == date(2024, 6, 28)
+    manifest.remove("BBB", "5")
+    manifest.close()
+
+    # An existing manifest isn't rebuilt from the directory
+    manifest = CandleCacheManifest(
+        str(legacy / "_manifest.sqlite"), legacy_dir=str(legacy)
+    )
+    assert manifest.get("BBB", "5") is None
@@ -0,0 +1,165 @@
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+from marketdata import chain_cache
+from marketdata.chain_cache import FRESH, MISS, STALE, OptionsChainCache
+from marketdata.client_params import BasicParams, OptionsChainParams
+from marketdata.metrics import MetricsRegistry
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """A settable clock for the chain cache's entry ages."""
+
+    class Clock:
+        now = 1_000_000.0
+
+        def time(self):
+            return self.now
+
+    clock = Clock()
+    monkeypatch.setattr(chain_cache.time, "time", clock.time)
+    return clock
+
+
+@pytest.fixture
+def cache(clock):
+    return OptionsChainCache(
+        ttls={"live": 5.0, "cached": 60.0}, stale_ttl=10.0, metrics=MetricsRegistry()
+    )
+
+
+def chain(strikes=(100.0, 105.0)) -> pd.DataFrame:
+    return pd.DataFrame(
+        {"strike": list(strikes), "bid": [1.0] * len(strikes)},
+    )
+
+
+def test_entries_are_fresh_then_stale_then_missing(cache, clock):
+    params = OptionsChainParams(underlying="AAA")
+    cache.put(params, chain())
+
+    assert cache.lookup(params)[1] == FRESH
+    clock.now += 6
+    assert cache.lookup(params)[1] == STALE
+    clock.now += 10
+    assert cache.lookup(params) == (None, MISS)
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["stale_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_depends_on_the_feed(cache, clock):
+    live = OptionsChainParams(underlying="AAA")
+    cached = OptionsChainParams(underlying="AAA", feed="cached")
+    cache.put(live, chain())
+    cache.put(cached, chain())
+
+    clock.now += 30
+
+    assert cache.lookup(live)[1] == MISS
+    assert cache.lookup(cached)[1] == FRESH
+
+
+def test_past_chains_never_expire(cache, clock):
+    yesterday = date.today() - timedelta(days=1)
+    params = OptionsChainParams(
+        underlying="AAA", basic_params=BasicParams(lookup_date=yesterday)
+    )
+    cache.put(params, chain())
+
+    clock.now += 365 * 24 * 3600
+
+    assert cache.ttl_for(params) is None
+    assert cache.lookup(params)[1] == FRESH
+
+
+def test_errors_are_not_cached(cache):
+    params = OptionsChainParams(underlying="AAA")
+    cache.put(params, {"s": "error", "errmsg": "boom"})
+    cache.put(params, {"s": "no_data"})
+
+    assert cache.lookup(params) == (None, MISS)
+
+
+def test_only_one_refresh_is_claimed(cache):
+    params = OptionsChainParams(underlying="AAA")
+
+    assert cache.start_refresh(params)
+    assert not cache.start_refresh(params)
+    cache.finish_refresh(params)
+    assert cache.start_refresh(params)
+
+
+def test_changing_a_returned_chain_leaves_the_cache_alone(cache):
+    params = OptionsChainParams(underlying="AAA")
+    cache.put(params, chain())
+
+    data, _ = cache.lookup(params)
+    data.loc[0, "bid"] = 99.0
+    data["ask"] = 2.0
+
+    cached, _ = cache.lookup(params)
+    pd.testing.assert_frame_equal(cached, chain())
+
+
+def test_changing_a_stored_chain_leaves_the_cache_alone(cache):
+    params = OptionsChainParams(underlying="AAA")
+    data = chain()
+    cache.put(params, data)
+
+    data.loc[0, "bid"] = 99.0
+
+    cached, _ = cache.lookup(params)
+    pd.testing.assert_frame_equal(cached, chain())
+
+
+def test_changing_a_returned_json_chain_leaves_the_cache_alone(cache):
+    params = OptionsChainParams(underlying="AAA", output="raw")
+    cache.put(params, {"s": "ok", "strike": [100.0, 105.0]})
+
+    data, _ = cache.lookup(params)
+    data["strike"].append(110.0)
+
+    assert cache.lookup(params)[0] == {"s": "ok", "strike": [100.0, 105.0]}
+
+
+def test_persisted_chains_survive_a_restart(tmp_path, clock):
+    params = OptionsChainParams(underlying="AAA")
+    OptionsChainCache(persist_dir=str(tmp_path), metrics=MetricsRegistry()).put(
+        params, chain()
+    )
+
+    cache = OptionsChainCache(persist_dir=str(tmp_path), metrics=MetricsRegistry())
+    data, state = cache.lookup(params)
+
+    assert state == FRESH
+    pd.testing.assert_frame_equal(data, chain())
+
+    cache.invalidate()
+    assert cache.lookup(params) == (None, MISS)
+    assert not list(tmp_path.iterdir())
+
+
+def test_stale_chains_are_returned_and_refreshed_in_the_background(manager, mock_api):
+    manager.chain_cache.ttls["live"] = 0.0
+    manager.chain_cache.stale_ttl = 60.0
+    params = OptionsChainParams(underlying="AAA", side="call")
+
+    first = manager.get_option_chains([params])[0]
+    assert mock_api.requests == 1
+    stored_at = manager.chain_cache.entries.get(params.cache_key())["stored_at"]
+
+    # Expired, but within the stale TTL: served from the cache and refetched
+    second = manager.get_option_chains([params])[0]
+    pd.testing.assert_frame_equal(first, second)
+    deadline = time.monotonic() + 5
+    while manager.chain_cache.stats()["refreshing"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert mock_api.requests == 2
+    assert manager.chain_cache.entries.get(params.cache_key())["stored_at"] > stored_at
+    assert manager.get_chain_cache_stats()["stale_hits"] == 1
@@ -0,0 +1,233 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from marketdata.chain_filter import filter_chain, superset_params
+from marketdata.client_params import BasicParams, FromToParams, OptionsChainParams
+
+# A weekly, the January monthly (third Friday) and the Q1 quarterly (a Tuesday)
+EXPIRATIONS = ["2026-01-09", "2026-01-16", "2026-03-31"]
+STRIKES = [90.0, 95.0, 100.0, 105.0, 110.0]
+
+
+@pytest.fixture
+def chain() -> pd.DataFrame:
+    rows = []
+    for expiration in EXPIRATIONS:
+        for strike in STRIKES:
+            for side in ("call", "put"):
+                code = f"{expiration[2:4]}{expiration[5:7]}{expiration[8:]}"
+                symbol = f"AAA{code}{side[0].upper()}{int(strike * 1000):08d}"
+                rows.append(
+                    {
+                        "optionSymbol": symbol,
+                        "underlying": "AAA",
+                        "expiration": f"{expiration}T16:00:00-05:00",
+                        "side": side,
+                        "strike": strike,
+                        "dte": (
+                            pd.Timestamp(expiration) - pd.Timestamp("2026-01-02")
+                        ).days,
+                        "bid": 1.0,
+                        "ask": 1.0 + strike / 1000,
+                        "openInterest": int(strike) * 10,
+                        "volume": int(strike),
+                        "inTheMoney": (strike < 100)
+                        if side == "call"
+                        else (strike > 100),
+                        "underlyingPrice": 101.0,
+                    }
+                )
+    return pd.DataFrame(rows)
+
+
+def test_superset_params_drop_the_filters_and_pagination():
+    params = OptionsChainParams(
+        underlying="AAA",
+        basic_params=BasicParams(limit=10, offset=20),
+        from_to_params=FromToParams(from_date=pd.Timestamp("2026-01-01").date()),
+        side="call",
+        strike=100.0,
+        dte=30,
+        output="raw",
+    )
+
+    superset = superset_params(params)
+
+    assert superset.underlying == "AAA"
+    assert superset.side == "both"
+    assert superset.expiration == "all"
+    assert superset.strike is None and superset.dte is None
+    assert superset.from_to_params is None
+    assert "limit" not in superset.basic_params.params
+    assert "offset" not in superset.basic_params.params
+    assert superset.output == "dataframe"
+    # Every filter variation shares the superset
+    assert (
+        superset_params(OptionsChainParams(underlying="AAA", side="call")).cache_key()
+        == superset_params(
+            OptionsChainParams(underlying="AAA", side="put", strike=">=100")
+        ).cache_key()
+    )
+
+
+def test_the_next_monthly_expiration_is_the_default(chain):
+    filtered = filter_chain(chain, OptionsChainParams(underlying="AAA"))
+
+    assert set(filtered["expiration"].str[:10]) == {"2026-01-16"}
+    assert len(filtered) == len(STRIKES) * 2
+
+
+@pytest.mark.parametrize(
+    "strike, expected",
+    [
+        (100.0, [100.0]),
+        ("95-105", [95.0, 100.0, 105.0]),
+        (">105", [110.0]),
+        ("<=95", [90.0, 95.0]),
+        ("90,110", [90.0, 110.0]),
+    ],
+)
+def test_strike_filters(chain, strike, expected):
+    params = OptionsChainParams(
+        underlying="AAA", expiration="all", side="call", strike=strike
+    )
+
+    filtered = filter_chain(chain, params)
+
+    assert sorted(set(filtered["strike"])) == expected
+    assert (filtered["side"] == "call").all()
+
+
+def test_liquidity_and_moneyness_filters(chain):
+    params = OptionsChainParams(
+        underlying="AAA",
+        expiration="all",
+        range="itm",
+        minOpenInterest=950,
+        maxBidAskSpread=0.105,
+    )
+
+    filtered = filter_chain(chain, params)
+
+    assert filtered["inTheMoney"].all()
+    assert (filtered["openInterest"] >= 950).all()
+    assert sorted(set(zip(filtered["side"], filtered["strike"]))) == [
+        ("call", 95.0),
+        ("put", 105.0),
+    ]
+
+
+def test_strike_limit_keeps_the_strikes_nearest_the_price(chain):
+    params = OptionsChainParams(
+        underlying="AAA", expiration="2026-01-16", strikeLimit=2
+    )
+
+    filtered = filter_chain(chain, params)
+
+    assert sorted(set(filtered["strike"])) == [100.0, 105.0]
+
+
+@pytest.mark.parametrize(
+    "kwargs, expected",
+    [
+        ({"weekly": True}, ["2026-01-09"]),
+        ({"monthly": True}, ["2026-01-16"]),
+        ({"quarterly": True}, ["2026-03-31"]),
+        ({"weekly": False}, ["2026-01-16", "2026-03-31"]),
+        ({"month": 3}, ["2026-03-31"]),
+        ({"dte": 10}, ["2026-01-09"]),
+    ],
+)
+def test_expiration_filters(chain, kwargs, expected):
+    filtered = filter_chain(chain, OptionsChainParams(underlying="AAA", **kwargs))
+
+    assert sorted(set(filtered["expiration"].str[:10])) == expected
+
+
+def test_expiration_range(chain):
+    params = OptionsChainParams(
+        underlying="AAA",
+        from_to_params=FromToParams(
+            from_date=pd.Timestamp("2026-01-10").date(),
+            to_date=pd.Timestamp("2026-03-31").date(),
+        ),
+    )
+
+    filtered = filter_chain(chain, params)
+
+    assert sorted(set(filtered["expiration"].str[:10])) == ["2026-01-16", "2026-03-31"]
+
+
+def test_pagination_and_columns(chain):
+    params = OptionsChainParams(
+        underlying="AAA",
+        expiration="all",
+        side="put",
+        basic_params=BasicParams(offset=2, limit=3),
+        columns="strike,side",
+    )
+
+    filtered = filter_chain(chain, params)
+
+    assert list(filtered.columns) == ["strike", "side"]
+    assert filtered["strike"].tolist() == [100.0, 105.0, 110.0]
+    assert filtered.index.tolist() == [0, 1, 2]
+
+
+def test_nonstandard_contracts_are_dropped(chain):
+    chain.loc[0, "optionSymbol"] = "AAA1" + chain.loc[0, "optionSymbol"][3:]
+
+    standard = filter_chain(
+        chain, OptionsChainParams(underlying="AAA", expiration="all")
+    )
+    everything = filter_chain(
+        chain, OptionsChainParams(underlying="AAA", expiration="all", nonstandard=True)
+    )
+
+    assert len(standard) == len(chain) - 1
+    assert len(everything) == len(chain)
+
+
+def test_empty_chains_are_returned_as_a_copy(chain):
+    empty = chain.iloc[0:0]
+
+    assert filter_chain(empty, OptionsChainParams(underlying="AAA")) is not empty
+
+
+def test_filter_variations_share_one_fetched_chain(manager, mock_api):
+    params = [
+        OptionsChainParams(underlying="AAA", expiration="all", side=side)
+        for side in ("call", "put")
+    ]
+
+    calls, puts = manager.get_option_chains(params, fetch_superset=True)
+
+    assert mock_api.requests == 1
+    assert (calls["side"] == "call").all() and (puts["side"] == "put").all()
+    expected = manager.client_async.get_options_chains_parallel([params[0]])[0]
+    np.testing.assert_array_equal(calls["optionSymbol"], expected["optionSymbol"])
+
+
+def test_each_request_is_counted_once_when_probing_the_full_chain(manager, mock_api):
+    params = [
+        OptionsChainParams(underlying="AAA", expiration="all", side=side)
+        for side in ("call", "put")
+    ]
+
+    # The full chain isn't cached: a miss for each request, and none for the probe
+    manager.get_option_chains(params)
+    stats = manager.get_chain_cache_stats()
+    assert (stats["hits"], stats["misses"]) == (0, 2)
+    assert mock_api.requests == 2
+
+    manager.get_option_chains([superset_params(params[0])])
+    assert mock_api.requests == 3
+
+    # Now it is: a hit for each request filtered from it
+    before = manager.get_chain_cache_stats()
+    manager.get_option_chains(params)
+    after = manager.get_chain_cache_stats()
+    assert after["hits"] - before["hits"] == 2
+    assert after["misses"] == before["misses"]
+    assert mock_api.requests == 3
@@ -0,0 +1,76 @@
+from time import sleep
+
+from marketdata.client import MarketDataClient
+from marketdata.client_params import OptionsChainParams
+from marketdata.metrics import MetricsRegistry
+
+
+def make_client(mock_api, rate_limiter, **kwargs) -> MarketDataClient:
+    return MarketDataClient(
+        base_url=mock_api.base_url,
+        api_key="test",
+        rate_limiter=rate_limiter,
+        metrics=MetricsRegistry(),
+        backoff_factor=0.0,
+        **kwargs,
+    )
+
+
+def test_requests_reuse_the_pooled_connection(mock_api, rate_limiter):
+    with make_client(mock_api, rate_limiter) as client:
+        for symbol in ["AAA", "BBB", "CCC"]:
+            _, status = client.get_stock_candles(symbol)
+            assert status == 200
+
+    assert mock_api.requests == 3
+    assert mock_api.connections == 1
+
+
+def test_retries_5xx_responses(mock_api, rate_limiter):
+    mock_api.reset(error_rate=1.0)
+
+    with make_client(mock_api, rate_limiter, max_retries=2) as client:
+        data, status = client.get_stock_candles("AAA", output="raw")
+
+    assert status == 500
+    assert data["s"] == "error"
+    assert mock_api.requests == 3
+
+
+def test_retries_go_through_the_rate_limiter(mock_api, rate_limiter):
+    mock_api.reset(error_rate=1.0)
+
+    with make_client(mock_api, rate_limiter, max_retries=2) as client:
+        client.get_stock_candles("AAA", output="raw")
+
+    usage = rate_limiter.usage()
+    assert usage["requests_by_endpoint"] == {"stocks/candles": 3}
+    # The errors weren't charged
+    assert usage["credits_used"] == 0
+
+
+def test_pages_stop_at_the_short_last_page(mock_api, rate_limiter):
+    # 50 rows: two full pages of 20 and a short one of 10
+    mock_api.reset(chain_expirations=1, chain_strikes=25)
+    params = OptionsChainParams(underlying="AAA")
+
+    with make_client(mock_api, rate_limiter) as client:
+        pages = list(client.iter_options_chain(params, page_size=20, prefetch=1))
+
+    assert [len(page) for page in pages] == [20, 20, 10]
+    assert mock_api.requests == 3
+
+
+def test_prefetching_stops_requesting_pages_after_the_last_one(mock_api, rate_limiter):
+    mock_api.reset(chain_expirations=1, chain_strikes=25, latency=0.05)
+    params = OptionsChainParams(underlying="AAA")
+
+    with make_client(mock_api, rate_limiter) as client:
+        pages = list(client.iter_options_chain(params, page_size=20, prefetch=2))
+        sent = mock_api.requests
+        sleep(0.2)
+
+    assert [len(page) for page in pages] == [20, 20, 10]
+    # At most the page already in flight alongside the short one
+    assert sent <= 4
+    assert mock_api.requests == sent
@@ -0,0 +1,384 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import date, timedelta
+from time import perf_counter
+
+import aiohttp
+import numpy as np
+import pandas as pd
+import pytest
+
+from marketdata.client_async import (
+    MarketDataAsyncClient,
+    candle_windows,
+    symbol_batches,
+)
+from marketdata.client_params import OptionsChainParams
+from marketdata.metrics import MetricsRegistry
+
+# 15-minute candles from 9:30 to 16:00
+CANDLES_PER_DAY = 26
+
+
+@pytest.fixture
+def client(mock_api, rate_limiter):
+    return MarketDataAsyncClient(
+        base_url=mock_api.base_url,
+        api_key="test",
+        rate_limiter=rate_limiter,
+        metrics=MetricsRegistry(),
+        backoff_base=0.0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_requests_reuse_the_pooled_session(client, mock_api):
+    async with client:
+        session = client._get_session()
+        for symbol in ["AAA", "BBB", "CCC"]:
+            _, status = await client.get_stock_candles(symbol)
+            assert status == 200
+        assert client._get_session() is session
+
+    assert session.closed
+    assert mock_api.requests == 3
+    # Sequential requests keep reusing one kept-alive connection
+    assert mock_api.connections == 1
+
+
+def test_a_new_session_is_opened_for_each_event_loop(client, mock_api):
+    async def get_session():
+        await client.get_stock_candles("AAA")
+        return client._get_session()
+
+    first = client._run(get_session())
+    second = client._run(get_session())
+
+    assert first is not second
+    assert first.closed and second.closed
+    assert mock_api.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_5xx_responses_are_retried(client, mock_api):
+    mock_api.reset(error_rate=1.0)
+    client.max_retries = 2
+
+    async with client:
+        data, status = await client.get_stock_candles("AAA")
+
+    # The error is returned instead of exiting the process
+    assert status == 500
+    assert data["s"] == "error"
+    assert mock_api.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_429_responses_wait_for_retry_after(client, mock_api):
+    mock_api.reset(throttle_rate=1.0, retry_after=1)
+    client.max_retries = 1
+
+    async with client:
+        start = perf_counter()
+        _, status = await client.get_stock_candles("AAA")
+
+    assert status == 429
+    assert mock_api.requests == 2
+    assert perf_counter() - start >= 1.0
+
+
+@pytest.mark.asyncio
+async def test_connection_errors_are_retried_then_raised(rate_limiter):
+    # Nothing listens on the discard port
+    client = MarketDataAsyncClient(
+        base_url="http://127.0.0.1:9/v1/",
+        api_key="test",
+        rate_limiter=rate_limiter,
+        metrics=MetricsRegistry(),
+        backoff_base=0.0,
+        max_retries=2,
+    )
+
+    async with client:
+        with pytest.raises(aiohttp.ClientConnectionError):
+            await client.get_stock_candles("AAA")
+
+    usage = rate_limiter.usage()
+    assert usage["requests_by_endpoint"] == {"stocks/candles": 3}
+    assert usage["credits_used"] == 0
+
+
+@pytest.mark.asyncio
+async def test_pages_stop_at_the_short_last_page(client, mock_api):
+    # 50 rows: two full pages of 20 and a short one of 10
+    mock_api.reset(chain_expirations=1, chain_strikes=25)
+    params = OptionsChainParams(underlying="AAA")
+
+    async with client:
+        pages = [
+            page
+            async for page in client.iter_options_chain(
+                params, page_size=20, prefetch=1
+            )
+        ]
+
+    assert [len(page) for page in pages] == [20, 20, 10]
+    assert mock_api.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_prefetched_pages_past_the_last_one_are_not_sent(
+    client, mock_api, rate_limiter
+):
+    mock_api.reset(chain_expirations=1, chain_strikes=25)
+    # Spaced out so the page prefetched past the end is still waiting to be sent
+    rate_limiter.configure(requests_per_second=5, burst=1)
+    params = OptionsChainParams(underlying="AAA")
+
+    async with client:
+        pages = [
+            page
+            async for page in client.iter_options_chain(
+                params, page_size=20, prefetch=2
+            )
+        ]
+        await asyncio.sleep(0.4)
+
+    assert [len(page) for page in pages] == [20, 20, 10]
+    assert mock_api.requests == 3
+
+
+@pytest.mark.asyncio
+async def test_breaking_out_of_the_pages_cancels_prefetched_ones(
+    client, mock_api, rate_limiter
+):
+    mock_api.reset(chain_expirations=1, chain_strikes=25)
+    rate_limiter.configure(requests_per_second=5, burst=1)
+    params = OptionsChainParams(underlying="AAA")
+
+    async with client:
+        pages = client.iter_options_chain(params, page_size=20, prefetch=2)
+        async for page in pages:
+            break
+        await pages.aclose()
+        await asyncio.sleep(0.4)
+
+    assert len(page) == 20
+    assert mock_api.requests == 1
+
+
+def test_candle_windows():
+    windows = candle_windows("5", date(2024, 1, 1), date(2024, 3, 15))
+
+    assert windows == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 3, 2)),
+        (date(2024, 3, 3), date(2024, 3, 15)),
+    ]
+    assert candle_windows("1H", date(2023, 1, 1), date(2024, 12, 31)) == [
+        (date(2023, 1, 1), date(2024, 1, 1)),
+        (date(2024, 1, 2), date(2024, 12, 31)),
+    ]
+    assert candle_windows("1D", date(2000, 1, 1), date(2024, 12, 31)) == [
+        (date(2000, 1, 1), date(2024, 12, 31))
+    ]
+    assert candle_windows("1D", date(2024, 1, 1), date(2024, 1, 3), timedelta(0)) == [
+        (date(2024, 1, 1), date(2024, 1, 1)),
+        (date(2024, 1, 2), date(2024, 1, 2)),
+        (date(2024, 1, 3), date(2024, 1, 3)),
+    ]
+    assert candle_windows("5", date(2024, 1, 2), date(2024, 1, 2)) == [
+        (date(2024, 1, 2), date(2024, 1, 2))
+    ]
+
+
+@pytest.mark.asyncio
+async def test_windowed_candles_are_stitched_together(client, mock_api):
+    from_date, to_date = date(2024, 1, 1), date(2024, 3, 31)
+
+    async with client:
+        df, status = await client.get_stock_candles_windowed(
+            "AAA", "15", from_date, to_date, window=timedelta(days=10)
+        )
+
+    assert status == 200
+    assert mock_api.requests == len(
+        candle_windows("15", from_date, to_date, timedelta(days=10))
+    )
+    days = int(np.busday_count(from_date, np.datetime64(to_date) + 1))
+    assert len(df) == days * CANDLES_PER_DAY
+    assert df["t"].is_unique and df["t"].is_monotonic_increasing
+    times = pd.to_datetime(df["t"], unit="s", utc=True).dt.tz_convert("Etc/GMT+5")
+    assert str(times.iat[0]) == "2024-01-01 09:30:00-05:00"
+    assert str(times.iat[-1]) == "2024-03-29 15:45:00-05:00"
+
+
+@pytest.mark.asyncio
+async def test_windowed_candles_match_a_single_request(client):
+    async with client:
+        windowed, _ = await client.get_stock_candles_windowed(
+            "AAA", "1D", date(2024, 1, 1), date(2024, 6, 30), window=timedelta(days=7)
+        )
+        whole, _ = await client.get_stock_candles_windowed(
+            "AAA", "1D", date(2024, 1, 1), date(2024, 6, 30)
+        )
+
+    pd.testing.assert_series_equal(windowed["t"], whole["t"])
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("resolution", ["15", "1D"])
+async def test_reversed_date_range(client, mock_api, resolution):
+    async with client:
+        with pytest.raises(ValueError, match="cannot be after"):
+            await client.get_stock_candles_windowed(
+                "AAA", resolution, date(2024, 3, 1), date(2024, 2, 1)
+            )
+    assert mock_api.requests == 0
+
+
+@pytest.mark.asyncio
+async def test_failed_windows_are_retried_then_reported(client, mock_api, rate_limiter):
+    mock_api.reset(error_rate=1.0)
+    client.max_retries = 0
+
+    async with client:
+        data, status = await client.get_stock_candles_windowed(
+            "AAA",
+            "15",
+            date(2024, 1, 1),
+            date(2024, 1, 31),
+            window=timedelta(days=10),
+            window_retries=1,
+        )
+
+    assert status == 500
+    assert data["s"] == "error"
+    assert data["errmsg"].startswith("4 candle windows failed.")
+    assert mock_api.requests == 8
+    # Failed requests are refunded
+    assert rate_limiter.usage()["credits_used"] == 0
+
+
+@pytest.mark.asyncio
+async def test_no_window_retries(client, mock_api):
+    mock_api.reset(error_rate=1.0)
+    client.max_retries = 0
+
+    async with client:
+        data, _ = await client.get_stock_candles_windowed(
+            "AAA", "1D", date(2024, 1, 1), date(2024, 1, 31), window_retries=-1
+        )
+
+    assert data["s"] == "error"
+    assert mock_api.requests == 1
+
+
+@pytest.mark.asyncio
+async def test_breaking_out_of_a_batch_stops_its_requests(client, mock_api):
+    mock_api.reset(latency=0.05)
+    symbols = [f"S{i}" for i in range(20)]
+
+    async with client:
+        batch = client.iter_stock_candles_batch(
+            symbols, "D", date(2024, 1, 1), date(2024, 1, 31), max_concurrent=2
+        )
+        async for symbol, data in batch:
+            break
+        await asyncio.sleep(0.3)
+        # The first two, and the one started when the first finished
+        assert mock_api.requests <= 3
+
+        await batch.aclose()
+        assert client._in_flight.in_flight() == 0
+
+    assert isinstance(data, pd.DataFrame)
+    assert mock_api.requests <= 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_type", [ThreadPoolExecutor, ProcessPoolExecutor])
+async def test_offloaded_decoding_matches_the_event_loop(
+    mock_api, rate_limiter, executor_type
+):
+    def make_client(executor):
+        return MarketDataAsyncClient(
+            base_url=mock_api.base_url,
+            api_key="test",
+            rate_limiter=rate_limiter,
+            metrics=MetricsRegistry(),
+            decode_executor=executor,
+            decode_offload_bytes=0,
+        )
+
+    params = OptionsChainParams(underlying="AAA", expiration="all")
+    with executor_type(max_workers=1) as executor:
+        async with make_client(executor) as client:
+            offloaded = await client.get_options_chain(params)
+    async with make_client(None) as client:
+        inline = await client.get_options_chain(params)
+
+    assert isinstance(offloaded, pd.DataFrame)
+    # "updated" is the time of the response
+    pd.testing.assert_frame_equal(
+        offloaded.drop(columns="updated"), inline.drop(columns="updated")
+    )
+
+
+@pytest.mark.asyncio
+async def test_csv_candles_match_json_candles(client):
+    symbols = ["AAA", "BBB"]
+
+    async with client:
+        as_json = await client.get_stock_candles_batch(
+            symbols, "D", date(2024, 1, 1), date(2024, 3, 31)
+        )
+        as_csv = await client.get_stock_candles_batch(
+            symbols, "D", date(2024, 1, 1), date(2024, 3, 31), wire_format="csv"
+        )
+
+    for symbol in symbols:
+        pd.testing.assert_frame_equal(as_csv[symbol], as_json[symbol])
+
+
+def test_symbol_batches():
+    symbols = [f"S{i:02d}" for i in range(25)]
+
+    assert symbol_batches(symbols, max_symbols=10) == [
+        symbols[:10],
+        symbols[10:20],
+        symbols[20:],
+    ]
+    # Three 3-character symbols and two encoded commas are 15 characters
+    assert symbol_batches(symbols[:6], max_length=15) == [symbols[:3], symbols[3:6]]
+    assert symbol_batches(["AAA", "BBB", "AAA"]) == [["AAA", "BBB"]]
+    assert symbol_batches(["BRK.A", "BRK/B"], max_length=8) == [["BRK.A"], ["BRK/B"]]
+    assert symbol_batches([]) == []
+
+
+@pytest.mark.asyncio
+async def test_bulk_quotes_are_fetched_in_batches(client, mock_api):
+    symbols = [f"S{i:02d}" for i in range(25)]
+
+    async with client:
+        df, failed = await client.get_bulk_stock_quotes_batched(symbols, max_symbols=10)
+
+    assert mock_api.requests == 3
+    assert failed == []
+    assert sorted(df["symbol"]) == symbols
+
+
+@pytest.mark.asyncio
+async def test_failed_bulk_batches_are_retried_then_reported(client, mock_api):
+    mock_api.reset(error_rate=1.0)
+    client.max_retries = 0
+    symbols = [f"S{i:02d}" for i in range(25)]
+
+    async with client:
+        data, failed = await client.get_bulk_stock_candles_batched(
+            symbols, max_symbols=10, batch_retries=1
+        )
+
+    assert data["s"] == "error"
+    assert sorted(failed) == symbols
+    assert mock_api.requests == 6
@@ -0,0 +1,136 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from marketdata.decoding import (
+    decode_body,
+    decode_csv,
+    decode_frame,
+    decode_frame_ipc,
+    frame_from_ipc,
+)
+
+
+def body(data: dict) -> bytes:
+    return json.dumps(data).encode()
+
+
+def test_columns_are_typed():
+    df = decode_frame(
+        body(
+            {
+                "s": "ok",
+                "t": [1704204000, 1704290400],
+                "c": [1.5, None],
+                "v": [100, 200],
+                "underlying": ["AAA", "AAA"],
+                "inTheMoney": [True, False],
+                "optionSymbol": ["AAA240119C00100000", "AAA240119P00100000"],
+            }
+        )
+    )
+
+    assert list(df.columns) == [
+        "t",
+        "c",
+        "v",
+        "underlying",
+        "inTheMoney",
+        "optionSymbol",
+    ]
+    assert df["t"].dtype == np.int64
+    assert df["c"].dtype == np.float64 and np.isnan(df["c"].iat[1])
+    assert df["v"].dtype == np.int64
+    assert isinstance(df["underlying"].dtype, pd.CategoricalDtype)
+    assert df["inTheMoney"].dtype == bool
+    assert df["optionSymbol"].dtype == object
+
+
+def test_missing_integers_become_floats():
+    df = decode_frame(body({"s": "ok", "openInterest": [10, None]}))
+
+    assert df["openInterest"].dtype == np.float64
+    assert np.isnan(df["openInterest"].iat[1])
+
+
+def test_iso_times_are_left_as_strings():
+    df = decode_frame(body({"s": "ok", "t": ["2024-01-02T00:00:00-05:00"]}))
+
+    assert df["t"].iat[0] == "2024-01-02T00:00:00-05:00"
+
+
+def test_bodies_without_columns_are_returned_parsed():
+    assert decode_frame(body({"s": "no_data"})) == {"s": "no_data"}
+    assert decode_body(body({"s": "no_data"}), "application/json") == {"s": "no_data"}
+
+
+def test_ipc_streams_round_trip():
+    data = body(
+        {
+            "s": "ok",
+            "t": [1704204000, 1704290400],
+            "c": [1.5, None],
+            "v": [100, 200],
+            "underlying": ["AAA", "AAA"],
+            "optionSymbol": ["AAA240119C00100000", "AAA240119P00100000"],
+        }
+    )
+
+    stream = decode_frame_ipc(data)
+
+    assert isinstance(stream, bytes)
+    pd.testing.assert_frame_equal(frame_from_ipc(stream), decode_frame(data))
+
+
+def test_ipc_decoding_passes_bodies_without_columns_through():
+    assert decode_frame_ipc(body({"s": "no_data"})) == {"s": "no_data"}
+
+
+def csv_body(rows) -> bytes:
+    return "\n".join(",".join(map(str, row)) for row in rows).encode() + b"\n"
+
+
+def test_csv_columns_are_typed_like_json():
+    header = ["t", "c", "v", "underlying", "inTheMoney", "optionSymbol"]
+    values = [
+        [1704204000, 1.5, 100, "AAA", True, "AAA240119C00100000"],
+        [1704290400, 2.5, 200, "AAA", False, "AAA240119P00100000"],
+    ]
+
+    from_csv = decode_body(csv_body([header] + values), "text/csv")
+    from_json = decode_frame(
+        body(
+            {"s": "ok", **{name: list(col) for name, col in zip(header, zip(*values))}}
+        )
+    )
+
+    assert list(from_csv.columns) == header
+    for name in header:
+        assert from_csv[name].tolist() == from_json[name].tolist()
+    assert from_csv["t"].dtype == np.int64
+    assert from_csv["c"].dtype == np.float64
+    assert from_csv["v"].dtype == np.int64
+    assert isinstance(from_csv["underlying"].dtype, pd.CategoricalDtype)
+    assert from_csv["inTheMoney"].dtype == bool
+
+
+def test_csv_iso_times_are_left_as_strings():
+    df = decode_csv(csv_body([["t", "c"], ["2024-01-02T00:00:00-05:00", 1.5]]))
+
+    assert df["t"].iat[0] == "2024-01-02T00:00:00-05:00"
+
+
+def test_csv_blocks_are_stitched_together():
+    rows = [["t", "c"]] + [[1704204000 + i, float(i)] for i in range(5000)]
+
+    df = decode_csv(csv_body(rows), block_size=4096)
+
+    assert len(df) == 5000
+    assert df["t"].is_monotonic_increasing
+    assert df["c"].iat[-1] == 4999.0
+
+
+def test_empty_csv_bodies_are_no_data():
+    assert decode_csv(b"") == {"s": "no_data"}
+    assert decode_body(b"\n", "text/csv") == {"s": "no_data"}
@@ -0,0 +1,291 @@
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from marketdata.client_params import BasicParams, FromToParams
+from marketdata.manager import MarketDataManager
+
+
+def business_days(from_date: date, to_date: date) -> int:
+    """Number of candles the mock server returns for a daily range."""
+    return int(np.busday_count(from_date, np.datetime64(to_date) + 1))
+
+
+def seed_cache(manager: MarketDataManager, symbol: str, from_date: date, to_date: date):
+    """Cache a symbol's daily candles for just part of its history."""
+    df, status = manager.client.get_stock_candles(
+        symbol,
+        "1D",
+        basic_params=BasicParams(limit=None),
+        from_to_params=FromToParams(from_date=from_date, to_date=to_date),
+    )
+    assert status == 200
+    manager._write_candle_cache(symbol, "1D", df)
+
+
+def daily_candles(days) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "t": [f"{day}T00:00:00-05:00" for day in days],
+            "o": 1.0,
+            "h": 2.0,
+            "l": 0.5,
+            "c": 1.5,
+            "v": 100,
+        }
+    )
+
+
+def test_candle_cache_gaps():
+    gaps = MarketDataManager._candle_cache_gaps
+    cached = (date(2024, 1, 8), date(2024, 1, 31))
+    assert gaps(date(2024, 1, 10), date(2024, 1, 20), *cached) == []
+    assert gaps(date(2023, 12, 1), date(2024, 1, 20), *cached) == [
+        (date(2023, 12, 1), date(2024, 1, 8))
+    ]
+    # Gaps overlap the cached range by a day, to complete a partial last day
+    assert gaps(date(2023, 12, 1), date(2024, 2, 29), *cached) == [
+        (date(2023, 12, 1), date(2024, 1, 8)),
+        (date(2024, 1, 31), date(2024, 2, 29)),
+    ]
+
+
+def test_partially_cached_candles_are_topped_up(manager, mock_api):
+    seed_cache(manager, "AAA", date(2024, 1, 8), date(2024, 1, 31))
+    mock_api.reset()
+
+    df = manager.get_stock_candles(["AAA"], "1D", date(2023, 12, 1), date(2024, 2, 29))[
+        "AAA"
+    ]
+
+    # One request per missing range, instead of the full history
+    assert mock_api.requests == 2
+    entry = manager.manifest.get("AAA", "1D")
+    assert (entry["from_date"], entry["to_date"]) == (
+        date(2023, 12, 1),
+        date(2024, 2, 29),
+    )
+    assert entry["row_count"] == business_days(date(2023, 12, 1), date(2024, 2, 29))
+    assert df.index.is_monotonic_increasing and df.index.is_unique
+    assert len(df) == entry["row_count"]
+
+    manager.get_stock_candles(["AAA"], "1D", date(2023, 12, 1), date(2024, 2, 29))
+    assert mock_api.requests == 2
+
+
+def test_gaps_without_candles_are_not_refetched(manager, mock_api, monkeypatch):
+    seed_cache(manager, "AAA", date(2024, 1, 8), date(2024, 1, 31))
+    fetches = []
+
+    def no_data(symbols, resolution, from_date, to_date, **kwargs):
+        fetches.append((from_date, to_date))
+        return {symbol: {"s": "no_data"} for symbol in symbols}
+
+    monkeypatch.setattr(manager.client_async, "get_stock_candles_parallel", no_data)
+
+    for _ in range(2):
+        df = manager.get_stock_candles(
+            ["AAA"], "1D", date(2023, 12, 1), date(2024, 1, 31)
+        )["AAA"]
+
+    assert fetches == [(date(2023, 12, 1), date(2024, 1, 8))]
+    entry = manager.manifest.get("AAA", "1D")
+    assert (entry["from_date"], entry["to_date"]) == (
+        date(2023, 12, 1),
+        date(2024, 1, 31),
+    )
+    assert (
+        entry["row_count"]
+        == len(df)
+        == business_days(date(2024, 1, 8), date(2024, 1, 31))
+    )
+
+
+class CountingDataset:
+    """Wraps a pyarrow dataset to record the files each read scans."""
+
+    def __init__(self, dataset, reads: list):
+        self._dataset = dataset
+        self._reads = reads
+
+    def __getattr__(self, name):
+        return getattr(self._dataset, name)
+
+    def to_table(self, columns=None, filter=None):
+        fragments = self._dataset.get_fragments(filter=filter)
+        self._reads.append(
+            sorted(os.path.basename(os.path.dirname(f.path)) for f in fragments)
+        )
+        return self._dataset.to_table(columns=columns, filter=filter)
+
+
+def test_memory_misses_read_only_the_partitions_in_range(manager, mock_api, tmp_path):
+    days = pd.bdate_range("2022-01-03", "2024-12-31")
+    manager._write_candle_cache("AAA", "1D", daily_candles(days.strftime("%Y-%m-%d")))
+    # A new manager starts with an empty memory cache
+    manager = MarketDataManager(
+        cache_dir=str(tmp_path), base_url=mock_api.base_url, api_key="test"
+    )
+    reads = []
+    dataset = manager.store._dataset
+    manager.store._dataset = lambda *args: CountingDataset(dataset(*args), reads)
+
+    def get(from_date, to_date, resolution="1D"):
+        return manager.get_stock_candles(["AAA"], resolution, from_date, to_date)["AAA"]
+
+    assert len(get(date(2024, 3, 1), date(2024, 3, 8))) == 6
+    assert reads == [["year=2024"]]
+    # Answered from the partition already in memory
+    for month in range(1, 13):
+        get(date(2024, month, 1), date(2024, month, 10))
+    assert len(reads) == 1
+    # Only the partitions that aren't in memory yet are read
+    assert len(get(date(2022, 6, 1), date(2024, 6, 28))) == len(
+        pd.bdate_range("2022-06-01", "2024-06-28")
+    )
+    assert reads == [["year=2024"], ["year=2022", "year=2023"]]
+    assert mock_api.requests == 0
+
+
+def test_resampling_reads_only_the_partitions_in_range(manager, tmp_path):
+    days = pd.bdate_range("2022-01-03", "2024-12-31")
+    manager._write_candle_cache("AAA", "1D", daily_candles(days.strftime("%Y-%m-%d")))
+    manager.candle_cache.clear()
+    reads = []
+    dataset = manager.store._dataset
+    manager.store._dataset = lambda *args: CountingDataset(dataset(*args), reads)
+
+    weekly = manager.get_stock_candles(
+        ["AAA"], "1W", date(2024, 1, 8), date(2024, 1, 26)
+    )["AAA"]
+
+    assert len(weekly) == 3
+    assert reads == [["year=2024"]]
+
+
+def test_date_range_is_inclusive(manager):
+    manager._write_candle_cache(
+        "AAA",
+        "1D",
+        daily_candles(["2024-01-02", "2024-01-03", "2024-01-04", "2024-01-05"]),
+    )
+
+    df = manager.get_stock_candles(["AAA"], "1D", date(2024, 1, 3), date(2024, 1, 4))[
+        "AAA"
+    ]
+
+    assert list(df["datetime"]) == [
+        "2024-01-03T00:00:00-05:00",
+        "2024-01-04T00:00:00-05:00",
+    ]
+    assert isinstance(df.index, pd.DatetimeIndex)
+    assert str(df.index.tz) == "America/New_York"
+    assert list(df.index.date) == [date(2024, 1, 3), date(2024, 1, 4)]
+
+
+def test_modifying_results_leaves_the_cache_unchanged(manager):
+    manager._write_candle_cache(
+        "AAA", "1D", daily_candles(["2024-01-02", "2024-01-03"])
+    )
+
+    df = manager.get_stock_candles(["AAA"], "1D", date(2024, 1, 2), date(2024, 1, 3))[
+        "AAA"
+    ]
+    df["close"] *= 2
+    df.iloc[0, 1] = -1.0
+
+    again = manager.get_stock_candles(
+        ["AAA"], "1D", date(2024, 1, 2), date(2024, 1, 3)
+    )["AAA"]
+    assert list(again["close"]) == [1.5, 1.5]
+    assert list(again["open"]) == [1.0, 1.0]
+
+
+def test_coarser_resolutions_are_built_from_cached_candles(manager, mock_api):
+    seed_cache(manager, "AAA", date(2024, 1, 1), date(2024, 3, 31))
+    mock_api.reset()
+
+    weekly = manager.get_stock_candles(
+        ["AAA"], "1W", date(2024, 1, 8), date(2024, 1, 26)
+    )["AAA"]
+    daily = manager.get_stock_candles(
+        ["AAA"], "1D", date(2024, 1, 8), date(2024, 1, 26)
+    )["AAA"]
+
+    assert mock_api.requests == 0
+    assert list(weekly.index.date) == [
+        date(2024, 1, 8),
+        date(2024, 1, 15),
+        date(2024, 1, 22),
+    ]
+    first_week = daily.iloc[:5]
+    assert weekly["open"].iat[0] == first_week["open"].iat[0]
+    assert weekly["close"].iat[0] == first_week["close"].iat[-1]
+    assert weekly["high"].iat[0] == first_week["high"].max()
+    assert weekly["volume"].iat[0] == first_week["volume"].sum()
+
+
+@pytest.mark.parametrize("store", ["parquet", "feather"])
+@pytest.mark.parametrize(
+    "cached_to, snapshot_day",
+    [
+        # Independence Day and Martin Luther King Jr. Day
+        (date(2024, 7, 3), date(2024, 7, 5)),
+        (date(2024, 1, 12), date(2024, 1, 16)),
+    ],
+)
+def test_snapshot_skips_market_holidays(
+    tmp_path, mock_api, store, cached_to, snapshot_day
+):
+    manager = MarketDataManager(
+        cache_dir=str(tmp_path), store=store, base_url=mock_api.base_url, api_key="test"
+    )
+    manager._write_candle_cache(
+        "AAA", "1D", daily_candles([date(2024, 1, 2), cached_to])
+    )
+    manager._write_candle_cache(
+        "BBB", "1D", daily_candles([date(2023, 11, 30), date(2023, 12, 1)])
+    )
+
+    snapshot = daily_candles([snapshot_day] * 3).assign(symbol=["AAA", "BBB", "CCC"])
+    manager.client.get_bulk_stock_candles = lambda *args, **kwargs: (snapshot, 200)
+    result = manager.ingest_daily_snapshot()
+
+    assert result == {
+        "appended": ["AAA"],
+        "already_cached": [],
+        "not_contiguous": ["BBB"],
+        "not_cached": ["CCC"],
+    }
+    entry = manager.manifest.get("AAA", "1D")
+    assert entry["to_date"] == snapshot_day
+    assert entry["row_count"] == 3
+    assert len(manager.store.read("AAA", "1D")) == 3
+
+
+def test_snapshots_already_covered_by_the_cache_are_skipped(manager):
+    snapshot_day = date(2024, 1, 16)
+    # Covers the snapshot's day as its last day, and as a day in the middle
+    manager._write_candle_cache(
+        "AAA", "1D", daily_candles([date(2024, 1, 12), snapshot_day])
+    )
+    manager._write_candle_cache(
+        "BBB", "1D", daily_candles([snapshot_day, date(2024, 1, 17)])
+    )
+
+    snapshot = daily_candles([snapshot_day] * 2).assign(
+        symbol=["AAA", "BBB"], c=[9.0, 9.0]
+    )
+    manager.client.get_bulk_stock_candles = lambda *args, **kwargs: (snapshot, 200)
+    result = manager.ingest_daily_snapshot()
+
+    assert result["appended"] == []
+    assert result["already_cached"] == ["AAA", "BBB"]
+    for symbol, to_date in [("AAA", snapshot_day), ("BBB", date(2024, 1, 17))]:
+        entry = manager.manifest.get(symbol, "1D")
+        assert entry["to_date"] == to_date
+        assert entry["row_count"] == 2
+        assert (manager.store.read(symbol, "1D")["c"] == 1.5).all()
@@ -0,0 +1,41 @@
+from datetime import date
+
+from marketdata.market_calendar import market_holidays
+
+
+def test_2024_holidays():
+    assert market_holidays(date(2024, 1, 1), date(2024, 12, 31)) == [
+        date(2024, 1, 1),
+        date(2024, 1, 15),
+        date(2024, 2, 19),
+        date(2024, 3, 29),
+        date(2024, 5, 27),
+        date(2024, 6, 19),
+        date(2024, 7, 4),
+        date(2024, 9, 2),
+        date(2024, 11, 28),
+        date(2024, 12, 25),
+    ]
+
+
+def test_weekend_holidays_are_observed_on_a_weekday():
+    # July 4th 2020 was a Saturday and Christmas 2022 a Sunday
+    assert date(2020, 7, 3) in market_holidays(date(2020, 7, 1), date(2020, 7, 31))
+    assert date(2022, 12, 26) in market_holidays(date(2022, 12, 1), date(2022, 12, 31))
+
+
+def test_new_year_on_a_saturday_is_not_observed():
+    # January 1st 2022 was a Saturday; December 31st 2021 was a trading day
+    assert market_holidays(date(2021, 12, 30), date(2022, 1, 3)) == []
+
+
+def test_juneteenth_is_a_holiday_from_2022():
+    assert market_holidays(date(2021, 6, 18), date(2021, 6, 18)) == []
+    assert market_holidays(date(2022, 6, 20), date(2022, 6, 20)) == [date(2022, 6, 20)]
+
+
+def test_special_and_extra_closures():
+    assert market_holidays(date(2025, 1, 9), date(2025, 1, 9)) == [date(2025, 1, 9)]
+    assert market_holidays(
+        date(2030, 3, 1), date(2030, 3, 31), extra=[date(2030, 3, 5)]
+    ) == [date(2030, 3, 5)]
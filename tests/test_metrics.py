@@ -0,0 +1,131 @@
+import asyncio
+import urllib.error
+import urllib.request
+from datetime import date
+
+import pytest
+
+from marketdata.metrics import MetricsRegistry, PrometheusExporter, prometheus_text
+
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry(enabled=True, latency_buckets=(0.1, 1.0))
+
+
+def test_a_disabled_registry_records_nothing():
+    registry = MetricsRegistry()
+
+    registry.observe_request("stocks/candles", 0.05, 200, 100)
+    registry.record_retry("stocks/candles", 429)
+    registry.observe_queue_wait("rate_limiter", "stocks/candles", 0.05)
+    registry.record_cache("chain", "hit")
+
+    assert registry.snapshot() == {"requests": {}, "queue_wait": {}, "cache": {}}
+
+
+def test_requests_are_recorded_by_endpoint(registry):
+    registry.observe_request("stocks/candles", 0.05, 200, 100)
+    registry.observe_request("stocks/candles", 0.5, 200, 50)
+    registry.observe_request("stocks/candles", 5.0, 503)
+    registry.record_retry("stocks/candles", 503)
+    registry.record_retry("stocks/candles", "ClientConnectionError", 2)
+
+    snapshot = registry.snapshot()["requests"]["stocks/candles"]
+
+    assert snapshot["latency"] == {
+        "buckets": {0.1: 1, 1.0: 2, float("inf"): 3},
+        "sum": 5.55,
+        "count": 3,
+    }
+    assert snapshot["bytes"] == 150
+    assert snapshot["statuses"] == {200: 2, 503: 1}
+    assert snapshot["retries"] == {"503": 1, "ClientConnectionError": 2}
+
+
+def test_queue_waits_and_cache_events_are_recorded(registry):
+    registry.observe_queue_wait("rate_limiter", "stocks/candles", 0.05)
+    registry.record_cache("chain", "hit", 2)
+    registry.record_cache("chain", "miss")
+    registry.record_cache("chain", "fill", 0)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot["queue_wait"]["rate_limiter"]["stocks/candles"]["count"] == 1
+    assert snapshot["cache"] == {"chain": {"hit": 2, "miss": 1}}
+
+    registry.reset()
+    assert registry.snapshot() == {"requests": {}, "queue_wait": {}, "cache": {}}
+
+
+@pytest.mark.asyncio
+async def test_queueing_for_a_semaphore_is_recorded(registry):
+    semaphore = asyncio.Semaphore(1)
+    await semaphore.acquire()
+    asyncio.get_running_loop().call_later(0.05, semaphore.release)
+
+    async with registry.queued(semaphore, "options/chain"):
+        assert semaphore.locked()
+
+    assert not semaphore.locked()
+    histogram = registry.snapshot()["queue_wait"]["concurrency"]["options/chain"]
+    assert histogram["count"] == 1
+    assert histogram["sum"] >= 0.04
+
+
+def test_prometheus_text(registry):
+    registry.observe_request("stocks/candles", 0.05, 200, 100)
+    registry.record_retry("stocks/candles", 429)
+    registry.record_cache("candle_memory", "hit")
+
+    lines = prometheus_text(registry.snapshot(), namespace="md").splitlines()
+
+    assert "# TYPE md_request_duration_seconds histogram" in lines
+    assert (
+        'md_request_duration_seconds_bucket{endpoint="stocks/candles",le="0.1"} 1'
+        in lines
+    )
+    assert (
+        'md_request_duration_seconds_bucket{endpoint="stocks/candles",le="+Inf"} 1'
+        in lines
+    )
+    assert 'md_request_duration_seconds_count{endpoint="stocks/candles"} 1' in lines
+    assert 'md_response_bytes_total{endpoint="stocks/candles"} 100' in lines
+    assert 'md_responses_total{endpoint="stocks/candles",status="200"} 1' in lines
+    assert 'md_retries_total{endpoint="stocks/candles",reason="429"} 1' in lines
+    assert 'md_cache_events_total{tier="candle_memory",event="hit"} 1' in lines
+
+
+def test_the_exporter_serves_metrics_over_http(registry):
+    registry.record_cache("chain", "hit")
+    server = PrometheusExporter(registry).serve(port=0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+            assert response.status == 200
+            assert response.headers["Content-Type"].startswith("text/plain")
+            body = response.read().decode()
+        with pytest.raises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{base_url}/other", timeout=5)
+        assert error.value.code == 404
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert (
+        'marketdata_cache_events_total{tier="chain",event="hit"} 1' in body.splitlines()
+    )
+
+
+def test_requests_and_cache_lookups_are_recorded(manager):
+    for _ in range(2):
+        manager.get_stock_candles(["AAA"], "1D", date(2024, 1, 2), date(2024, 1, 31))
+
+    snapshot = manager.metrics.snapshot()
+
+    assert snapshot["requests"]["stocks/candles"]["statuses"] == {200: 1}
+    assert snapshot["queue_wait"]["rate_limiter"]["stocks/candles"]["count"] == 1
+    # The first call misses the disk cache and fills both tiers from one request
+    assert snapshot["cache"]["candle_disk"]["miss"] == 1
+    assert snapshot["cache"]["candle_disk"]["fill"] == 1
+    assert snapshot["cache"]["candle_memory"]["fill"] == 1
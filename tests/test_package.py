@@ -0,0 +1,71 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import marketdata
+
+SRC = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+def run(code: str, **env: str) -> str:
+    """Run code in a fresh interpreter without an API key and get its output."""
+    environ = {k: v for k, v in os.environ.items() if k != "MARKET_DATA_API_KEY"}
+    environ["PYTHONPATH"] = SRC
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**environ, **env},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return result.stdout.strip()
+
+
+def test_importing_the_package_loads_no_submodules_or_dependencies():
+    loaded = run(
+        "import sys, marketdata\n"
+        "print(sorted(m for m in sys.modules if m.startswith("
+        "('marketdata.', 'pandas', 'aiohttp'))))"
+    )
+
+    assert loaded == "[]"
+
+
+def test_names_import_their_submodule_on_first_use():
+    loaded = run(
+        "import sys\n"
+        "from marketdata import OptionsChainParams\n"
+        "print(sorted(m for m in sys.modules if m.startswith('marketdata.')))"
+    )
+
+    assert loaded == "['marketdata.client_params']"
+
+
+def test_the_api_key_is_read_on_use():
+    assert run("import marketdata", MARKET_DATA_API_KEY="") == ""
+    assert (
+        run(
+            "import marketdata; print(marketdata.MARKET_DATA_API_KEY)",
+            MARKET_DATA_API_KEY="secret",
+        )
+        == "secret"
+    )
+
+
+def test_star_exports_the_public_names():
+    namespace: dict = {}
+    exec("from marketdata import *", namespace)
+
+    for name in ["MarketDataManager", "OptionsChainParams", "enable_metrics"]:
+        assert name in namespace
+    assert "MARKET_DATA_API_KEY" not in namespace
+    # Internals stay in their submodules
+    assert "search_sorted" not in namespace
+    assert "store" in dir(marketdata)
+
+
+def test_unknown_names_raise_attribute_error():
+    with pytest.raises(AttributeError):
+        marketdata.search_sorted
@@ -0,0 +1,92 @@
+import asyncio
+import time
+
+import pytest
+
+from marketdata.rate_limit import (
+    CreditBudgetExceeded,
+    RateLimiter,
+    endpoint_name,
+    estimate_credits,
+)
+
+
+def test_endpoint_name_and_credit_estimates():
+    assert endpoint_name("https://api.marketdata.app/v1/stocks/candles/D/AAA/") == (
+        "stocks/candles"
+    )
+    assert estimate_credits("stocks/bulkquotes", {"symbols": "AAA,BBB,CCC"}) == 3
+    assert estimate_credits("options/chain", {"side": "call"}) == 1
+
+
+def test_requests_are_spread_over_the_rate():
+    limiter = RateLimiter(requests_per_second=50, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        limiter.acquire("stocks/candles")
+
+    # Two requests go out at once and the other five are 20ms apart
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.05)
+
+
+def test_async_waits_share_the_bucket():
+    limiter = RateLimiter(requests_per_second=50, burst=1)
+
+    async def acquire_all():
+        await asyncio.gather(*(limiter.acquire_async("x") for _ in range(6)))
+
+    start = time.monotonic()
+    asyncio.run(acquire_all())
+    assert time.monotonic() - start == pytest.approx(0.1, abs=0.05)
+
+
+def test_exhausted_budget_sheds_requests():
+    limiter = RateLimiter(daily_credits=3, on_exhausted="raise")
+    limiter.acquire("stocks/bulkquotes", credits=2)
+
+    with pytest.raises(CreditBudgetExceeded, match="needs 2 credits but only 1"):
+        limiter.acquire("stocks/bulkquotes", credits=2)
+    limiter.acquire("stocks/quotes")
+
+    usage = limiter.usage()
+    assert usage["credits_used"] == 3 and usage["credits_remaining"] == 0
+    assert usage["credits_by_endpoint"] == {"stocks/bulkquotes": 2, "stocks/quotes": 1}
+
+
+def test_refunds():
+    limiter = RateLimiter(daily_credits=10)
+    limiter.acquire("stocks/candles")
+    limiter.refund("stocks/candles", 1)
+    assert limiter.usage()["credits_used"] == 0
+
+    # Errors without usage headers weren't charged
+    limiter.acquire("stocks/candles")
+    limiter.record_usage("stocks/candles", 1, {}, 503)
+    assert limiter.usage()["credits_used"] == 0
+    # Successful responses without them keep the estimate
+    limiter.acquire("stocks/candles")
+    limiter.record_usage("stocks/candles", 1, {}, 200)
+    assert limiter.usage()["credits_used"] == 1
+    assert limiter.usage()["requests_by_endpoint"] == {"stocks/candles": 3}
+
+
+def test_usage_is_reconciled_with_the_response_headers():
+    limiter = RateLimiter(daily_credits=1000)
+    limiter.acquire("options/chain")
+
+    limiter.record_usage(
+        "options/chain",
+        1,
+        {
+            "X-Api-Ratelimit-Consumed": "120",
+            "X-Api-Ratelimit-Remaining": "500",
+            "X-Api-Ratelimit-Reset": "1893474000",
+        },
+        200,
+    )
+
+    usage = limiter.usage()
+    assert usage["credits_by_endpoint"] == {"options/chain": 120}
+    # The server's count includes other users of the key
+    assert usage["credits_used"] == 500
+    assert usage["reset_at"].timestamp() == 1893474000
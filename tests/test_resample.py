@@ -0,0 +1,170 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from marketdata.resample import (
+    can_resample,
+    parse_resolution,
+    period_bounds,
+    resample_candles,
+)
+
+
+def minute_candles(*days: str) -> pd.DataFrame:
+    """1-minute candles of the regular session, times in unix seconds."""
+    times = pd.DatetimeIndex(
+        [
+            t
+            for day in days
+            for t in pd.date_range(f"{day} 09:30", f"{day} 15:59", freq="min")
+        ]
+    ).tz_localize("America/New_York")
+    n = len(times)
+    return pd.DataFrame(
+        {
+            "t": times.as_unit("s").asi8,
+            "o": np.arange(n, dtype=float),
+            "h": np.arange(n, dtype=float) + 0.5,
+            "l": np.arange(n, dtype=float) - 0.5,
+            "c": np.arange(n, dtype=float) + 0.25,
+            "v": np.ones(n, dtype=np.int64),
+        }
+    )
+
+
+def test_hourly_candles_are_aligned_to_the_open():
+    df = minute_candles("2024-01-02", "2024-01-03")
+
+    hourly = resample_candles(df, "1", "1H")
+
+    times = pd.to_datetime(hourly["t"], unit="s", utc=True).dt.tz_convert(
+        "America/New_York"
+    )
+    assert list(times.dt.strftime("%m-%d %H:%M")) == [
+        f"{day} {hour}"
+        for day in ("01-02", "01-03")
+        for hour in ("09:30", "10:30", "11:30", "12:30", "13:30", "14:30", "15:30")
+    ]
+    # The last candle of each day holds just the final half hour
+    assert list(hourly["v"]) == [60] * 6 + [30] + [60] * 6 + [30]
+    first = df.iloc[:60]
+    assert hourly["o"].iat[0] == first["o"].iat[0]
+    assert hourly["h"].iat[0] == first["h"].max()
+    assert hourly["l"].iat[0] == first["l"].min()
+    assert hourly["c"].iat[0] == first["c"].iat[-1]
+
+
+def test_long_intraday_candles_never_span_two_sessions():
+    df = minute_candles("2024-01-02", "2024-01-03")
+
+    four_hourly = resample_candles(df, "1", "4H")
+
+    assert list(four_hourly["v"]) == [240, 150, 240, 150]
+
+
+def test_iso_times_keep_their_format():
+    df = minute_candles("2024-01-02", "2024-07-01")
+    times = pd.to_datetime(df["t"], unit="s", utc=True).dt.tz_convert(
+        "America/New_York"
+    )
+    df["t"] = times.dt.strftime("%Y-%m-%dT%H:%M:%S%z").str.replace(
+        r"(\d\d)(\d\d)$", r"\1:\2", regex=True
+    )
+
+    hourly = resample_candles(df, "1", "1H")
+
+    assert hourly["t"].iat[0] == "2024-01-02T09:30:00-05:00"
+    assert hourly["t"].iat[1] == "2024-01-02T10:30:00-05:00"
+    # Daylight saving time
+    assert hourly["t"].iat[7] == "2024-07-01T09:30:00-04:00"
+
+
+def test_unsorted_candles_are_sorted_first():
+    df = minute_candles("2024-01-02")
+
+    shuffled = df.sample(frac=1, random_state=0)
+
+    pd.testing.assert_frame_equal(
+        resample_candles(shuffled, "1", "15"), resample_candles(df, "1", "15")
+    )
+
+
+def test_daily_candles_are_grouped_by_calendar_week():
+    days = pd.bdate_range("2024-01-03", "2024-01-22")
+    df = pd.DataFrame(
+        {
+            "t": days.strftime("%Y-%m-%dT00:00:00-05:00"),
+            "o": 1.0,
+            "h": np.arange(len(days), dtype=float),
+            "l": 0.5,
+            "c": 1.5,
+            "v": 10,
+        }
+    )
+
+    weekly = resample_candles(df, "1D", "1W")
+
+    # Each week's candle has the time of its first candle, like the API's
+    assert list(weekly["t"]) == [
+        "2024-01-03T00:00:00-05:00",
+        "2024-01-08T00:00:00-05:00",
+        "2024-01-15T00:00:00-05:00",
+        "2024-01-22T00:00:00-05:00",
+    ]
+    assert list(weekly["v"]) == [30, 50, 50, 10]
+    assert list(weekly["h"]) == [2.0, 7.0, 12.0, 13.0]
+
+
+def test_empty_candles():
+    df = minute_candles("2024-01-02").iloc[0:0]
+
+    assert resample_candles(df, "1", "1H").empty
+
+
+@pytest.mark.parametrize(
+    "source, target, expected",
+    [
+        ("1", "5", True),
+        ("5", "1H", True),
+        ("15", "4H", True),
+        ("5", "7", False),
+        ("1H", "30", False),
+        ("1", "1D", False),
+        ("1D", "1W", True),
+        ("1D", "1M", True),
+        ("1M", "1Y", True),
+        ("1W", "1M", False),
+        ("1D", "2W", False),
+        ("bad", "1H", False),
+    ],
+)
+def test_can_resample(source, target, expected):
+    assert can_resample(source, target) is expected
+
+
+def test_parse_resolution():
+    assert parse_resolution("15") == (15, "")
+    assert parse_resolution("4h") == (4, "H")
+    with pytest.raises(ValueError):
+        parse_resolution("D")
+
+
+def test_period_bounds():
+    assert period_bounds(date(2024, 1, 10), "1W") == (
+        date(2024, 1, 8),
+        date(2024, 1, 14),
+    )
+    assert period_bounds(date(2024, 2, 10), "1M") == (
+        date(2024, 2, 1),
+        date(2024, 2, 29),
+    )
+    assert period_bounds(date(2024, 2, 10), "1Y") == (
+        date(2024, 1, 1),
+        date(2024, 12, 31),
+    )
+    assert period_bounds(date(2024, 2, 10), "1H") == (
+        date(2024, 2, 10),
+        date(2024, 2, 10),
+    )
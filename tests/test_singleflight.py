@@ -0,0 +1,114 @@
+import asyncio
+import threading
+
+import pytest
+
+from marketdata.singleflight import AsyncSingleFlight, SingleFlight, request_key
+
+
+def test_request_key_ignores_parameter_order():
+    assert request_key("stocks/candles/D/AAA", {"from": 1, "to": 2}) == request_key(
+        "stocks/candles/D/AAA", {"to": "2", "from": "1"}
+    )
+    assert request_key("stocks/candles/D/AAA") != request_key("stocks/candles/D/BBB")
+
+
+def test_concurrent_threads_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return "result"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("key", fn)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    while flight.in_flight() == 0:
+        pass
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == ["result"] * 4
+    assert flight.in_flight() == 0
+
+
+def test_exceptions_are_raised_to_the_caller():
+    flight = SingleFlight()
+
+    def fn():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        flight.do("key", fn)
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_concurrent_tasks_share_one_coroutine():
+    flight = AsyncSingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    results = await asyncio.gather(*(flight.do("key", fn) for _ in range(4)))
+
+    assert len(calls) == 1
+    assert results == ["result"] * 4
+    assert flight.in_flight() == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_waiter_keeps_the_call_for_the_others():
+    flight = AsyncSingleFlight()
+    finished = []
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        finished.append(1)
+        return "result"
+
+    first = asyncio.ensure_future(flight.do("key", fn))
+    second = asyncio.ensure_future(flight.do("key", fn))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "result"
+    assert first.cancelled()
+    assert finished == [1]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_every_waiter_cancels_the_call():
+    flight = AsyncSingleFlight()
+    started = asyncio.Event()
+    cancelled = []
+
+    async def fn():
+        started.set()
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    waiters = [asyncio.ensure_future(flight.do("key", fn)) for _ in range(3)]
+    await started.wait()
+    for waiter in waiters:
+        waiter.cancel()
+    await asyncio.gather(*waiters, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert cancelled == [1]
+    assert flight.in_flight() == 0
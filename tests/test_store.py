@@ -0,0 +1,180 @@
+import os
+from datetime import date
+
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from marketdata.store import (
+    FeatherCandleStore,
+    ParquetCandleStore,
+    partition_period,
+    partition_ranges,
+    search_sorted,
+    store_for_path,
+)
+
+
+def daily_candles(from_date: str, to_date: str, close: float = 1.5) -> pd.DataFrame:
+    days = pd.bdate_range(from_date, to_date)
+    return pd.DataFrame(
+        {
+            "t": days.strftime("%Y-%m-%dT00:00:00-05:00"),
+            "o": 1.0,
+            "h": 2.0,
+            "l": 0.5,
+            "c": close,
+            "v": range(len(days)),
+        }
+    )
+
+
+@pytest.fixture(params=[ParquetCandleStore, FeatherCandleStore])
+def store(request, tmp_path):
+    return request.param(str(tmp_path))
+
+
+def test_round_trip(store):
+    df = daily_candles("2022-01-03", "2024-12-31")
+    store.write("AAA", "1D", df, replace=True)
+
+    pd.testing.assert_frame_equal(store.read("AAA", "1D"), df)
+    assert store.count_rows("AAA", "1D") == len(df)
+    assert isinstance(store_for_path(store.path("AAA", "1D"), store.root), type(store))
+
+
+def test_read_date_range(store):
+    df = daily_candles("2022-01-03", "2024-12-31")
+    store.write("AAA", "1D", df, replace=True)
+
+    window = store.read("AAA", "1D", date(2023, 12, 29), date(2024, 1, 3))
+
+    assert list(window["t"]) == [
+        "2023-12-29T00:00:00-05:00",
+        "2024-01-01T00:00:00-05:00",
+        "2024-01-02T00:00:00-05:00",
+        "2024-01-03T00:00:00-05:00",
+    ]
+
+
+def test_parquet_reads_only_the_partitions_in_range(tmp_path):
+    store = ParquetCandleStore(str(tmp_path))
+    store.write("AAA", "1D", daily_candles("2022-01-03", "2024-12-31"), replace=True)
+    root = store.path("AAA", "1D")
+    assert sorted(os.listdir(root)) == ["year=2022", "year=2023", "year=2024"]
+    # A partition outside the range is never opened. (The first one is, for
+    # the dataset's schema.)
+    with open(os.path.join(root, "year=2023", store.PART_FILE), "wb") as f:
+        f.write(b"not parquet")
+
+    window = store.read("AAA", "1D", date(2024, 3, 1), date(2024, 3, 8))
+
+    assert len(window) == 6
+
+
+def test_feather_reads_are_memory_mapped(tmp_path):
+    store = FeatherCandleStore(str(tmp_path))
+    store.write("AAA", "1D", daily_candles("2000-01-03", "2024-12-31"), replace=True)
+    allocated = pa.total_allocated_bytes()
+
+    table = store.read_table("AAA", "1D", date(2024, 3, 1), date(2024, 3, 8))
+
+    assert table.num_rows == 6
+    # A slice of the mapped file, so nothing was read into Arrow's memory pool
+    assert pa.total_allocated_bytes() == allocated
+
+
+def test_search_sorted():
+    column = pa.chunked_array([[1, 3, 3], [5, 8]])
+
+    assert [search_sorted(column, value) for value in (0, 1, 3, 4, 8, 9)] == [
+        0,
+        0,
+        1,
+        3,
+        4,
+        5,
+    ]
+
+
+def test_intraday_candles_are_partitioned_by_month():
+    assert partition_period("5") == "month"
+    assert partition_period("1H") == "month"
+    assert partition_period("1D") == "year"
+
+
+def test_partition_ranges():
+    assert partition_ranges("1D", date(2023, 12, 29), date(2024, 1, 3)) == [
+        (date(2023, 1, 1), date(2023, 12, 31)),
+        (date(2024, 1, 1), date(2024, 12, 31)),
+    ]
+    assert partition_ranges("5", date(2024, 1, 31), date(2024, 3, 1)) == [
+        (date(2024, 1, 1), date(2024, 1, 31)),
+        (date(2024, 2, 1), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2024, 3, 31)),
+    ]
+    assert partition_ranges("5", date(2024, 2, 10), date(2024, 2, 1)) == [
+        (date(2024, 2, 1), date(2024, 2, 29))
+    ]
+
+
+def test_merge_replaces_candles_with_the_same_time(store):
+    store.write("AAA", "1D", daily_candles("2023-12-01", "2024-01-31"), replace=True)
+
+    store.write("AAA", "1D", daily_candles("2024-01-29", "2024-02-09", close=9.0))
+
+    df = store.read("AAA", "1D")
+    assert len(df) == len(pd.bdate_range("2023-12-01", "2024-02-09"))
+    assert df["t"].is_unique and df["t"].is_monotonic_increasing
+    assert (df.set_index("t").loc["2024-01-29T00:00:00-05:00":, "c"] == 9.0).all()
+    assert (df.set_index("t").loc[:"2024-01-26T00:00:00-05:00", "c"] == 1.5).all()
+
+
+def test_write_many(store):
+    for symbol in ("AAA", "BBB"):
+        store.write(
+            symbol, "1D", daily_candles("2024-01-02", "2024-01-31"), replace=True
+        )
+    snapshot = pd.concat(
+        [
+            # Appended after the stored candles
+            daily_candles("2024-02-01", "2024-02-01").assign(symbol="AAA"),
+            # Replaces a stored candle
+            daily_candles("2024-01-31", "2024-01-31", close=9.0).assign(symbol="BBB"),
+            # A symbol that isn't stored yet
+            daily_candles("2024-02-01", "2024-02-01").assign(symbol="CCC"),
+        ]
+    )
+
+    store.write_many("1D", snapshot)
+
+    assert store.read("AAA", "1D")["t"].iat[-1] == "2024-02-01T00:00:00-05:00"
+    assert store.count_rows("AAA", "1D") == 23
+    bbb = store.read("BBB", "1D")
+    assert len(bbb) == 22 and bbb["c"].iat[-1] == 9.0
+    assert store.count_rows("CCC", "1D") == 1
+
+
+def test_parquet_write_many_appends_files_and_compacts(tmp_path):
+    store = ParquetCandleStore(str(tmp_path), max_fragments=3)
+    store.write("AAA", "1D", daily_candles("2024-01-02", "2024-01-31"), replace=True)
+    partition = os.path.join(store.path("AAA", "1D"), "year=2024")
+
+    store.write_many(
+        "1D", daily_candles("2024-02-01", "2024-02-01").assign(symbol="AAA")
+    )
+    store.write_many(
+        "1D", daily_candles("2024-02-02", "2024-02-02").assign(symbol="AAA")
+    )
+    assert sorted(os.listdir(partition)) == [
+        "part-0.parquet",
+        "part-00001.parquet",
+        "part-00002.parquet",
+    ]
+
+    store.write_many(
+        "1D", daily_candles("2024-02-05", "2024-02-05").assign(symbol="AAA")
+    )
+    assert os.listdir(partition) == ["part-0.parquet"]
+    expected = daily_candles("2024-01-02", "2024-02-05")
+    assert list(store.read("AAA", "1D")["t"]) == list(expected["t"])